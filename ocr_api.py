@@ -4,12 +4,28 @@ OCR API 服务
 """
 import os
 import io
+import json
+import time
+import asyncio
+import hmac
 import logging
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
-from fastapi.responses import JSONResponse
+import threading
+import zipfile
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from fastapi import FastAPI, File, Form, Header, UploadFile, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from PIL import Image
-from ocr_model_wrapper import OCRModelWrapper
+from ocr_model_wrapper import (
+    DECODING_STRATEGIES,
+    MultiAdapterOCRModelWrapper,
+    create_model_wrapper_from_env,
+    latex_sanity_issues,
+)
+from ocr_batching import QueueFullError, create_batcher_from_env
+from ocr_metrics import REQUEST_SECONDS_BUCKETS, STAGES, Counter, LabeledHistogram, PrometheusWriter
+from ocr_tiling import merge_tile_predictions, split_formula_lines
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +39,8 @@ app = FastAPI(
 
 # 全局模型实例
 model_wrapper = None
+# 全局动态批处理器
+batcher = None
 
 
 class OCRResponse(BaseModel):
@@ -30,44 +48,153 @@ class OCRResponse(BaseModel):
     latex: str
     success: bool = True
     message: str = "识别成功"
+    # 实际解码路径（greedy / beam / greedy+beam）与开销
+    decoding: Optional[str] = None
+    confidence: Optional[float] = None
+    escalated: bool = False
+    decode_ms: Optional[float] = None
+    # 分块识别时切出的条带数
+    tiles: int = 1
+    # 多适配器模式下实际使用的适配器
+    adapter: Optional[str] = None
+    # debug=true 时返回各阶段耗时（毫秒）
+    timings: Optional[Dict[str, float]] = None
+
+
+class BatchOCRItem(BaseModel):
+    """批量识别中单张图片的结果"""
+    filename: str
+    latex: str = ""
+    success: bool = True
+    message: str = "识别成功"
+    decoding: Optional[str] = None
+    confidence: Optional[float] = None
+    escalated: bool = False
+    decode_ms: Optional[float] = None
+    tiles: int = 1
+    adapter: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+class BatchOCRResponse(BaseModel):
+    """批量识别 API 响应模型，results 与输入顺序一致"""
+    results: List[BatchOCRItem]
+    success: bool = True
+    message: str = "识别成功"
+
+
+class AdapterLoadRequest(BaseModel):
+    """运行时加载 LoRA 适配器的请求"""
+    name: str
+    checkpoint_dir: str
+
+
+# 压缩包中被视为图片的扩展名
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+# 单次批量请求允许的最大图片数
+MAX_BATCH_FILES = int(os.getenv("OCR_MAX_BATCH_FILES", 256))
+# 排队已满返回 503 时建议客户端等待的秒数
+RETRY_AFTER_SECONDS = int(os.getenv("OCR_RETRY_AFTER_SECONDS", 1))
+# /admin/adapters 只能加载该目录下的 checkpoint
+ADAPTER_ROOT = os.getenv("OCR_ADAPTER_ROOT", "checkpoints")
+# 同时进行的流式识别数上限（流式识别不经过批处理队列）
+stream_slots = threading.BoundedSemaphore(int(os.getenv("OCR_MAX_STREAMS", 4)))
+
+# 按路由模板与状态码统计的 HTTP 请求数与耗时
+http_requests = Counter(("endpoint", "method", "status"))
+http_request_seconds = LabeledHistogram(("endpoint", "method"), REQUEST_SECONDS_BUCKETS)
+
+
+class _RequestMetricsMiddleware:
+    """
+    ASGI 中间件：记录每个 HTTP 请求的路由、状态码与总耗时
+
+    流式响应的耗时计到最后一个事件发出为止。标签使用路由模板（如 /admin/adapters/{name}），
+    未匹配任何路由的请求记为 unmatched，避免标签取值无限增长。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            method = scope.get("method", "")
+            http_requests.inc(1, endpoint, method, status["code"])
+            http_request_seconds.labels(endpoint, method).observe(time.perf_counter() - start)
+
+
+app.add_middleware(_RequestMetricsMiddleware)
+
+
+def _timings(prediction, started_at: float) -> Dict[str, float]:
+    """debug 模式下返回的各阶段耗时（毫秒）；除 total_ms 外均为所在批次的耗时"""
+    timings = {"queue_wait_ms": prediction.queue_wait_ms}
+    for stage in STAGES:
+        timings[f"{stage}_ms"] = getattr(prediction, f"{stage}_ms")
+    timings["total_ms"] = round((time.perf_counter() - started_at) * 1000.0, 2)
+    return timings
+
+
+def _queue_full_error() -> HTTPException:
+    """排队请求数达到 OCR_MAX_QUEUE_DEPTH 时的 503 响应"""
+    return HTTPException(
+        status_code=503,
+        detail="OCR 服务繁忙，请稍后重试",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
 
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时加载模型"""
-    global model_wrapper
-    
-    # 从环境变量或默认值获取配置
-    checkpoint_dir = os.getenv(
-        "OCR_CHECKPOINT_DIR",
-        # 默认加载最新的全量训练 LoRA 结果
-        "checkpoints/mixtex_lora_10k_final_tuned/epoch_2"
-    )
-    # 优先使用用户指定的基础模型；默认直接使用 HuggingFace 名称便于交付
-    base_model_path = os.getenv("OCR_BASE_MODEL_PATH", "MixTex/ZhEn-Latex-OCR")
-    device = os.getenv("OCR_DEVICE", None)  # None 表示自动检测
-    
-    logger.info(f"加载模型 checkpoint: {checkpoint_dir}")
-    if base_model_path:
-        logger.info(f"基础模型路径: {base_model_path}")
+    global model_wrapper, batcher
     
+    # 从环境变量或默认值获取配置（与 MixTexOCRTool 的进程内后端共用）
     try:
-        model_wrapper = OCRModelWrapper(
-            checkpoint_dir=checkpoint_dir,
-            base_model_path=base_model_path,
-            device=device
-        )
-        logger.info("模型加载成功，API 服务就绪")
+        model_wrapper = create_model_wrapper_from_env()
+        logger.info("模型加载成功")
     except Exception as e:
         logger.error(f"模型加载失败: {e}")
         raise
+    
+    # 动态批处理：并发请求在 max_wait_ms 窗口内聚合成批；
+    # 多个工作线程共用同一份模型权重并发推理，排队过深时返回 503
+    batcher = create_batcher_from_env(model_wrapper)
+    batcher.start()
+    logger.info("API 服务就绪")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止批处理线程"""
+    if batcher is not None:
+        batcher.stop()
 
 
 @app.post("/predict", response_model=OCRResponse)
 async def predict_latex(
     file: UploadFile = File(...),
     max_length: int = Query(512, description="生成的最大长度，默认512，支持更长的公式"),
-    enhance: bool = Query(True, description="是否启用图片增强预处理，默认True")
+    enhance: bool = Query(True, description="是否启用图片增强预处理，默认True"),
+    decoding: Optional[str] = Query(None, description="解码策略 beam / greedy / adaptive，默认使用服务端配置"),
+    tile: bool = Query(False, description="是否按行切分多行公式后分别识别，再拼接为 aligned 环境"),
+    adapter: Optional[str] = Query(None, description="多适配器模式下使用的适配器，默认使用服务端默认适配器"),
+    debug: bool = Query(False, description="是否在响应中返回各阶段耗时"),
 ):
     """
     接收图片文件，返回识别出的 LaTeX 代码
@@ -76,16 +203,25 @@ async def predict_latex(
         file: 上传的图片文件
         max_length: 生成的最大长度（默认512，支持更长的公式）
         enhance: 是否启用图片增强预处理（默认True）
+        decoding: 解码策略（beam / greedy / adaptive）
+        tile: 是否按行分块识别
+        adapter: 使用的 LoRA 适配器（多适配器模式）
+        debug: 是否返回 timings（排队、预处理、encoder、decoder、后处理与总耗时）
     
     Returns:
         JSON 响应，包含识别出的 LaTeX 代码
     """
-    if model_wrapper is None:
+    started_at = time.perf_counter()
+    if model_wrapper is None or batcher is None:
         raise HTTPException(status_code=503, detail="模型未加载，请稍后重试")
+    _validate_decoding(decoding)
+    _validate_adapter(adapter)
     
     # 检查文件类型
     if not file.content_type or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="上传的文件必须是图片格式")
+    if not batcher.has_capacity():
+        raise _queue_full_error()
     
     try:
         # 读取图片
@@ -95,18 +231,29 @@ async def predict_latex(
         # 记录图片信息
         logger.info(f"正在识别图片: {file.filename}, 尺寸: {image.size}, 模式: {image.mode}")
         
-        # 进行 OCR 识别
-        latex_code = model_wrapper.predict(image, max_length=max_length, enhance=enhance)
+        # 进入批处理队列，等待所在批次完成（不阻塞事件循环）
+        [futures] = _submit_strips([_split_strips(image, tile)], [max_length], enhance, decoding, adapter)
+        prediction, tiles = await _await_prediction(futures)
+        latex_code = prediction.latex
         
         logger.info(f"识别结果长度: {len(latex_code)} 字符")
-        logger.info(f"识别结果预览: {latex_code[:150]}...")  # 打印前150个字符
+        logger.debug(f"识别结果预览: {latex_code[:150]}...")  # 打印前150个字符
         
         return OCRResponse(
             latex=latex_code,
             success=True,
-            message="识别成功"
+            message="识别成功",
+            decoding=prediction.decoding,
+            confidence=prediction.confidence,
+            escalated=prediction.escalated,
+            decode_ms=prediction.decode_ms,
+            tiles=tiles,
+            adapter=prediction.adapter,
+            timings=_timings(prediction, started_at) if debug else None,
         )
     
+    except QueueFullError:
+        raise _queue_full_error()
     except Exception as e:
         logger.error(f"处理图片时发生错误: {e}", exc_info=True)
         raise HTTPException(
@@ -115,6 +262,321 @@ async def predict_latex(
         )
 
 
+def _sse(event: str, data: Dict) -> str:
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_events(image: Image.Image, max_length: int, enhance: bool, adapter: Optional[str]):
+    """
+    流式识别的事件序列：逐段 token 事件，最后一条 done（完整结果）或 error 事件
+
+    同步生成器，由 StreamingResponse 在线程池中迭代，不阻塞事件循环；
+    客户端断开时生成器被关闭，predict_stream 随之停止生成。
+    """
+    start = time.perf_counter()
+    pieces = []
+    try:
+        for text in model_wrapper.predict_stream(image, max_length=max_length, enhance=enhance, adapter=adapter):
+            pieces.append(text)
+            yield _sse("token", {"text": text})
+        latex = "".join(pieces).strip()
+        yield _sse("done", {
+            "latex": latex,
+            "success": True,
+            "message": "识别成功",
+            "decoding": "greedy",
+            "decode_ms": round((time.perf_counter() - start) * 1000.0, 2),
+            "issues": latex_sanity_issues(latex),
+            "adapter": adapter or model_wrapper.default_adapter,
+        })
+    except Exception as e:
+        logger.error(f"流式识别失败: {e}", exc_info=True)
+        yield _sse("error", {"success": False, "message": f"服务器内部错误: {e}"})
+
+
+class _StreamSlot:
+    """
+    包装流式事件迭代器，保证流结束、被关闭或被回收时恰好释放一次并发名额
+    （客户端在首个事件前断开时生成器从未启动，其 finally 不会执行）
+    """
+
+    def __init__(self, events):
+        self._events = events
+        self._released = False
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            stream_slots.release()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self._release()
+            raise
+
+    def close(self):
+        try:
+            self._events.close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        self.close()
+
+
+def _split_strips(image: Image.Image, tile: bool) -> List[Image.Image]:
+    """分块模式下按行切分为条带，否则整张图片作为唯一条带"""
+    return split_formula_lines(image) if tile else [image]
+
+
+def _submit_strips(
+    strip_groups: List[List[Image.Image]],
+    max_lengths: List[int],
+    enhance: bool,
+    decoding: Optional[str],
+    adapter: Optional[str] = None,
+) -> List[List[Future]]:
+    """
+    把多张图片的全部条带一次性提交到批处理队列，由 MicroBatcher 聚成批识别
+
+    队列容纳不下全部条带时抛出 QueueFullError，且不入队任何请求，调用方整体返回 503。
+
+    Args:
+        strip_groups: 每张图片的条带列表
+        max_lengths: 每张图片的最大生成长度
+
+    Returns:
+        与 strip_groups 顺序一致、每张图片各条带对应的 Future 列表
+    """
+    strips = [strip for group in strip_groups for strip in group]
+    strip_lengths = [length for group, length in zip(strip_groups, max_lengths) for _ in group]
+    futures = batcher.submit_many(strips, strip_lengths, enhance=enhance, decoding=decoding, adapter=adapter)
+    grouped, start = [], 0
+    for group in strip_groups:
+        grouped.append(futures[start:start + len(group)])
+        start += len(group)
+    return grouped
+
+
+async def _await_prediction(futures: List[Future]):
+    """
+    等待单张图片各条带的结果（不阻塞事件循环），多个条带时拼接
+
+    Returns:
+        (OCRPrediction, 条带数)
+    """
+    predictions = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+    if len(predictions) == 1:
+        return predictions[0], 1
+    logger.info(f"分块识别: {len(predictions)} 个条带")
+    return merge_tile_predictions(predictions), len(predictions)
+
+
+@app.post("/predict_stream")
+async def predict_latex_stream(
+    file: UploadFile = File(...),
+    max_length: int = Query(512, description="生成的最大长度，默认512"),
+    enhance: bool = Query(True, description="是否启用图片增强预处理，默认True"),
+    adapter: Optional[str] = Query(None, description="多适配器模式下使用的适配器"),
+):
+    """
+    流式识别：以 Server-Sent Events 边生成边返回 LaTeX 片段
+    
+    事件类型：
+        token: {"text": 新生成的片段}
+        done:  完整结果（latex、decode_ms、issues 等）
+        error: 识别失败
+    
+    流式识别使用贪心解码，不经过批处理队列，并发数由 OCR_MAX_STREAMS 限制。
+    """
+    if model_wrapper is None:
+        raise HTTPException(status_code=503, detail="模型未加载，请稍后重试")
+    _validate_adapter(adapter)
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="上传的文件必须是图片格式")
+    
+    contents = await file.read()
+    try:
+        image = Image.open(io.BytesIO(contents))
+        image.load()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"图片解码失败: {e}")
+    
+    if not stream_slots.acquire(blocking=False):
+        raise _queue_full_error()
+    logger.info(f"流式识别图片: {file.filename}, 尺寸: {image.size}")
+    return StreamingResponse(
+        _StreamSlot(_stream_events(image, max_length, enhance, adapter)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _validate_decoding(decoding: Optional[str]):
+    """校验请求中的解码策略"""
+    if decoding is not None and decoding not in DECODING_STRATEGIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的解码策略: {decoding}，可选: {', '.join(DECODING_STRATEGIES)}"
+        )
+
+
+def _validate_adapter(adapter: Optional[str]):
+    """校验请求中的适配器名称"""
+    if adapter is not None and adapter not in model_wrapper.adapter_names():
+        available = model_wrapper.adapter_names()
+        raise HTTPException(
+            status_code=400,
+            detail=f"未加载的适配器: {adapter}，可选: {', '.join(available) if available else '无（单模型模式）'}"
+        )
+
+
+def _parse_max_lengths(raw: Optional[str], count: int, default: int) -> List[int]:
+    """解析逐图 max_length：支持 JSON 数组或逗号分隔的整数"""
+    if not raw:
+        return [default] * count
+    raw = raw.strip()
+    try:
+        values = json.loads(raw) if raw.startswith("[") else [v for v in raw.split(",") if v.strip()]
+        values = [int(v) for v in values]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="max_lengths 必须是整数的 JSON 数组或逗号分隔列表")
+    if len(values) != count:
+        raise HTTPException(
+            status_code=400,
+            detail=f"max_lengths 数量 ({len(values)}) 与图片数量 ({count}) 不一致"
+        )
+    return values
+
+
+def _extract_zip_images(contents: bytes) -> List[Tuple[str, bytes]]:
+    """按压缩包内顺序提取图片文件，忽略目录、非图片文件以及绝对路径或含 .. 的成员"""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(contents))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="上传的压缩包不是有效的 zip 文件")
+    images = []
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or os.path.basename(name).startswith("."):
+                continue
+            parts = name.replace("\\", "/").split("/")
+            if name.startswith(("/", "\\")) or ".." in parts or ":" in parts[0]:
+                continue
+            if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            images.append((name, archive.read(info)))
+    return images
+
+
+@app.post("/predict_batch", response_model=BatchOCRResponse)
+async def predict_latex_batch(
+    files: Optional[List[UploadFile]] = File(None, description="多张图片文件"),
+    archive: Optional[UploadFile] = File(None, description="公式图片目录的 zip 压缩包"),
+    max_length: int = Form(512, description="默认生成最大长度"),
+    max_lengths: Optional[str] = Form(None, description="逐图最大长度，JSON 数组或逗号分隔，需与图片数量一致"),
+    enhance: bool = Form(True, description="是否启用图片增强预处理，默认True"),
+    decoding: Optional[str] = Form(None, description="解码策略 beam / greedy / adaptive，默认使用服务端配置"),
+    tile: bool = Form(False, description="是否按行切分多行公式后分别识别，再拼接为 aligned 环境"),
+    adapter: Optional[str] = Form(None, description="多适配器模式下使用的适配器"),
+    debug: bool = Form(False, description="是否在每项结果中返回各阶段耗时"),
+):
+    """
+    一次请求识别多张图片，返回与输入顺序一致的 LaTeX 列表
+    
+    图片来源为 files（按上传顺序）之后接 archive 中的图片（按压缩包内顺序）。
+    单张图片解码或识别失败只影响对应条目，不影响整批。
+    
+    Returns:
+        JSON 响应，results 中每项对应一张输入图片
+    """
+    started_at = time.perf_counter()
+    if model_wrapper is None or batcher is None:
+        raise HTTPException(status_code=503, detail="模型未加载，请稍后重试")
+    _validate_decoding(decoding)
+    _validate_adapter(adapter)
+    
+    named_images: List[Tuple[str, bytes]] = []
+    for upload in files or []:
+        named_images.append((upload.filename or f"image_{len(named_images)}", await upload.read()))
+    if archive is not None:
+        named_images.extend(_extract_zip_images(await archive.read()))
+    
+    if not named_images:
+        raise HTTPException(status_code=400, detail="未提供任何图片（files 或 archive）")
+    if len(named_images) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多识别 {MAX_BATCH_FILES} 张图片，当前 {len(named_images)} 张"
+        )
+    lengths = _parse_max_lengths(max_lengths, len(named_images), max_length)
+    # 明显容纳不下时在解码图片前拒绝
+    if not batcher.has_capacity(len(named_images)):
+        raise _queue_full_error()
+    
+    logger.info(f"批量识别请求: {len(named_images)} 张图片")
+    
+    items: List[BatchOCRItem] = []
+    decoded = []
+    for (filename, contents), length in zip(named_images, lengths):
+        item = BatchOCRItem(filename=filename)
+        items.append(item)
+        try:
+            image = Image.open(io.BytesIO(contents))
+            image.load()
+        except Exception as e:
+            item.success = False
+            item.message = f"图片解码失败: {e}"
+            continue
+        try:
+            strips = _split_strips(image, tile)
+        except Exception as e:
+            item.success = False
+            item.message = f"识别失败: {e}"
+            continue
+        decoded.append((item, strips, length))
+    
+    # 全部条带整体入队：要么全部入队，要么整批返回 503，不会出现部分条目因排队已满而失败
+    try:
+        strip_futures = _submit_strips(
+            [strips for _, strips, _ in decoded], [length for _, _, length in decoded],
+            enhance, decoding, adapter,
+        )
+    except QueueFullError:
+        raise _queue_full_error()
+    
+    outcomes = await asyncio.gather(*(_await_prediction(futures) for futures in strip_futures), return_exceptions=True)
+    for (item, _, _), outcome in zip(decoded, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"识别 {item.filename} 失败: {outcome}")
+            item.success = False
+            item.message = f"识别失败: {outcome}"
+        else:
+            prediction, item.tiles = outcome
+            item.latex = prediction.latex
+            item.decoding = prediction.decoding
+            item.confidence = prediction.confidence
+            item.escalated = prediction.escalated
+            item.decode_ms = prediction.decode_ms
+            item.adapter = prediction.adapter
+            if debug:
+                item.timings = _timings(prediction, started_at)
+    
+    failed = sum(1 for item in items if not item.success)
+    return BatchOCRResponse(
+        results=items,
+        success=failed == 0,
+        message="识别成功" if failed == 0 else f"{failed}/{len(items)} 张图片识别失败"
+    )
+
+
 @app.get("/")
 def read_root():
     """根路径，用于健康检查"""
@@ -122,7 +584,12 @@ def read_root():
         "message": "MixTex OCR API 服务运行中",
         "status": "ready" if model_wrapper is not None else "loading",
         "endpoints": {
-            "predict": "/predict (POST) - 上传图片进行 OCR 识别"
+            "predict": "/predict (POST) - 上传图片进行 OCR 识别",
+            "predict_batch": "/predict_batch (POST) - 上传多张图片或 zip 压缩包批量识别",
+            "predict_stream": "/predict_stream (POST) - 流式识别，以 Server-Sent Events 逐段返回 LaTeX",
+            "stats": "/stats (GET) - 批大小与排队等待时间直方图",
+            "metrics": "/metrics (GET) - Prometheus 文本格式的请求数、分阶段耗时、批大小、缓存命中率等指标",
+            "admin_adapters": "/admin/adapters (GET/POST/DELETE) - 多适配器模式下查看、加载、卸载 LoRA 适配器"
         }
     }
 
@@ -132,10 +599,135 @@ def health_check():
     """健康检查端点"""
     return {
         "status": "healthy" if model_wrapper is not None else "unhealthy",
-        "model_loaded": model_wrapper is not None
+        "model_loaded": model_wrapper is not None,
+        # 客户端据此构造 OCR 结果缓存键
+        "model_id": model_wrapper.model_id if model_wrapper is not None else None,
+        "generation": model_wrapper.generation_config() if model_wrapper is not None else None,
+        # 多适配器模式下各适配器的模型标识，客户端按 adapter 选择缓存键
+        "default_adapter": model_wrapper.default_adapter if model_wrapper is not None else None,
+        "adapters": model_wrapper.model_ids if model_wrapper is not None else {},
+    }
+
+
+@app.get("/stats")
+def batching_stats():
+    """动态批处理统计：批大小与排队等待时间（毫秒）直方图"""
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="模型未加载，请稍后重试")
+    return batcher.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus 文本格式的服务指标"""
+    writer = PrometheusWriter()
+    writer.counter("http_requests_total", "HTTP 请求数（按路由、方法与状态码）", http_requests.samples())
+    writer.histogram(
+        "http_request_duration_seconds", "HTTP 请求总耗时（秒）",
+        http_request_seconds.items(), http_request_seconds.label_names,
+    )
+    if batcher is not None:
+        writer.histogram(
+            "stage_duration_milliseconds", "每批各阶段耗时（毫秒）：preprocess / encode / decode / postprocess",
+            batcher.stage_histogram.items(), batcher.stage_histogram.label_names,
+        )
+        writer.histogram("batch_size", "每次 generate 的批大小", [((), batcher.batch_size_histogram)])
+        writer.histogram("queue_wait_milliseconds", "请求在批处理队列中的等待时间（毫秒）", [((), batcher.queue_wait_histogram)])
+        writer.counter("generated_tokens_total", "累计生成的 token 数", batcher.generated_tokens.samples())
+        writer.counter("decode_seconds_total", "累计解码耗时（秒）", batcher.decode_seconds.samples())
+        writer.gauge("tokens_per_second", "累计生成 token 数 / 累计解码耗时", [({}, batcher.tokens_per_second())])
+        writer.gauge("queue_depth", "当前排队中的请求数", [({}, batcher.queue_depth())])
+        writer.gauge("busy_workers", "正在推理的工作线程数", [({}, batcher._busy_workers)])
+        writer.counter("rejected_requests_total", "因排队已满被拒绝的请求数", [({}, batcher.rejected)])
+    if model_wrapper is not None:
+        lookups = Counter(("cache", "result"))
+        hit_ratios, cache_bytes = [], []
+        for name, stats in model_wrapper.cache_stats().items():
+            lookups.inc(stats["hits"], name, "hit")
+            lookups.inc(stats["misses"], name, "miss")
+            total = stats["hits"] + stats["misses"]
+            hit_ratios.append(({"cache": name}, stats["hits"] / total if total else 0.0))
+            if "bytes" in stats:
+                cache_bytes.append(({"cache": name}, stats["bytes"]))
+        writer.counter("cache_lookups_total", "服务端缓存查询次数（按缓存与命中情况）", lookups.samples())
+        writer.gauge("cache_hit_ratio", "服务端缓存命中率", hit_ratios)
+        writer.gauge("cache_bytes", "服务端缓存当前占用的字节数", cache_bytes)
+    return writer.text()
+
+
+def _require_multi_adapter(admin_token: Optional[str]) -> MultiAdapterOCRModelWrapper:
+    """
+    校验管理口令，并确认服务以多适配器模式运行
+
+    未设置 OCR_ADMIN_TOKEN 时管理接口整体关闭（404），口令以常数时间比较。
+    """
+    expected = os.getenv("OCR_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="管理接口未启用（请设置 OCR_ADMIN_TOKEN）")
+    if not admin_token or not hmac.compare_digest(admin_token.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="管理口令错误")
+    if model_wrapper is None:
+        raise HTTPException(status_code=503, detail="模型未加载，请稍后重试")
+    if not isinstance(model_wrapper, MultiAdapterOCRModelWrapper):
+        raise HTTPException(status_code=400, detail="服务未以多适配器模式启动（请设置 OCR_ADAPTERS）")
+    return model_wrapper
+
+
+def _resolve_adapter_dir(checkpoint_dir: str) -> str:
+    """
+    将请求中的 checkpoint 目录解析为真实路径，并确认位于 OCR_ADAPTER_ROOT 之下
+
+    解析符号链接与 ..，防止通过管理接口加载任意路径下的文件。
+    """
+    root = os.path.realpath(ADAPTER_ROOT)
+    resolved = os.path.realpath(checkpoint_dir)
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=400, detail=f"checkpoint_dir 必须位于 {ADAPTER_ROOT} 目录下")
+    return resolved
+
+
+def _adapter_listing(wrapper: MultiAdapterOCRModelWrapper) -> Dict:
+    return {
+        "default_adapter": wrapper.default_adapter,
+        "adapters": {
+            name: {"checkpoint_dir": checkpoint_dir, "model_id": wrapper.model_ids[name]}
+            for name, checkpoint_dir in wrapper.adapter_dirs.items()
+        },
     }
 
 
+@app.get("/admin/adapters")
+def list_adapters(x_admin_token: Optional[str] = Header(None)):
+    """列出已加载的适配器"""
+    return _adapter_listing(_require_multi_adapter(x_admin_token))
+
+
+@app.post("/admin/adapters")
+def load_adapter(request: AdapterLoadRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    运行时加载 LoRA 适配器，无需重启服务
+    
+    同步接口，由 FastAPI 在线程池中执行，加载期间不阻塞事件循环
+    """
+    wrapper = _require_multi_adapter(x_admin_token)
+    try:
+        wrapper.load_adapter(request.name, _resolve_adapter_dir(request.checkpoint_dir))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _adapter_listing(wrapper)
+
+
+@app.delete("/admin/adapters/{name}")
+def unload_adapter(name: str, x_admin_token: Optional[str] = Header(None)):
+    """卸载适配器，释放其权重"""
+    wrapper = _require_multi_adapter(x_admin_token)
+    try:
+        wrapper.unload_adapter(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _adapter_listing(wrapper)
+
+
 if __name__ == "__main__":
     import uvicorn
     
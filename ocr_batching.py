@@ -0,0 +1,314 @@
+"""
+OCR 动态批处理模块
+将并发到达的识别请求聚合成批，每批只调用一次 model.generate
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+from ocr_metrics import STAGE_MS_BUCKETS, STAGES, Counter, Histogram, LabeledHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """排队请求数达到上限，调用方应稍后重试"""
+
+
+@dataclass
+class _PendingRequest:
+    """队列中等待批处理的单个请求"""
+    image: Image.Image
+    max_length: int
+    enhance: bool
+    decoding: Optional[str] = None
+    adapter: Optional[str] = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+def _set_result(future: Future, result):
+    """写入结果；Future 已被取消或已完成时忽略"""
+    try:
+        future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def _set_exception(future: Future, error: BaseException):
+    """写入异常；Future 已被取消或已完成时忽略"""
+    try:
+        future.set_exception(error)
+    except InvalidStateError:
+        pass
+
+
+class MicroBatcher:
+    """
+    动态微批调度器
+
+    请求通过 submit() 进入队列，后台线程取出第一个请求后最多再等待
+    max_wait_ms 毫秒，凑满 max_batch_size 或超时即组成一批。同一批内
+    max_length、解码策略与适配器相同的请求共用一次 generate，结果按原顺序回填到各自的 Future。
+
+    num_workers > 1 时多个工作线程从同一队列取批并发推理，共用同一份模型权重
+    （PyTorch 算子执行期间会释放 GIL）。排队请求数达到 max_queue_depth 时
+    submit() / submit_many() 抛出 QueueFullError，由调用方返回 503；
+    submit_many() 整体检查并入队，要么全部入队、要么一个都不入队。
+    """
+
+    def __init__(
+        self,
+        model_wrapper,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        num_workers: int = 1,
+        max_queue_depth: int = 0,
+    ):
+        """
+        Args:
+            model_wrapper: 提供 predict_batch(images, max_length, enhance, decoding, adapter) 的模型封装
+            max_batch_size: 单批最大图片数
+            max_wait_ms: 凑批的最长等待时间（毫秒）
+            num_workers: 并发推理的工作线程数
+            max_queue_depth: 最大排队请求数，0 表示不限制
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size 必须 >= 1")
+        if num_workers < 1:
+            raise ValueError("num_workers 必须 >= 1")
+        self.model_wrapper = model_wrapper
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.num_workers = num_workers
+        self.max_queue_depth = max_queue_depth
+
+        self._queue: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+        self._busy_workers = 0
+        self._counter_lock = threading.Lock()
+        # 串行化"检查排队深度 + 入队"，保证 submit_many 的名额预留是原子的
+        self._enqueue_lock = threading.Lock()
+        self.rejected = 0
+
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.queue_wait_histogram = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+        # 每批各阶段耗时（毫秒）与生成 token 数
+        self.stage_histogram = LabeledHistogram(("stage",), STAGE_MS_BUCKETS)
+        self.generated_tokens = Counter()
+        self.decode_seconds = Counter()
+
+    def start(self):
+        """启动后台批处理线程"""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"ocr-micro-batcher-{i}", daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            f"动态批处理已启动: max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms}, "
+            f"num_workers={self.num_workers}, max_queue_depth={self.max_queue_depth or '不限'}"
+        )
+
+    def stop(self, timeout: float = 5.0):
+        """停止后台线程，队列中未处理的请求以异常结束"""
+        self._stopped.set()
+        for _ in self._threads:
+            self._queue.put(None)  # 唤醒阻塞中的 get()
+        deadline = time.perf_counter() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(deadline - time.perf_counter(), 0))
+        self._threads = []
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None:
+                _set_exception(pending.future, RuntimeError("OCR 批处理器已停止"))
+
+    def submit(
+        self,
+        image: Image.Image,
+        max_length: int = 512,
+        enhance: bool = True,
+        decoding: Optional[str] = None,
+        adapter: Optional[str] = None,
+    ) -> Future:
+        """
+        提交单张图片，返回在识别完成后写入 OCRPrediction 的 Future
+        """
+        return self.submit_many([image], max_length, enhance=enhance, decoding=decoding, adapter=adapter)[0]
+
+    def submit_many(
+        self,
+        images: Sequence[Image.Image],
+        max_length: Union[int, Sequence[int]] = 512,
+        enhance: bool = True,
+        decoding: Optional[str] = None,
+        adapter: Optional[str] = None,
+    ) -> List[Future]:
+        """
+        原子地提交多张图片：队列容纳不下全部图片时抛出 QueueFullError，且不入队任何一张
+
+        Args:
+            images: 图片列表（分块识别时为全部条带）
+            max_length: 统一的最大生成长度，或与 images 等长的逐图最大长度
+
+        Returns:
+            与 images 顺序一致的 Future 列表
+        """
+        if self._stopped.is_set() or not self._threads:
+            raise RuntimeError("OCR 批处理器未运行")
+        max_lengths = [max_length] * len(images) if isinstance(max_length, int) else list(max_length)
+        if len(max_lengths) != len(images):
+            raise ValueError(f"max_length 数量 ({len(max_lengths)}) 与图片数量 ({len(images)}) 不一致")
+        with self._enqueue_lock:
+            if not self.has_capacity(len(images)):
+                with self._counter_lock:
+                    self.rejected += len(images)
+                raise QueueFullError(f"OCR 排队请求数已达上限 {self.max_queue_depth}")
+            requests = [
+                _PendingRequest(image=image, max_length=length, enhance=enhance, decoding=decoding, adapter=adapter)
+                for image, length in zip(images, max_lengths)
+            ]
+            for pending in requests:
+                self._queue.put(pending)
+        return [pending.future for pending in requests]
+
+    def has_capacity(self, count: int = 1) -> bool:
+        """队列当前是否还能容纳 count 个请求（只查询，不预留名额）"""
+        return not self.max_queue_depth or self._queue.qsize() + count <= self.max_queue_depth
+
+    def queue_depth(self) -> int:
+        """当前排队中的请求数（近似值）"""
+        return self._queue.qsize()
+
+    def stats(self) -> Dict:
+        """批大小与排队等待时间（毫秒）直方图"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "num_workers": self.num_workers,
+            "busy_workers": self._busy_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "rejected": self.rejected,
+            "queue_depth": self.queue_depth(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_histogram.snapshot(),
+            "stage_ms": {stage: histogram.snapshot() for (stage,), histogram in self.stage_histogram.items()},
+            "generated_tokens": int(self.generated_tokens.value()),
+            "tokens_per_second": self.tokens_per_second(),
+        }
+
+    def tokens_per_second(self) -> float:
+        """累计生成 token 数 / 累计解码耗时"""
+        seconds = self.decode_seconds.value()
+        return round(self.generated_tokens.value() / seconds, 2) if seconds else 0.0
+
+    def _record_batch(self, predictions: List):
+        """记录一次 generate 批次的各阶段耗时与 token 吞吐（批内取各图片的最大值）"""
+        for stage in STAGES:
+            self.stage_histogram.labels(stage).observe(max(getattr(p, f"{stage}_ms") for p in predictions))
+        self.generated_tokens.inc(sum(p.generated_tokens for p in predictions))
+        self.decode_seconds.inc(max(p.decode_ms for p in predictions) / 1000.0)
+
+    def _collect_batch(self, first: _PendingRequest) -> List[_PendingRequest]:
+        """以 first 为起点，在等待窗口内尽量凑满一批"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                pending = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:  # 停止信号
+                self._stopped.set()
+                self._queue.put(None)  # 留给其他工作线程
+                break
+            if pending.future.set_running_or_notify_cancel():
+                batch.append(pending)
+        return batch
+
+    def _worker_loop(self):
+        while not self._stopped.is_set():
+            first = self._queue.get()
+            if first is None:
+                break
+            # 出队即标记为运行中：之后调用方无法再取消；已取消的请求直接跳过，不参与推理
+            if not first.future.set_running_or_notify_cancel():
+                continue
+            batch = self._collect_batch(first)
+            with self._counter_lock:
+                self._busy_workers += 1
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # 兜底：任何意外异常都不能终止工作线程，否则后续请求只能等到超时
+                logger.error(f"批处理失败（批大小 {len(batch)}）: {e}", exc_info=True)
+                for pending in batch:
+                    _set_exception(pending.future, e)
+            finally:
+                with self._counter_lock:
+                    self._busy_workers -= 1
+
+    def _run_batch(self, batch: List[_PendingRequest]):
+        dispatched_at = time.perf_counter()
+        for pending in batch:
+            self.queue_wait_histogram.observe((dispatched_at - pending.enqueued_at) * 1000.0)
+
+        # generate 的 max_length、解码方式与适配器是整批共享的，因此按三者分组
+        groups: Dict[Tuple[int, Optional[str], Optional[str]], List[_PendingRequest]] = {}
+        for pending in batch:
+            groups.setdefault((pending.max_length, pending.decoding, pending.adapter), []).append(pending)
+
+        for (max_length, decoding, adapter), group in groups.items():
+            self.batch_size_histogram.observe(len(group))
+            try:
+                results = self.model_wrapper.predict_batch(
+                    [p.image for p in group],
+                    max_length=max_length,
+                    enhance=[p.enhance for p in group],
+                    decoding=decoding,
+                    adapter=adapter,
+                )
+            except Exception as e:
+                logger.error(f"批量识别失败（批大小 {len(group)}）: {e}", exc_info=True)
+                for pending in group:
+                    _set_exception(pending.future, e)
+                continue
+            if len(results) != len(group):
+                error = RuntimeError(f"predict_batch 返回 {len(results)} 个结果，与输入 {len(group)} 张图片不一致")
+                logger.error(str(error))
+                for pending in group:
+                    _set_exception(pending.future, error)
+                continue
+            if results:
+                self._record_batch(results)
+            for pending, prediction in zip(group, results):
+                prediction.queue_wait_ms = round((dispatched_at - pending.enqueued_at) * 1000.0, 2)
+                _set_result(pending.future, prediction)
+
+
+def create_batcher_from_env(model_wrapper) -> MicroBatcher:
+    """按 OCR_MAX_BATCH_SIZE 等环境变量创建（未启动的）动态批处理器"""
+    return MicroBatcher(
+        model_wrapper,
+        max_batch_size=int(os.getenv("OCR_MAX_BATCH_SIZE", 8)),
+        max_wait_ms=float(os.getenv("OCR_MAX_WAIT_MS", 10)),
+        num_workers=int(os.getenv("OCR_NUM_WORKERS", 1)),
+        max_queue_depth=int(os.getenv("OCR_MAX_QUEUE_DEPTH", 0)),
+    )
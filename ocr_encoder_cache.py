@@ -0,0 +1,86 @@
+"""
+OCR encoder 特征缓存模块
+按预处理后图片的哈希缓存视觉 encoder 的输出，同一图片换用不同解码参数重试时只需重跑 decoder
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class EncoderFeatureCache:
+    """
+    线程安全的 LRU 缓存，按条目字节数计入总占用，超出 max_bytes 时淘汰最久未使用的条目
+
+    缓存值通常是单张图片的 encoder last_hidden_state（位于模型所在设备上），
+    字节数由调用方在 put() 时给出。
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: 缓存总字节数上限
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes 必须 > 0")
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(image: np.ndarray) -> str:
+        """由预处理后的图片数组（尺寸与像素）计算缓存键"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(image.shape).encode("ascii"))
+        digest.update(np.ascontiguousarray(image).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """命中时返回缓存值并将其标记为最近使用，未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any, nbytes: int):
+        """写入一个条目；单个条目超过 max_bytes 时不缓存"""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存（统计计数保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中、未命中、淘汰次数与当前占用"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,169 @@
+"""
+OCR 服务指标模块
+线程安全的计数器与直方图，并按 Prometheus 文本格式（0.0.4）输出
+"""
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 识别流程的各阶段，与 OCRPrediction 中的 *_ms 字段对应
+STAGES = ("preprocess", "encode", "decode", "postprocess")
+
+# 各阶段耗时（毫秒）的桶上界
+STAGE_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+# HTTP 请求耗时（秒）的桶上界
+REQUEST_SECONDS_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+class Histogram:
+    """线程安全的累积直方图（桶上界语义与 Prometheus 一致）"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """记录一次观测值"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        """返回累积计数形式的快照"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {
+            "buckets": cumulative,
+            "sum": total,
+            "count": count,
+            "avg": total / count if count else 0.0,
+        }
+
+
+class LabeledHistogram:
+    """按标签值分组的一组直方图，首次出现的标签组合自动创建"""
+
+    def __init__(self, label_names: Sequence[str], buckets: Sequence[float]):
+        self.label_names = tuple(label_names)
+        self.buckets = list(buckets)
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        """返回指定标签值对应的直方图"""
+        key = tuple(str(v) for v in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = Histogram(self.buckets)
+            return child
+
+    def items(self) -> List[Tuple[Tuple[str, ...], Histogram]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class Counter:
+    """线程安全的单调递增计数器，可带标签"""
+
+    def __init__(self, label_names: Sequence[str] = ()):
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *values: str):
+        """按标签值累加"""
+        key = tuple(str(v) for v in values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *values: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(str(v) for v in values), 0.0)
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """[(标签字典, 数值)]，供 PrometheusWriter 输出"""
+        return [(dict(zip(self.label_names, values)), value) for values, value in self.items()]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class PrometheusWriter:
+    """按 Prometheus 文本格式拼接指标"""
+
+    def __init__(self, prefix: str = "ocr_"):
+        self.prefix = prefix
+        self._lines: List[str] = []
+
+    def _header(self, name: str, help_text: str, metric_type: str) -> str:
+        full_name = self.prefix + name
+        self._lines.append(f"# HELP {full_name} {help_text}")
+        self._lines.append(f"# TYPE {full_name} {metric_type}")
+        return full_name
+
+    def _samples(self, full_name: str, samples: Iterable[Tuple[Dict[str, str], float]]):
+        for labels, value in samples:
+            self._lines.append(f"{full_name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+
+    def gauge(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]):
+        """samples 为 [(标签字典, 数值)]"""
+        self._samples(self._header(name, help_text, "gauge"), samples)
+
+    def counter(self, name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]]):
+        """samples 为 [(标签字典, 累计值)]，Counter 可通过 samples() 获得"""
+        self._samples(self._header(name, help_text, "counter"), samples)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        histograms: Iterable[Tuple[Tuple[str, ...], Histogram]],
+        label_names: Sequence[str] = (),
+    ):
+        """histograms 为 [(标签值, Histogram)]；无标签时传入 [((), histogram)]"""
+        full_name = self._header(name, help_text, "histogram")
+        for values, histogram in histograms:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                labels = _format_labels(label_names, values, ("le", bound))
+                self._lines.append(f"{full_name}_bucket{labels} {count}")
+            labels = _format_labels(label_names, values)
+            self._lines.append(f"{full_name}_sum{labels} {_format_value(snapshot['sum'])}")
+            self._lines.append(f"{full_name}_count{labels} {snapshot['count']}")
+
+    def text(self) -> str:
+        return "\n".join(self._lines) + "\n"
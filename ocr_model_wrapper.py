@@ -3,6 +3,15 @@ OCR 模型封装模块
 用于加载和推理 MixTex 微调模型
 """
 import os
+import re
+import json
+import time
+import hashlib
+import threading
+import contextlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
 import torch
 from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
@@ -10,18 +19,302 @@ from transformers import (
     VisionEncoderDecoderModel,
     AutoTokenizer,
     AutoImageProcessor,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
 )
+from transformers.modeling_outputs import BaseModelOutput
 from peft import PeftModel
 import logging
 
+from ocr_encoder_cache import EncoderFeatureCache
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# 默认基础模型
+DEFAULT_BASE_MODEL = "MixTex/ZhEn-Latex-OCR"
+# 参与模型标识计算的 checkpoint 文件（LoRA 适配器或全量模型配置）
+IDENTITY_FILES = (
+    "adapter_config.json", "adapter_model.safetensors", "adapter_model.bin",
+    "config.json", "model.safetensors", "pytorch_model.bin",
+)
+
+
+def compute_model_id(checkpoint_dir: str, base_model_path: str = None) -> str:
+    """
+    计算模型/适配器标识：基础模型名称 + checkpoint 关键文件内容的哈希
+    
+    同一份权重无论放在哪个目录都得到相同标识，可用作 OCR 结果缓存键的一部分。
+    """
+    digest = hashlib.sha256()
+    is_lora = os.path.exists(os.path.join(checkpoint_dir, "adapter_config.json"))
+    base_id = (base_model_path or DEFAULT_BASE_MODEL) if is_lora else ""
+    digest.update(base_id.encode("utf-8"))
+    for name in IDENTITY_FILES:
+        path = os.path.join(checkpoint_dir, name)
+        if os.path.isfile(path):
+            digest.update(name.encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+# 预合并模型目录中的指纹文件名
+MERGE_FINGERPRINT_FILE = "merge_fingerprint.json"
+
+
+def compute_merge_fingerprint(checkpoint_dir: str, base_model_path: str = None) -> Dict[str, Optional[str]]:
+    """
+    计算预合并模型的指纹：基础模型（名称及本地 config.json 哈希）+ 适配器内容哈希
+    
+    指纹一致时，导出的合并模型与“基础模型 + LoRA 现场合并”的结果等价。
+    """
+    base_model = base_model_path or DEFAULT_BASE_MODEL
+    base_config_sha256 = None
+    base_config_path = os.path.join(base_model, "config.json")
+    if os.path.isfile(base_config_path):
+        with open(base_config_path, "rb") as f:
+            base_config_sha256 = hashlib.sha256(f.read()).hexdigest()
+    return {
+        "base_model": base_model,
+        "base_config_sha256": base_config_sha256,
+        "checkpoint_id": compute_model_id(checkpoint_dir, base_model_path),
+    }
+
+
+def read_merge_fingerprint(merged_model_dir: str) -> Optional[Dict[str, Optional[str]]]:
+    """读取预合并模型目录中的指纹，不存在或损坏时返回 None"""
+    path = os.path.join(merged_model_dir, MERGE_FINGERPRINT_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def load_model_from_checkpoint(checkpoint_dir: str, base_model_path: str = None):
+    """
+    从 checkpoint 加载模型和处理器（在 CPU 上，fp32）
+    
+    LoRA checkpoint 会加载基础模型后将适配器合并进 decoder。
+    
+    Returns:
+        (model, tokenizer, image_processor)
+    """
+    # 检查是否是 LoRA checkpoint
+    adapter_config_path = os.path.join(checkpoint_dir, "adapter_config.json")
+    
+    if os.path.exists(adapter_config_path):
+        if not base_model_path:
+            # 尝试使用默认的基础模型路径
+            base_model_path = DEFAULT_BASE_MODEL
+            logger.warning(f"检测到 LoRA checkpoint，使用默认基础模型: {base_model_path}")
+        
+        logger.info(f"检测到 LoRA checkpoint，从基础模型 {base_model_path} 加载...")
+        model = VisionEncoderDecoderModel.from_pretrained(base_model_path)
+        tokenizer = AutoTokenizer.from_pretrained(base_model_path)
+        image_processor = AutoImageProcessor.from_pretrained(base_model_path)
+        
+        logger.info("将 LoRA 适配器加载到 decoder ...")
+        decoder_with_lora = PeftModel.from_pretrained(model.decoder, checkpoint_dir)
+        decoder_with_lora = decoder_with_lora.merge_and_unload()  # 合并权重便于推理
+        model.decoder = decoder_with_lora
+    else:
+        # 全量模型
+        logger.info("检测到全量模型 checkpoint")
+        model = VisionEncoderDecoderModel.from_pretrained(checkpoint_dir)
+        tokenizer = AutoTokenizer.from_pretrained(checkpoint_dir)
+        image_processor = AutoImageProcessor.from_pretrained(checkpoint_dir)
+    
+    return model, tokenizer, image_processor
+
+
+# 预处理缩放范围：最小边至少 30 像素，最大边不超过 600 像素
+PREPROCESS_MIN_SIZE = 30
+PREPROCESS_MAX_SIZE = 600
+# ITU-R 601-2 亮度系数，与 PIL 的 convert("L") 一致
+_LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _target_size(width: int, height: int) -> Tuple[int, int]:
+    """保持宽高比：过大时按最大边缩小，过小时按最小边放大"""
+    max_dim = max(width, height)
+    min_dim = min(width, height)
+    if max_dim > PREPROCESS_MAX_SIZE:
+        scale_ratio = PREPROCESS_MAX_SIZE / max_dim
+    elif min_dim < PREPROCESS_MIN_SIZE:
+        scale_ratio = PREPROCESS_MIN_SIZE / min_dim
+    else:
+        return width, height
+    return max(1, int(width * scale_ratio)), max(1, int(height * scale_ratio))
+
+
+# 支持的解码策略：beam（始终 beam search）、greedy（始终贪心）、
+# adaptive（先贪心，置信度低或未通过 LaTeX 校验时再用 beam search 重新解码）
+DECODING_STRATEGIES = ("beam", "greedy", "adaptive")
+
+_BEGIN_END_PATTERN = re.compile(r"\\(begin|end)\s*\{([^}]*)\}")
+# 同一片段（2~30 个字符）连续重复 10 次以上：解码陷入循环的典型表现
+_REPETITION_PATTERN = re.compile(r"(.{2,30}?)\1{9,}", re.DOTALL)
+
+
+def latex_sanity_issues(latex: str, hit_max_length: bool = False) -> List[str]:
+    """
+    对识别结果做廉价的 LaTeX 合法性检查
+    
+    Returns:
+        问题描述列表，为空表示通过
+    """
+    issues = []
+    if hit_max_length:
+        issues.append("达到 max_length 被截断")
+    
+    # 去掉转义的 \{ \} 后检查花括号是否配对
+    depth = 0
+    for char in re.sub(r"\\[{}]", "", latex):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                break
+    if depth != 0:
+        issues.append("花括号不配对")
+    
+    # \begin{env} 与 \end{env} 按栈匹配
+    stack = []
+    for kind, env in _BEGIN_END_PATTERN.findall(latex):
+        if kind == "begin":
+            stack.append(env)
+        elif not stack or stack.pop() != env:
+            issues.append(f"\\end{{{env}}} 没有匹配的 \\begin")
+            break
+    if stack:
+        issues.append(f"\\begin{{{stack[-1]}}} 没有匹配的 \\end")
+    
+    if len(re.findall(r"\\left\b", latex)) != len(re.findall(r"\\right\b", latex)):
+        issues.append("\\left 与 \\right 数量不一致")
+    
+    # 只由空白组成的重复片段（如对齐用的空格）不算
+    for repetition in _REPETITION_PATTERN.finditer(latex):
+        unit = repetition.group(1)
+        if unit.strip():
+            issues.append(f"片段 {unit!r} 连续重复 {len(repetition.group(0)) // len(unit)} 次")
+            break
+    return issues
+
+
+@dataclass
+class OCRPrediction:
+    """单张图片的识别结果及解码开销"""
+    latex: str
+    decoding: str                       # 实际走过的解码路径：greedy / beam / greedy+beam
+    confidence: Optional[float] = None  # 序列平均 token 概率
+    escalated: bool = False             # adaptive 模式下是否升级到 beam search
+    issues: List[str] = field(default_factory=list)  # 贪心结果未通过的校验项
+    generated_tokens: int = 0
+    decode_ms: float = 0.0              # 该图片所在批次的解码耗时（含升级后的 beam search）
+    adapter: Optional[str] = None       # 多适配器模式下实际使用的适配器
+    # 所在批次各阶段耗时（毫秒），用于定位延迟
+    preprocess_ms: float = 0.0          # 缩放、增强与 image_processor
+    encode_ms: float = 0.0              # 视觉 encoder 前向
+    postprocess_ms: float = 0.0         # 反分词与 LaTeX 校验
+    queue_wait_ms: float = 0.0          # 在批处理队列中的等待时间（由 MicroBatcher 填写）
+
+
+class _CancelCriteria(StoppingCriteria):
+    """cancel_event 被 set 后停止生成"""
+    
+    def __init__(self, cancel_event: threading.Event):
+        self.cancel_event = cancel_event
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full(
+            (input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device
+        )
+
+
+# 支持的推理精度
+SUPPORTED_PRECISIONS = ("fp32", "bf16", "int8-dynamic")
+# 支持的推理后端，onnx 见 ocr_onnx_backend.py
+INFERENCE_BACKENDS = ("torch", "onnx")
+
+
+def configure_torch_threads(intra_op_threads: int = None, inter_op_threads: int = None):
+    """
+    设置 PyTorch 的算子内/算子间线程数
+    
+    Args:
+        intra_op_threads: 单个算子内部的并行线程数（torch.set_num_threads）
+        inter_op_threads: 算子间并行线程数，必须在首次并行计算前设置
+    """
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            # 进程内已经开始过并行计算时无法再修改
+            logger.warning(f"无法设置 inter-op 线程数: {e}")
+    logger.info(
+        f"PyTorch 线程数: intra-op={torch.get_num_threads()}, "
+        f"inter-op={torch.get_num_interop_threads()}"
+    )
+
+
+def apply_precision(model: VisionEncoderDecoderModel, precision: str, device: torch.device) -> VisionEncoderDecoderModel:
+    """
+    按指定精度转换模型（应在 LoRA merge_and_unload 之后调用）
+    
+    Args:
+        model: 已合并权重的模型
+        precision: fp32 / bf16 / int8-dynamic
+        device: 模型所在设备
+    
+    Returns:
+        转换后的模型
+    """
+    if precision not in SUPPORTED_PRECISIONS:
+        raise ValueError(f"不支持的精度: {precision}，可选: {', '.join(SUPPORTED_PRECISIONS)}")
+    
+    if precision == "bf16":
+        return model.to(torch.bfloat16)
+    
+    if precision == "int8-dynamic":
+        if device.type != "cpu":
+            logger.warning("int8-dynamic 仅支持 CPU 推理，当前设备将继续使用 fp32")
+            return model
+        # 动态量化：decoder 中 Linear 层权重量化为 int8，激活在运行时量化
+        model.decoder = torch.ao.quantization.quantize_dynamic(
+            model.decoder, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
 class OCRModelWrapper:
     """OCR 模型封装类"""
     
-    def __init__(self, checkpoint_dir: str, base_model_path: str = None, device: str = None):
+    # beam search 宽度
+    num_beams = 5
+    # 单适配器模式下没有可选适配器
+    default_adapter: Optional[str] = None
+    
+    def __init__(
+        self,
+        checkpoint_dir: str,
+        base_model_path: str = None,
+        device: str = None,
+        precision: str = "fp32",
+        intra_op_threads: int = None,
+        inter_op_threads: int = None,
+        merged_model_dir: str = None,
+        default_decoding: str = "beam",
+        adaptive_min_confidence: float = 0.9,
+        encoder_cache_bytes: int = 0,
+    ):
         """
         初始化模型
         
@@ -29,47 +322,76 @@ class OCRModelWrapper:
             checkpoint_dir: 微调模型 checkpoint 目录路径
             base_model_path: 基础模型路径（如果是 LoRA checkpoint 则必须提供）
             device: 设备 ('cuda' 或 'cpu')，默认自动检测
+            precision: 推理精度 fp32 / bf16 / int8-dynamic（int8-dynamic 仅 CPU）
+            intra_op_threads: PyTorch 算子内线程数，默认由 PyTorch 决定
+            inter_op_threads: PyTorch 算子间线程数，默认由 PyTorch 决定
+            merged_model_dir: scripts/export_merged_ocr_model.py 导出的预合并模型目录；
+                指纹与 checkpoint_dir/base_model_path 一致时直接加载，跳过 LoRA 合并
+            default_decoding: 请求未指定时使用的解码策略（beam / greedy / adaptive）
+            adaptive_min_confidence: adaptive 模式下贪心结果的最低置信度，低于此值升级到 beam search
+            encoder_cache_bytes: encoder 特征缓存的字节上限，0 表示不缓存；同一图片以不同
+                max_length / 解码策略重试时命中缓存，只重跑 decoder
         """
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
+        if precision not in SUPPORTED_PRECISIONS:
+            raise ValueError(f"不支持的精度: {precision}，可选: {', '.join(SUPPORTED_PRECISIONS)}")
+        if default_decoding not in DECODING_STRATEGIES:
+            raise ValueError(f"不支持的解码策略: {default_decoding}，可选: {', '.join(DECODING_STRATEGIES)}")
+        self.default_decoding = default_decoding
+        self.adaptive_min_confidence = adaptive_min_confidence
+        # 预处理缓冲区按线程复用，避免每批重新分配
+        self._buffers = threading.local()
+        self.encoder_cache = EncoderFeatureCache(encoder_cache_bytes) if encoder_cache_bytes > 0 else None
         
         self.device = torch.device(device)
         logger.info(f"使用设备: {self.device}")
+        configure_torch_threads(intra_op_threads, inter_op_threads)
         
         # 加载模型
+        load_start = time.perf_counter()
         self.model, self.tokenizer, self.image_processor = self._load_model(
-            checkpoint_dir, base_model_path
+            checkpoint_dir, base_model_path, merged_model_dir
         )
-        logger.info("模型加载完成")
-    
-    def _load_model(self, checkpoint_dir: str, base_model_path: str = None):
-        """加载模型和处理器"""
-        logger.info(f"从 {checkpoint_dir} 加载模型...")
-        
-        # 检查是否是 LoRA checkpoint
-        adapter_config_path = os.path.join(checkpoint_dir, "adapter_config.json")
-        
-        if os.path.exists(adapter_config_path):
-            if not base_model_path:
-                # 尝试使用默认的基础模型路径
-                base_model_path = "MixTex/ZhEn-Latex-OCR"
-                logger.warning(f"检测到 LoRA checkpoint，使用默认基础模型: {base_model_path}")
-            
-            logger.info(f"检测到 LoRA checkpoint，从基础模型 {base_model_path} 加载...")
-            model = VisionEncoderDecoderModel.from_pretrained(base_model_path)
-            tokenizer = AutoTokenizer.from_pretrained(base_model_path)
-            image_processor = AutoImageProcessor.from_pretrained(base_model_path)
-            
-            logger.info("将 LoRA 适配器加载到 decoder ...")
-            decoder_with_lora = PeftModel.from_pretrained(model.decoder, checkpoint_dir)
-            decoder_with_lora = decoder_with_lora.merge_and_unload()  # 合并权重便于推理
-            model.decoder = decoder_with_lora
-        else:
-            # 全量模型
-            logger.info("检测到全量模型 checkpoint")
-            model = VisionEncoderDecoderModel.from_pretrained(checkpoint_dir)
-            tokenizer = AutoTokenizer.from_pretrained(checkpoint_dir)
-            image_processor = AutoImageProcessor.from_pretrained(checkpoint_dir)
+        self.load_seconds = time.perf_counter() - load_start
+        logger.info(f"模型加载耗时 {self.load_seconds:.2f} 秒（来源: {self.load_source}）")
+        self.model = apply_precision(self.model, precision, self.device)
+        self.precision = precision
+        # 输入张量需与 encoder 权重精度一致
+        self.input_dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+        
+        # 不同精度的输出可能不同，精度也是模型标识的一部分
+        self.model_id = compute_model_id(checkpoint_dir, base_model_path)
+        if precision != "fp32":
+            self.model_id = f"{self.model_id}-{precision}"
+        # 多适配器模式下为 {适配器名: 模型标识}
+        self.model_ids: Dict[str, str] = {}
+        logger.info(f"模型加载完成，精度: {precision}，模型标识: {self.model_id}")
+    
+    def _load_model(self, checkpoint_dir: str, base_model_path: str = None, merged_model_dir: str = None):
+        """加载模型和处理器，优先使用指纹匹配的预合并模型"""
+        model = None
+        if merged_model_dir:
+            stored = read_merge_fingerprint(merged_model_dir)
+            expected = compute_merge_fingerprint(checkpoint_dir, base_model_path)
+            if stored == expected:
+                logger.info(f"从预合并模型 {merged_model_dir} 加载（safetensors 内存映射）...")
+                model = VisionEncoderDecoderModel.from_pretrained(merged_model_dir)
+                tokenizer = AutoTokenizer.from_pretrained(merged_model_dir)
+                image_processor = AutoImageProcessor.from_pretrained(merged_model_dir)
+                self.load_source = "merged"
+            elif stored is None:
+                logger.warning(f"预合并模型目录 {merged_model_dir} 不存在或缺少指纹，改为现场合并")
+            else:
+                logger.warning(
+                    f"预合并模型指纹不匹配（期望 {expected}，实际 {stored}），改为现场合并；"
+                    f"请重新运行 scripts/export_merged_ocr_model.py"
+                )
+        
+        if model is None:
+            logger.info(f"从 {checkpoint_dir} 加载模型...")
+            model, tokenizer, image_processor = load_model_from_checkpoint(checkpoint_dir, base_model_path)
+            self.load_source = "checkpoint"
         
         model.to(self.device)
         model.eval()
@@ -86,73 +408,84 @@ class OCRModelWrapper:
         Returns:
             预处理后的图片
         """
-        # 确保图片是 RGB 格式
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-        
-        original_size = image.size
-        width, height = original_size
-        logger.info(f"原始图片尺寸: {width}x{height}")
-        
-        # 保持原图宽高比，将图片缩放到几十到几百像素的量级
-        # 目标范围：最小边至少50像素，最大边不超过500像素
-        min_size = 30   # 最小边目标尺寸
-        max_size = 600  # 最大边目标尺寸
-        
-        # 计算当前最大边和最小边
-        max_dim = max(width, height)
-        min_dim = min(width, height)
-        
-        # 计算缩放比例（保持宽高比）
-        scale_ratio = 1.0
-        
-        # 如果图片太大（最大边超过max_size），缩小
-        if max_dim > max_size:
-            scale_ratio = max_size / max_dim
-            logger.info(f"图片过大，缩小 {scale_ratio:.3f} 倍")
-        # 如果图片太小（最小边小于min_size），放大
-        elif min_dim < min_size:
-            scale_ratio = min_size / min_dim
-            logger.info(f"图片过小，放大 {scale_ratio:.3f} 倍")
-        
-        # 按比例调整尺寸（保持宽高比）
-        if scale_ratio != 1.0:
-            new_width = int(width * scale_ratio)
-            new_height = int(height * scale_ratio)
-            logger.info(f"图片尺寸调整: {original_size} -> ({new_width}, {new_height}), 宽高比保持不变: {new_width/new_height:.2f}")
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        else:
-            logger.info(f"图片尺寸合适，无需调整")
+        return Image.fromarray(self._preprocess_images([image], [enhance])[0].copy())
+    
+    def _preprocess_images(self, images: List[Image.Image], enhance: List[bool]) -> List[np.ndarray]:
+        """
+        批量预处理：逐张缩放到训练数据尺寸范围后写入复用的缓冲区，
+        整批一次性计算亮度/对比度统计，只对质量较低的图片做增强
         
-        if not enhance:
-            return image
+        Args:
+            images: 原始 PIL Image 对象列表
+            enhance: 与 images 等长的是否启用增强列表
         
-        # 转换为灰度图进行质量检测
-        gray = image.convert("L")
+        Returns:
+            HWC uint8 数组列表（缓冲区视图，下次调用前有效）
+        """
+        resized = []
+        for image in images:
+            # 确保图片是 RGB 格式
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            # 保持原图宽高比，将图片缩放到几十到几百像素的量级
+            target_size = _target_size(*image.size)
+            if target_size != image.size:
+                image = image.resize(target_size, Image.Resampling.LANCZOS)
+            resized.append(image)
         
-        # 计算图片的对比度和亮度统计
-        img_array = np.array(gray)
-        mean_brightness = np.mean(img_array)
-        std_brightness = np.std(img_array)  # 标准差反映对比度
+        widths = np.array([image.size[0] for image in resized])
+        heights = np.array([image.size[1] for image in resized])
+        batch = self._batch_buffer(len(resized), int(heights.max()), int(widths.max()))
+        batch.fill(0)  # 填充区域为 0，不影响下面的求和统计
+        for i, image in enumerate(resized):
+            batch[i, :heights[i], :widths[i]] = np.asarray(image)
         
-        # 如果图片对比度较低或亮度异常，进行增强
-        if std_brightness < 30 or mean_brightness < 50 or mean_brightness > 200:
-            logger.info(f"检测到图片质量较低 (亮度={mean_brightness:.1f}, 对比度={std_brightness:.1f})，进行增强处理")
-            
-            # 增强对比度
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1.2)  # 增强20%对比度
-            
-            # 轻微增强锐度
-            enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(1.1)
+        # 整批计算灰度的均值（亮度）与标准差（对比度）
+        gray = batch @ _LUMA_WEIGHTS
+        pixel_counts = heights * widths
+        means = gray.sum(axis=(1, 2), dtype=np.float64) / pixel_counts
+        variances = np.square(gray).sum(axis=(1, 2), dtype=np.float64) / pixel_counts - np.square(means)
+        stds = np.sqrt(np.maximum(variances, 0.0))
+        # 对比度较低或亮度异常的图片需要增强
+        low_quality = np.asarray(enhance) & ((stds < 30) | (means < 50) | (means > 200))
         
-        final_size = image.size
-        logger.info(f"最终图片尺寸: {final_size[0]}x{final_size[1]}")
+        for i in np.flatnonzero(low_quality):
+            region = batch[i, :heights[i], :widths[i]]
+            image = Image.fromarray(region)
+            # 增强20%对比度，再轻微增强锐度
+            image = ImageEnhance.Contrast(image).enhance(1.2)
+            image = ImageEnhance.Sharpness(image).enhance(1.1)
+            region[...] = np.asarray(image)
         
-        return image
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, (image, target) in enumerate(zip(images, resized)):
+                logger.debug(
+                    f"预处理图片 {i}: {image.size[0]}x{image.size[1]} -> {target.size[0]}x{target.size[1]}, "
+                    f"亮度={means[i]:.1f}, 对比度={stds[i]:.1f}, 增强={bool(low_quality[i])}"
+                )
+        
+        return [batch[i, :heights[i], :widths[i]] for i in range(len(resized))]
     
-    def predict(self, image: Image.Image, max_length: int = 512, enhance: bool = True) -> str:
+    def _batch_buffer(self, count: int, height: int, width: int) -> np.ndarray:
+        """返回当前线程复用的 (count, height, width, 3) 缓冲区，容量不足时扩容"""
+        buffer = getattr(self._buffers, "array", None)
+        if buffer is None or buffer.shape[0] < count or buffer.shape[1] < height or buffer.shape[2] < width:
+            capacity = buffer.shape[:3] if buffer is not None else (0, 0, 0)
+            buffer = np.empty(
+                (max(count, capacity[0]), max(height, capacity[1]), max(width, capacity[2]), 3),
+                dtype=np.uint8,
+            )
+            self._buffers.array = buffer
+        return buffer[:count, :height, :width]
+    
+    def predict(
+        self,
+        image: Image.Image,
+        max_length: int = 512,
+        enhance: bool = True,
+        decoding: Optional[str] = None,
+        adapter: Optional[str] = None,
+    ) -> str:
         """
         对图片进行 OCR 识别
         
@@ -160,36 +493,549 @@ class OCRModelWrapper:
             image: PIL Image 对象
             max_length: 生成的最大长度（默认512，支持更长的公式）
             enhance: 是否启用图片增强预处理
+            decoding: 解码策略，默认使用 default_decoding
+            adapter: 多适配器模式下使用的适配器，默认使用 default_adapter
         
         Returns:
             识别出的 LaTeX 代码字符串
         """
-        # 预处理图片
-        image = self._preprocess_image(image, enhance=enhance)
+        return self.predict_batch(
+            [image], max_length=max_length, enhance=enhance, decoding=decoding, adapter=adapter
+        )[0].latex
+    
+    def predict_batch(
+        self,
+        images: List[Image.Image],
+        max_length: int = 512,
+        enhance: Union[bool, List[bool]] = True,
+        decoding: Optional[str] = None,
+        adapter: Optional[str] = None,
+    ) -> List[OCRPrediction]:
+        """
+        批量 OCR 识别，整批只调用一次 model.generate（adaptive 模式下需要升级的图片再额外调用一次）
         
-        # 使用 image_processor 进行模型特定的预处理
-        pixel_values = self.image_processor(
-            images=[image], 
-            return_tensors="pt"
-        ).pixel_values.to(self.device)
+        Args:
+            images: PIL Image 对象列表
+            max_length: 生成的最大长度（整批共享）
+            enhance: 是否启用图片增强，可为单个布尔值或与 images 等长的列表
+            decoding: 解码策略 beam / greedy / adaptive，默认使用 default_decoding
+            adapter: 多适配器模式下使用的适配器（整批共享），默认使用 default_adapter
         
-        # 模型推理
+        Returns:
+            与 images 顺序一致的识别结果列表
+        """
+        if not images:
+            return []
+        decoding = decoding or self.default_decoding
+        if decoding not in DECODING_STRATEGIES:
+            raise ValueError(f"不支持的解码策略: {decoding}，可选: {', '.join(DECODING_STRATEGIES)}")
+        if isinstance(enhance, bool):
+            enhance = [enhance] * len(images)
+        
+        # 适配器只挂在 decoder 上，encoder 前向无需持有适配器锁
+        encoder_hidden_states, preprocess_ms, encode_ms = self._encoder_hidden_states(images, enhance)
+        
+        with self._adapter_context(adapter):
+            predictions = self._decode(encoder_hidden_states, max_length, decoding)
+        for prediction in predictions:
+            prediction.adapter = adapter or self.default_adapter
+            prediction.preprocess_ms = round(preprocess_ms, 2)
+            prediction.encode_ms = round(encode_ms, 2)
+        return predictions
+    
+    def predict_stream(
+        self,
+        image: Image.Image,
+        max_length: int = 512,
+        enhance: bool = True,
+        adapter: Optional[str] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Iterator[str]:
+        """
+        流式识别单张图片，边生成边产出解码后的 LaTeX 片段
+        
+        transformers 的 streamer 不支持 beam search，流式识别固定使用贪心解码。
+        
+        Args:
+            image: PIL Image 对象
+            max_length: 生成的最大长度
+            enhance: 是否启用图片增强预处理
+            adapter: 多适配器模式下使用的适配器
+            cancel_event: 被 set 后在下一个 token 处停止生成；迭代器提前关闭时也会自动停止
+        
+        Yields:
+            新生成的文本片段，拼接起来即完整结果
+        """
+        encoder_hidden_states, _, _ = self._encoder_hidden_states([image], [enhance])
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        cancel_event = cancel_event or threading.Event()
+        stopping_criteria = StoppingCriteriaList([_CancelCriteria(cancel_event)])
+        errors = []
+        
+        def run():
+            try:
+                with self._adapter_context(adapter), torch.no_grad():
+                    self.model.generate(
+                        encoder_outputs=BaseModelOutput(last_hidden_state=encoder_hidden_states),
+                        max_length=max_length,
+                        num_beams=1,
+                        streamer=streamer,
+                        stopping_criteria=stopping_criteria,
+                    )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()  # 唤醒正在等待的消费者
+        
+        thread = threading.Thread(target=run, name="ocr-stream-generate", daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+        finally:
+            # 消费方提前关闭（客户端断开）时停止生成，释放适配器锁
+            if thread.is_alive():
+                cancel_event.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+    
+    def _encoder_hidden_states(
+        self, images: List[Image.Image], enhance: List[bool]
+    ) -> Tuple[torch.Tensor, float, float]:
+        """
+        预处理并编码一批图片；预处理结果命中 encoder 特征缓存的图片跳过 encoder
+        
+        Returns:
+            (encoder last_hidden_state, 预处理耗时 ms, 编码耗时 ms)
+        """
+        start = time.perf_counter()
+        processed = self._preprocess_images(images, enhance)
+        if self.encoder_cache is not None:
+            keys = [EncoderFeatureCache.make_key(array) for array in processed]
+            hidden_states = [self.encoder_cache.get(key) for key in keys]
+        else:
+            keys, hidden_states = None, [None] * len(processed)
+        missing = [i for i, hidden in enumerate(hidden_states) if hidden is None]
+        pixel_values = self._pixel_values([processed[i] for i in missing]) if missing else None
+        preprocess_ms = self._elapsed_ms(start)
+        
+        start = time.perf_counter()
+        encoded = self._encode(pixel_values) if missing else None
+        if len(missing) == len(processed):
+            stacked = encoded
+        else:
+            # 部分命中：按原顺序拼回缓存中的与新算出的 hidden states
+            for j, i in enumerate(missing):
+                hidden_states[i] = encoded[j]
+            stacked = torch.stack(hidden_states)
+        if keys is not None:
+            for j, i in enumerate(missing):
+                # clone 出独立存储，避免缓存条目持有整批张量
+                hidden = encoded[j].clone()
+                self.encoder_cache.put(keys[i], hidden, hidden.element_size() * hidden.nelement())
+        encode_ms = self._elapsed_ms(start)
+        return stacked, preprocess_ms, encode_ms
+    
+    def _pixel_values(self, processed: List[np.ndarray]) -> torch.Tensor:
+        """将预处理后的图片数组转换为模型输入张量"""
+        # image_processor 会将每张图片缩放到模型输入尺寸，因此整批可直接堆叠
+        return self.image_processor(
+            images=processed, 
+            return_tensors="pt",
+            input_data_format="channels_last",
+        ).pixel_values.to(self.device, dtype=self.input_dtype)
+    
+    def _encode(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """运行视觉 encoder，返回 last_hidden_state，供一次或多次 generate 复用"""
+        with torch.no_grad():
+            return self.model.encoder(pixel_values=pixel_values, return_dict=True).last_hidden_state
+    
+    def _elapsed_ms(self, start: float) -> float:
+        """从 start 到现在的毫秒数；GPU 上先同步，保证计入已排队的 kernel"""
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+        return (time.perf_counter() - start) * 1000.0
+    
+    def generation_config(self) -> Dict:
+        """影响输出的默认生成参数，客户端将其纳入 OCR 结果缓存键"""
+        return {
+            "num_beams": self.num_beams,
+            "decoding": self.default_decoding,
+            "adaptive_min_confidence": self.adaptive_min_confidence,
+        }
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """服务端缓存的命中统计 {缓存名: {"hits": 命中次数, "misses": 未命中次数, ...}}，供 /metrics 输出"""
+        if self.encoder_cache is None:
+            return {}
+        return {"encoder": self.encoder_cache.stats()}
+    
+    def adapter_names(self) -> List[str]:
+        """可按请求选择的适配器名称；单适配器模式下为空"""
+        return []
+    
+    def _adapter_context(self, adapter: Optional[str]):
+        """生成期间启用指定适配器；单适配器模式下不接受 adapter 参数"""
+        if adapter is not None:
+            raise ValueError("当前服务只加载了单个模型，不支持 adapter 参数")
+        return contextlib.nullcontext()
+    
+    def _decode(self, encoder_hidden_states: torch.Tensor, max_length: int, decoding: str) -> List[OCRPrediction]:
+        """按解码策略生成结果"""
+        if decoding == "beam":
+            return self._generate(encoder_hidden_states, max_length, num_beams=self.num_beams)
+        
+        predictions = self._generate(encoder_hidden_states, max_length, num_beams=1)
+        if decoding == "greedy":
+            return predictions
+        
+        # adaptive：置信度低或未通过 LaTeX 校验的结果升级到 beam search
+        escalate = []
+        for i, prediction in enumerate(predictions):
+            if prediction.confidence is not None and prediction.confidence < self.adaptive_min_confidence:
+                prediction.issues.insert(0, f"置信度 {prediction.confidence:.3f} 低于 {self.adaptive_min_confidence}")
+            if prediction.issues:
+                escalate.append(i)
+        if not escalate:
+            return predictions
+        
+        # 升级的图片复用已算好的 encoder 输出，只重跑 decoder
+        greedy_ms = predictions[0].decode_ms
+        greedy_postprocess_ms = predictions[0].postprocess_ms
+        beam_predictions = self._generate(encoder_hidden_states[escalate], max_length, num_beams=self.num_beams)
+        for i, beam_prediction in zip(escalate, beam_predictions):
+            beam_prediction.decoding = "greedy+beam"
+            beam_prediction.escalated = True
+            beam_prediction.issues = predictions[i].issues
+            beam_prediction.decode_ms = round(beam_prediction.decode_ms + greedy_ms, 2)
+            beam_prediction.postprocess_ms = round(beam_prediction.postprocess_ms + greedy_postprocess_ms, 2)
+            predictions[i] = beam_prediction
+        logger.debug(f"adaptive 解码: {len(escalate)}/{len(predictions)} 张图片升级到 beam search")
+        return predictions
+    
+    def _generate(self, encoder_hidden_states: torch.Tensor, max_length: int, num_beams: int) -> List[OCRPrediction]:
+        """基于 encoder 输出运行一次生成，返回带置信度与开销的结果"""
+        start = time.perf_counter()
+        sequences, confidences = self._generate_sequences(encoder_hidden_states, max_length, num_beams)
+        decode_ms = self._elapsed_ms(start)
+        
+        token_counts = self._valid_token_mask(sequences).sum(dim=1)
+        has_eos = (sequences[:, 1:] == self.tokenizer.eos_token_id).any(dim=1)
+        hit_max_length = (~has_eos) & (sequences.shape[1] >= max_length)
+        
+        start = time.perf_counter()
+        texts = self.tokenizer.batch_decode(sequences, skip_special_tokens=True)
+        path = "beam" if num_beams > 1 else "greedy"
+        predictions = []
+        for i, text in enumerate(texts):
+            latex = text.strip()
+            predictions.append(OCRPrediction(
+                latex=latex,
+                decoding=path,
+                confidence=round(confidences[i], 4),
+                issues=latex_sanity_issues(latex, bool(hit_max_length[i])),
+                generated_tokens=int(token_counts[i]),
+                decode_ms=round(decode_ms, 2),
+            ))
+        postprocess_ms = round((time.perf_counter() - start) * 1000.0, 2)
+        for prediction in predictions:
+            prediction.postprocess_ms = postprocess_ms
+        return predictions
+    
+    def _valid_token_mask(self, sequences: torch.Tensor) -> torch.Tensor:
+        """有效 token：去掉 decoder_start_token 后，第一个 eos（含）之前的生成位置"""
+        is_eos = sequences[:, 1:] == self.tokenizer.eos_token_id
+        return (is_eos.cumsum(dim=1) - is_eos.long()) == 0
+    
+    def _generate_sequences(
+        self, encoder_hidden_states: torch.Tensor, max_length: int, num_beams: int
+    ) -> Tuple[torch.Tensor, List[float]]:
+        """
+        调用 model.generate
+        
+        Returns:
+            (含 decoder_start_token 的 token 序列, 每条序列的置信度)
+        """
         with torch.no_grad():
-            generated_ids = self.model.generate(
-                pixel_values, 
+            outputs = self.model.generate(
+                # 每次新建 BaseModelOutput：beam search 会原地替换其中的张量为扩展后的副本
+                encoder_outputs=BaseModelOutput(last_hidden_state=encoder_hidden_states),
                 max_length=max_length,
-                num_beams=5,  # 使用beam search提高质量
-                early_stopping=True
+                num_beams=num_beams,
+                early_stopping=num_beams > 1,
+                output_scores=True,
+                return_dict_in_generate=True,
             )
+        sequences = outputs.sequences
         
-        # 解码
-        latex_code = self.tokenizer.batch_decode(
-            generated_ids, 
-            skip_special_tokens=True
-        )[0].strip()
+        if num_beams > 1:
+            # beam search 直接给出长度归一化后的序列对数概率
+            confidences = outputs.sequences_scores.float().exp()
+        else:
+            log_probs = self.model.compute_transition_scores(
+                sequences, outputs.scores, normalize_logits=True
+            ).float()
+            step_valid = self._valid_token_mask(sequences)[:, -log_probs.shape[1]:]
+            log_probs = torch.where(step_valid, log_probs, torch.zeros_like(log_probs))
+            confidences = (log_probs.sum(dim=1) / step_valid.sum(dim=1).clamp(min=1)).exp()
+        return sequences, confidences.tolist()
+
+
+# 多适配器模式下表示不启用任何 LoRA 适配器、直接使用基础模型的保留名称
+BASE_ADAPTER = "base"
+
+
+class MultiAdapterOCRModelWrapper(OCRModelWrapper):
+    """
+    多适配器 OCR 模型封装
+    
+    内存中只保留一份基础模型，多个 LoRA 适配器以未合并形式挂在 decoder 上，
+    按请求切换，可在运行时加载/卸载。切换适配器会修改模型状态，
+    因此各批次的生成过程在适配器锁内串行执行。
+    """
+    
+    def __init__(
+        self,
+        adapters: Dict[str, str],
+        base_model_path: str = None,
+        device: str = None,
+        precision: str = "fp32",
+        intra_op_threads: int = None,
+        inter_op_threads: int = None,
+        default_adapter: str = None,
+        default_decoding: str = "beam",
+        adaptive_min_confidence: float = 0.9,
+        encoder_cache_bytes: int = 0,
+    ):
+        """
+        初始化基础模型并加载全部适配器
+        
+        Args:
+            adapters: {适配器名: LoRA checkpoint 目录}，按顺序加载
+            base_model_path: 基础模型路径，默认 MixTex/ZhEn-Latex-OCR
+            device: 设备 ('cuda' 或 'cpu')，默认自动检测
+            precision: 推理精度 fp32 / bf16（适配器未合并，不支持 int8-dynamic）
+            intra_op_threads: PyTorch 算子内线程数
+            inter_op_threads: PyTorch 算子间线程数
+            default_adapter: 请求未指定时使用的适配器，默认为第一个
+            default_decoding: 请求未指定时使用的解码策略
+            adaptive_min_confidence: adaptive 模式下贪心结果的最低置信度
+            encoder_cache_bytes: encoder 特征缓存的字节上限（适配器只作用于 decoder，各适配器共用缓存）
+        """
+        if not adapters:
+            raise ValueError("至少需要一个适配器")
+        if precision == "int8-dynamic":
+            raise ValueError("多适配器模式下 LoRA 未合并，不支持 int8-dynamic")
+        
+        self.base_model_path = base_model_path or DEFAULT_BASE_MODEL
+        self.adapter_dirs: Dict[str, str] = {}
+        self._adapter_lock = threading.RLock()
+        names = list(adapters)
+        self._initial_adapter = names[0]
+        
+        super().__init__(
+            checkpoint_dir=adapters[names[0]],
+            base_model_path=self.base_model_path,
+            device=device,
+            precision=precision,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            default_decoding=default_decoding,
+            adaptive_min_confidence=adaptive_min_confidence,
+            encoder_cache_bytes=encoder_cache_bytes,
+        )
+        self.model_ids = {
+            names[0]: self.model_id,
+            BASE_ADAPTER: self._suffixed_model_id(
+                hashlib.sha256(f"base:{self.base_model_path}".encode("utf-8")).hexdigest()[:16]
+            ),
+        }
+        for name in names[1:]:
+            self.load_adapter(name, adapters[name])
+        
+        self.default_adapter = default_adapter or names[0]
+        if self.default_adapter not in self.model_ids:
+            raise ValueError(f"默认适配器 {self.default_adapter} 不在已加载的适配器中")
+        self.model_id = self.model_ids[self.default_adapter]
+    
+    def _suffixed_model_id(self, model_id: str) -> str:
+        return model_id if self.precision == "fp32" else f"{model_id}-{self.precision}"
+    
+    @staticmethod
+    def _check_adapter_dir(checkpoint_dir: str):
+        if not os.path.exists(os.path.join(checkpoint_dir, "adapter_config.json")):
+            raise ValueError(f"{checkpoint_dir} 不是 LoRA 适配器目录（缺少 adapter_config.json）")
+    
+    def _load_model(self, checkpoint_dir: str, base_model_path: str = None, merged_model_dir: str = None):
+        """加载基础模型，并以未合并形式挂载第一个适配器"""
+        self._check_adapter_dir(checkpoint_dir)
+        logger.info(f"多适配器模式：从 {base_model_path} 加载基础模型...")
+        model = VisionEncoderDecoderModel.from_pretrained(base_model_path)
+        tokenizer = AutoTokenizer.from_pretrained(base_model_path)
+        image_processor = AutoImageProcessor.from_pretrained(base_model_path)
         
-        return latex_code
+        logger.info(f"挂载适配器 {self._initial_adapter}: {checkpoint_dir}")
+        model.decoder = PeftModel.from_pretrained(model.decoder, checkpoint_dir, adapter_name=self._initial_adapter)
+        self.adapter_dirs[self._initial_adapter] = checkpoint_dir
+        self.load_source = "adapters"
+        
+        model.to(self.device)
+        model.eval()
+        return model, tokenizer, image_processor
+    
+    def adapter_names(self) -> List[str]:
+        """已加载的适配器名称，另含表示基础模型的 base"""
+        return list(self.adapter_dirs) + [BASE_ADAPTER]
+    
+    def load_adapter(self, name: str, checkpoint_dir: str):
+        """
+        运行时加载一个 LoRA 适配器
+        
+        Args:
+            name: 适配器名称
+            checkpoint_dir: LoRA checkpoint 目录
+        """
+        if name == BASE_ADAPTER:
+            raise ValueError(f"{BASE_ADAPTER} 是保留名称，表示基础模型")
+        self._check_adapter_dir(checkpoint_dir)
+        with self._adapter_lock:
+            if name in self.adapter_dirs:
+                raise ValueError(f"适配器 {name} 已加载")
+            load_start = time.perf_counter()
+            self.model.decoder.load_adapter(checkpoint_dir, adapter_name=name)
+            # 新适配器的权重需与模型在同一设备、同一精度
+            self.model.to(device=self.device, dtype=self.input_dtype)
+            self.model.eval()
+            self.adapter_dirs[name] = checkpoint_dir
+            self.model_ids[name] = self._suffixed_model_id(compute_model_id(checkpoint_dir, self.base_model_path))
+        logger.info(f"适配器 {name} 加载完成（{checkpoint_dir}），耗时 {time.perf_counter() - load_start:.2f} 秒")
+    
+    def unload_adapter(self, name: str):
+        """卸载一个适配器（默认适配器不可卸载）"""
+        with self._adapter_lock:
+            if name not in self.adapter_dirs:
+                raise ValueError(f"未加载的适配器: {name}")
+            if name == self.default_adapter:
+                raise ValueError(f"不能卸载默认适配器 {name}")
+            self.model.decoder.delete_adapter(name)
+            del self.adapter_dirs[name]
+            del self.model_ids[name]
+        logger.info(f"适配器 {name} 已卸载")
+    
+    @contextlib.contextmanager
+    def _adapter_context(self, adapter: Optional[str]):
+        """持有适配器锁，在生成期间启用指定适配器（base 表示禁用全部适配器）"""
+        name = adapter or self.default_adapter
+        with self._adapter_lock:
+            if name == BASE_ADAPTER:
+                with self.model.decoder.disable_adapter():
+                    yield
+                return
+            if name not in self.adapter_dirs:
+                raise ValueError(f"未加载的适配器: {name}")
+            if self.model.decoder.active_adapter != name:
+                self.model.decoder.set_adapter(name)
+            yield
 
 
+def parse_adapters(raw: str) -> Dict[str, str]:
+    """解析 OCR_ADAPTERS：逗号分隔的 名称=checkpoint 目录"""
+    adapters = {}
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, path = entry.partition("=")
+        if not sep or not name.strip() or not path.strip():
+            raise ValueError(f"OCR_ADAPTERS 格式错误: {entry}，应为 名称=checkpoint 目录")
+        adapters[name.strip()] = path.strip()
+    return adapters
 
 
+def create_model_wrapper_from_env() -> OCRModelWrapper:
+    """
+    按 OCR_* 环境变量创建模型封装（OCR API 服务与 MixTexOCRTool 进程内后端共用）
+    
+    设置 OCR_ADAPTERS 时创建多适配器封装，否则加载 OCR_CHECKPOINT_DIR 指定的单个模型；
+    OCR_INFERENCE_BACKEND=onnx 时加载 OCR_ONNX_DIR 中指纹匹配的 ONNX 模型。
+    """
+    checkpoint_dir = os.getenv(
+        "OCR_CHECKPOINT_DIR",
+        # 默认加载最新的全量训练 LoRA 结果
+        "checkpoints/mixtex_lora_10k_final_tuned/epoch_2"
+    )
+    # 优先使用用户指定的基础模型；默认直接使用 HuggingFace 名称便于交付
+    base_model_path = os.getenv("OCR_BASE_MODEL_PATH", DEFAULT_BASE_MODEL)
+    device = os.getenv("OCR_DEVICE", None)  # None 表示自动检测
+    # CPU 部署可选 int8-dynamic 量化或 bf16，并显式设置线程数
+    precision = os.getenv("OCR_PRECISION", "fp32")
+    intra_op_threads = int(os.getenv("OCR_INTRA_OP_THREADS", 0)) or None
+    inter_op_threads = int(os.getenv("OCR_INTER_OP_THREADS", 0)) or None
+    # 默认解码策略；adaptive 先贪心，低置信度或 LaTeX 校验不通过时再走 beam search
+    default_decoding = os.getenv("OCR_DEFAULT_DECODING", "beam")
+    adaptive_min_confidence = float(os.getenv("OCR_ADAPTIVE_MIN_CONFIDENCE", 0.9))
+    # encoder 特征缓存（MB），同一图片重试时跳过 encoder；0 表示关闭
+    encoder_cache_bytes = int(float(os.getenv("OCR_ENCODER_CACHE_MB", 64)) * 1024 * 1024)
+    # 多适配器模式：共用一份基础模型，多个 LoRA 适配器不合并，按请求切换
+    adapters = parse_adapters(os.getenv("OCR_ADAPTERS", ""))
+    # 推理后端：torch（默认）或 onnx（scripts/export_onnx_ocr_model.py 导出）
+    inference_backend = os.getenv("OCR_INFERENCE_BACKEND", "torch")
+    if inference_backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"不支持的推理后端: {inference_backend}，可选: {', '.join(INFERENCE_BACKENDS)}")
+    
+    logger.info(f"基础模型路径: {base_model_path}")
+    if inference_backend == "onnx":
+        if adapters:
+            raise ValueError("ONNX Runtime 后端只支持合并后的单个模型，不能与 OCR_ADAPTERS 同时使用")
+        onnx_dir = os.getenv("OCR_ONNX_DIR") or f"{checkpoint_dir.rstrip('/')}_onnx"
+        stored = read_merge_fingerprint(onnx_dir)
+        expected = compute_merge_fingerprint(checkpoint_dir, base_model_path)
+        if stored == expected:
+            from ocr_onnx_backend import OnnxOCRModelWrapper
+            logger.info(f"使用 ONNX Runtime 后端: {onnx_dir}")
+            return OnnxOCRModelWrapper(
+                onnx_dir=onnx_dir,
+                device=device,
+                intra_op_threads=intra_op_threads,
+                inter_op_threads=inter_op_threads,
+                default_decoding=default_decoding,
+                adaptive_min_confidence=adaptive_min_confidence,
+                encoder_cache_bytes=encoder_cache_bytes,
+            )
+        if stored is None:
+            logger.warning(f"ONNX 模型目录 {onnx_dir} 不存在或缺少指纹，改用 PyTorch 后端")
+        else:
+            logger.warning(
+                f"ONNX 模型指纹不匹配（期望 {expected}，实际 {stored}），改用 PyTorch 后端；"
+                f"请重新运行 scripts/export_onnx_ocr_model.py"
+            )
+    if adapters:
+        logger.info(f"多适配器模式，加载适配器: {adapters}")
+        return MultiAdapterOCRModelWrapper(
+            adapters=adapters,
+            base_model_path=base_model_path,
+            device=device,
+            precision=precision,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            default_adapter=os.getenv("OCR_DEFAULT_ADAPTER") or None,
+            default_decoding=default_decoding,
+            adaptive_min_confidence=adaptive_min_confidence,
+            encoder_cache_bytes=encoder_cache_bytes,
+        )
+    
+    logger.info(f"加载模型 checkpoint: {checkpoint_dir}")
+    return OCRModelWrapper(
+        checkpoint_dir=checkpoint_dir,
+        base_model_path=base_model_path,
+        device=device,
+        precision=precision,
+        intra_op_threads=intra_op_threads,
+        inter_op_threads=inter_op_threads,
+        # 预合并模型目录（scripts/export_merged_ocr_model.py 导出），指纹匹配时跳过 LoRA 合并
+        merged_model_dir=os.getenv("OCR_MERGED_MODEL_DIR") or None,
+        default_decoding=default_decoding,
+        adaptive_min_confidence=adaptive_min_confidence,
+        encoder_cache_bytes=encoder_cache_bytes,
+    )
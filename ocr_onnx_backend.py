@@ -0,0 +1,313 @@
+"""
+OCR ONNX Runtime 推理后端
+加载 scripts/export_onnx_ocr_model.py 导出的 encoder / decoder / decoder-with-past，
+以 ONNX Runtime 执行，并用自带的贪心与 beam search 循环代替 model.generate
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+from transformers import AutoImageProcessor, AutoTokenizer
+
+from ocr_encoder_cache import EncoderFeatureCache
+from ocr_model_wrapper import (
+    DECODING_STRATEGIES,
+    MERGE_FINGERPRINT_FILE,
+    OCRModelWrapper,
+    logger,
+)
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+ONNX_ENCODER_FILE = "encoder_model.onnx"
+ONNX_DECODER_FILE = "decoder_model.onnx"
+ONNX_DECODER_WITH_PAST_FILE = "decoder_with_past_model.onnx"
+
+
+def past_input_names(num_layers: int, per_layer: int) -> List[str]:
+    """decoder-with-past 图的 KV 缓存输入名"""
+    return [f"past_key_values.{layer}.{i}" for layer in range(num_layers) for i in range(per_layer)]
+
+
+def present_output_names(num_layers: int, per_layer: int) -> List[str]:
+    """decoder 图输出的 KV 缓存名"""
+    return [f"present.{layer}.{i}" for layer in range(num_layers) for i in range(per_layer)]
+
+
+def _log_softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits.astype(np.float32, copy=False)
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+class OnnxOCRModelWrapper(OCRModelWrapper):
+    """
+    ONNX Runtime 推理后端
+
+    预处理、encoder 特征缓存、adaptive 解码与结果后处理沿用 OCRModelWrapper；
+    encoder 与逐步 decoder 由 ONNX Runtime 执行，解码循环在 numpy 中完成，
+    省去 PyTorch generate 在 CPU 上每一步的调度开销。只支持 fp32 与单适配器（合并后的模型）。
+    """
+
+    def __init__(
+        self,
+        onnx_dir: str,
+        device: str = None,
+        intra_op_threads: int = None,
+        inter_op_threads: int = None,
+        default_decoding: str = "beam",
+        adaptive_min_confidence: float = 0.9,
+        encoder_cache_bytes: int = 0,
+    ):
+        """
+        加载 ONNX 模型
+
+        Args:
+            onnx_dir: scripts/export_onnx_ocr_model.py 的导出目录
+            device: cpu 或 cuda（cuda 需安装 onnxruntime-gpu），默认 cpu
+            intra_op_threads: ONNX Runtime 算子内线程数，默认由 ONNX Runtime 决定
+            inter_op_threads: ONNX Runtime 算子间线程数，默认由 ONNX Runtime 决定
+            default_decoding: 请求未指定时使用的解码策略（beam / greedy / adaptive）
+            adaptive_min_confidence: adaptive 模式下贪心结果的最低置信度
+            encoder_cache_bytes: encoder 特征缓存的字节上限，0 表示不缓存
+        """
+        if ort is None:
+            raise ImportError("ONNX Runtime 后端需要安装 onnxruntime（GPU 推理安装 onnxruntime-gpu）")
+        if default_decoding not in DECODING_STRATEGIES:
+            raise ValueError(f"不支持的解码策略: {default_decoding}，可选: {', '.join(DECODING_STRATEGIES)}")
+        self.default_decoding = default_decoding
+        self.adaptive_min_confidence = adaptive_min_confidence
+        self._buffers = threading.local()
+        self.encoder_cache = EncoderFeatureCache(encoder_cache_bytes) if encoder_cache_bytes > 0 else None
+
+        # ONNX Runtime 的输入输出都在主机内存中，torch 张量只用于与基类交换数据
+        self.device = torch.device("cpu")
+        self.precision = "fp32"
+        self.input_dtype = torch.float32
+
+        with open(os.path.join(onnx_dir, MERGE_FINGERPRINT_FILE), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        settings = metadata["onnx"]
+        self.decoder_start_token_id = settings["decoder_start_token_id"]
+        self.eos_token_id = settings["eos_token_id"]
+        self.pad_token_id = settings["pad_token_id"]
+        self.length_penalty = settings["length_penalty"]
+        self._past_names = past_input_names(settings["num_layers"], settings["kv_per_layer"])
+
+        load_start = time.perf_counter()
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        providers = ["CPUExecutionProvider"]
+        if device == "cuda":
+            providers.insert(0, "CUDAExecutionProvider")
+        self._encoder = ort.InferenceSession(os.path.join(onnx_dir, ONNX_ENCODER_FILE), options, providers=providers)
+        self._decoder = ort.InferenceSession(os.path.join(onnx_dir, ONNX_DECODER_FILE), options, providers=providers)
+        self._decoder_with_past = ort.InferenceSession(
+            os.path.join(onnx_dir, ONNX_DECODER_WITH_PAST_FILE), options, providers=providers
+        )
+        # 导出时未被使用的输入（如缓存了 cross-attention KV 后的 encoder_hidden_states）会被裁掉
+        self._decoder_inputs = {i.name for i in self._decoder.get_inputs()}
+        self._decoder_with_past_inputs = {i.name for i in self._decoder_with_past.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.image_processor = AutoImageProcessor.from_pretrained(onnx_dir)
+        self.load_seconds = time.perf_counter() - load_start
+        self.load_source = "onnx"
+
+        # 数值与 PyTorch 略有差异，模型标识单独区分，避免与 PyTorch 后端共用结果缓存
+        self.model_id = f"{metadata['fingerprint']['checkpoint_id']}-onnx"
+        self.model_ids: Dict[str, str] = {}
+        logger.info(
+            f"ONNX Runtime 后端加载完成（{onnx_dir}，providers={self._encoder.get_providers()}），"
+            f"耗时 {self.load_seconds:.2f} 秒，模型标识: {self.model_id}"
+        )
+
+    def _encode(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        """以 ONNX Runtime 运行 encoder"""
+        hidden = self._encoder.run(None, {"pixel_values": pixel_values.numpy()})[0]
+        return torch.from_numpy(hidden)
+
+    def _decoder_step(
+        self, input_ids: np.ndarray, encoder_hidden_states: np.ndarray, past: Optional[Sequence[np.ndarray]]
+    ) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """运行一步 decoder，返回 (最后一个位置的 logits, present KV 列表)"""
+        feed = {"input_ids": input_ids, "encoder_hidden_states": encoder_hidden_states}
+        if past is None:
+            session, accepted = self._decoder, self._decoder_inputs
+        else:
+            session, accepted = self._decoder_with_past, self._decoder_with_past_inputs
+            feed.update(zip(self._past_names, past))
+        outputs = session.run(None, {name: value for name, value in feed.items() if name in accepted})
+        return outputs[0][:, -1, :], outputs[1:]
+
+    def _generate_sequences(
+        self, encoder_hidden_states: torch.Tensor, max_length: int, num_beams: int
+    ) -> Tuple[torch.Tensor, List[float]]:
+        """与 OCRModelWrapper._generate_sequences 相同的语义，解码循环在 numpy 中完成"""
+        hidden = encoder_hidden_states.numpy()
+        if num_beams > 1:
+            sequences, confidences = self._beam_search(hidden, max_length, num_beams)
+        else:
+            sequences, confidences = self._greedy(hidden, max_length)
+        return torch.from_numpy(sequences), confidences
+
+    def _iter_greedy(
+        self, encoder_hidden_states: np.ndarray, max_length: int, cancel_event: Optional[threading.Event] = None
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        逐步贪心解码
+
+        Yields:
+            (本步 token，已结束的序列为 pad_token_id；本步 token 的对数概率；本步之前是否未结束)
+        """
+        batch = encoder_hidden_states.shape[0]
+        input_ids = np.full((batch, 1), self.decoder_start_token_id, dtype=np.int64)
+        unfinished = np.ones(batch, dtype=bool)
+        past = None
+        length = 1
+        while length < max_length:
+            logits, past = self._decoder_step(input_ids, encoder_hidden_states, past)
+            log_probs = _log_softmax(logits)
+            next_tokens = log_probs.argmax(axis=-1)
+            token_log_probs = log_probs[np.arange(batch), next_tokens]
+            next_tokens = np.where(unfinished, next_tokens, self.pad_token_id)
+            yield next_tokens, token_log_probs, unfinished.copy()
+            unfinished &= next_tokens != self.eos_token_id
+            length += 1
+            if not unfinished.any() or (cancel_event is not None and cancel_event.is_set()):
+                break
+            input_ids = next_tokens[:, None].astype(np.int64)
+
+    def _greedy(self, encoder_hidden_states: np.ndarray, max_length: int) -> Tuple[np.ndarray, List[float]]:
+        """贪心解码；置信度为有效 token（含 eos）的平均概率，与 PyTorch 后端一致"""
+        batch = encoder_hidden_states.shape[0]
+        steps = [np.full(batch, self.decoder_start_token_id, dtype=np.int64)]
+        log_prob_sums = np.zeros(batch, dtype=np.float64)
+        counts = np.zeros(batch, dtype=np.int64)
+        for next_tokens, token_log_probs, active in self._iter_greedy(encoder_hidden_states, max_length):
+            steps.append(next_tokens.astype(np.int64))
+            log_prob_sums += np.where(active, token_log_probs, 0.0)
+            counts += active
+        confidences = np.exp(log_prob_sums / np.maximum(counts, 1))
+        return np.stack(steps, axis=1), confidences.tolist()
+
+    def _beam_search(
+        self, encoder_hidden_states: np.ndarray, max_length: int, num_beams: int
+    ) -> Tuple[np.ndarray, List[float]]:
+        """
+        beam search（early_stopping=True 语义）：每个样本凑满 num_beams 个结束假设即停止
+
+        假设得分 = 对数概率之和 / 生成长度 ** length_penalty，与 transformers 的 sequences_scores 一致
+        """
+        batch, beams = encoder_hidden_states.shape[0], num_beams
+        hidden = np.repeat(encoder_hidden_states, beams, axis=0)
+        sequences = np.full((batch * beams, 1), self.decoder_start_token_id, dtype=np.int64)
+        # 初始时每个样本只有第一条 beam 有效，避免选出重复的候选
+        beam_scores = np.zeros((batch, beams), dtype=np.float64)
+        beam_scores[:, 1:] = -1e9
+        beam_scores = beam_scores.reshape(-1)
+        hypotheses: List[List[Tuple[float, np.ndarray]]] = [[] for _ in range(batch)]
+        done = np.zeros(batch, dtype=bool)
+        past = None
+
+        while sequences.shape[1] < max_length:
+            input_ids = sequences if past is None else sequences[:, -1:]
+            logits, past = self._decoder_step(input_ids, hidden, past)
+            scores = _log_softmax(logits).astype(np.float64) + beam_scores[:, None]
+            vocab_size = scores.shape[-1]
+            scores = scores.reshape(batch, beams * vocab_size)
+            # 每个样本取前 2 * beams 个候选，保证去掉 eos 后仍有 beams 个可延续
+            top = np.argpartition(-scores, 2 * beams, axis=1)[:, :2 * beams]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            next_scores = np.zeros((batch, beams), dtype=np.float64)
+            next_tokens = np.full((batch, beams), self.pad_token_id, dtype=np.int64)
+            next_sources = np.repeat(np.arange(batch)[:, None] * beams, beams, axis=1)
+            # 结束假设的生成长度计入 eos（不含起始 token），与 transformers 的 BeamSearchScorer 一致
+            generated_length = sequences.shape[1]
+            for b in range(batch):
+                if done[b]:
+                    continue
+                filled = 0
+                for rank in range(2 * beams):
+                    source = b * beams + top[b, rank] // vocab_size
+                    token = top[b, rank] % vocab_size
+                    if token == self.eos_token_id:
+                        # 排在 beams 名之外的 eos 不计入结束假设
+                        if rank < beams:
+                            score = top_scores[b, rank] / (generated_length ** self.length_penalty)
+                            hypotheses[b].append((score, sequences[source].copy()))
+                        continue
+                    next_scores[b, filled] = top_scores[b, rank]
+                    next_tokens[b, filled] = token
+                    next_sources[b, filled] = source
+                    filled += 1
+                    if filled == beams:
+                        break
+                if len(hypotheses[b]) >= beams:
+                    done[b] = True
+            if done.all():
+                break
+            sources = next_sources.reshape(-1)
+            sequences = np.concatenate([sequences[sources], next_tokens.reshape(-1, 1)], axis=1)
+            beam_scores = next_scores.reshape(-1)
+            past = [tensor[sources] for tensor in past]
+
+        # 达到 max_length 仍未结束的样本，以当前各 beam 作为候选假设
+        for b in range(batch):
+            if done[b]:
+                continue
+            for k in range(beams):
+                index = b * beams + k
+                score = beam_scores[index] / (max(sequences.shape[1] - 1, 1) ** self.length_penalty)
+                hypotheses[b].append((score, sequences[index].copy()))
+
+        best = [max(candidates, key=lambda item: item[0]) for candidates in hypotheses]
+        # 结束的假设补上 eos，再按最长序列右侧填充 pad
+        outputs = []
+        for _, tokens in best:
+            if len(tokens) < max_length:
+                tokens = np.append(tokens, self.eos_token_id)
+            outputs.append(tokens)
+        width = max(len(tokens) for tokens in outputs)
+        padded = np.full((batch, width), self.pad_token_id, dtype=np.int64)
+        for b, tokens in enumerate(outputs):
+            padded[b, :len(tokens)] = tokens
+        return padded, [float(np.exp(score)) for score, _ in best]
+
+    def predict_stream(
+        self,
+        image: Image.Image,
+        max_length: int = 512,
+        enhance: bool = True,
+        adapter: Optional[str] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Iterator[str]:
+        """流式识别单张图片（贪心解码），语义与 OCRModelWrapper.predict_stream 相同"""
+        self._adapter_context(adapter)  # 只有合并后的单个模型，传入 adapter 时报错
+        encoder_hidden_states, _, _ = self._encoder_hidden_states([image], [enhance])
+        token_ids: List[int] = []
+        emitted = ""
+        for next_tokens, _, _ in self._iter_greedy(encoder_hidden_states.numpy(), max_length, cancel_event):
+            token = int(next_tokens[0])
+            if token == self.eos_token_id:
+                break
+            token_ids.append(token)
+            text = self.tokenizer.decode(token_ids, skip_special_tokens=True)
+            # 末尾为不完整的多字节字符时暂不输出，等待后续 token
+            if len(text) > len(emitted) and not text.endswith("�"):
+                yield text[len(emitted):]
+                emitted = text
@@ -0,0 +1,164 @@
+"""
+OCR 分块识别模块
+将多行公式图片按水平空白行切成逐行条带，分别识别后拼接为 aligned 环境
+"""
+import dataclasses
+import re
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# 与背景灰度差超过该值的像素视为笔画
+INK_THRESHOLD = 40
+# 小于该行数的空白视为噪声，不作为切分候选
+MIN_GAP_ROWS = 3
+# 可切分的空白至少为参考笔画带高度（75 分位）的该比例
+GAP_TO_BAND_RATIO = 0.4
+# 低于参考高度该比例的笔画带（分数线、上下划线）不与相邻笔画带切开
+THIN_BAND_RATIO = 0.25
+# 单张图片最多切分的条带数
+MAX_TILES = 32
+
+_ENVIRONMENT_WRAPPER = re.compile(r"^\\begin\{(aligned|align\*?|gathered|split|eqnarray\*?)\}(.*)\\end\{\1\}$", re.S)
+
+
+def _ink_rows(image: Image.Image) -> np.ndarray:
+    """返回每一行是否含有笔画的布尔数组"""
+    gray = np.asarray(image.convert("L"), dtype=np.int16)
+    # 以中位灰度作为背景，兼容白底黑字与深色背景
+    background = np.median(gray)
+    ink = np.abs(gray - background) > INK_THRESHOLD
+    return ink.any(axis=1)
+
+
+def find_line_bands(image: Image.Image, max_tiles: int = MAX_TILES) -> List[Tuple[int, int]]:
+    """
+    用水平投影找出公式的各行位置
+
+    Args:
+        image: 公式图片
+        max_tiles: 最多切分的条带数，超出时不切分
+
+    Returns:
+        [(top, bottom), ...] 行区间列表（bottom 不含）；无法切分时只有一个区间
+    """
+    rows = _ink_rows(image)
+    height = len(rows)
+    ink_indices = np.flatnonzero(rows)
+    if len(ink_indices) == 0:
+        return [(0, height)]
+
+    # 连续笔画行组成的笔画带，忽略过窄的噪声空白
+    breaks = np.flatnonzero(np.diff(ink_indices) > MIN_GAP_ROWS)
+    starts = np.concatenate(([ink_indices[0]], ink_indices[breaks + 1]))
+    ends = np.concatenate((ink_indices[breaks] + 1, [ink_indices[-1] + 1]))
+    if len(starts) < 2:
+        return [(0, height)]
+
+    # 只在明显大于行内间距的空白处切分，且分数线等细笔画带两侧不切，
+    # 避免把分子、分数线、分母切成不同条带
+    heights = ends - starts
+    reference = float(np.percentile(heights, 75))
+    min_gap = max(MIN_GAP_ROWS + 1, GAP_TO_BAND_RATIO * reference)
+    thin = heights < THIN_BAND_RATIO * reference
+    gaps = starts[1:] - ends[:-1]
+    split_after = np.flatnonzero((gaps >= min_gap) & ~thin[:-1] & ~thin[1:])
+    if len(split_after) == 0 or len(split_after) + 1 > max_tiles:
+        return [(0, height)]
+
+    # 切分点取空白中点，使每个条带两侧都保留一半空白作为边距
+    cuts = [0] + [int((ends[i] + starts[i + 1]) // 2) for i in split_after] + [height]
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def split_formula_lines(image: Image.Image, max_tiles: int = MAX_TILES) -> List[Image.Image]:
+    """
+    按行切分多行公式图片
+
+    Returns:
+        逐行条带图片列表；无法切分时返回只含原图的列表
+    """
+    bands = find_line_bands(image, max_tiles=max_tiles)
+    if len(bands) == 1:
+        return [image]
+    width = image.size[0]
+    return [image.crop((0, top, width, bottom)) for top, bottom in bands]
+
+
+def _top_level_index(latex: str, token: str) -> int:
+    """返回 token 在花括号之外第一次出现的位置，不存在时返回 -1"""
+    depth = 0
+    i = 0
+    while i < len(latex):
+        char = latex[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0 and latex.startswith(token, i):
+            return i
+        i += 1
+    return -1
+
+
+def _clean_line(latex: str) -> str:
+    """去掉单行结果外层的数学定界符、环境与行尾换行符"""
+    line = latex.strip()
+    for left, right in (("$$", "$$"), ("\\[", "\\]"), ("$", "$")):
+        if line.startswith(left) and line.endswith(right) and len(line) >= len(left) + len(right):
+            line = line[len(left):len(line) - len(right)].strip()
+            break
+    match = _ENVIRONMENT_WRAPPER.match(line)
+    if match:
+        line = match.group(2).strip()
+    while line.endswith("\\\\"):
+        line = line[:-2].rstrip()
+    return line
+
+
+def stitch_aligned(lines: Sequence[str]) -> str:
+    """
+    将逐行识别结果拼接为 aligned 环境
+
+    各行都没有对齐符 & 时，在每行花括号外的第一个 = 前插入 &。
+    """
+    cleaned = [line for line in (_clean_line(latex) for latex in lines) if line]
+    if len(cleaned) <= 1:
+        return cleaned[0] if cleaned else ""
+    if not any("&" in line for line in cleaned):
+        aligned = []
+        for line in cleaned:
+            index = _top_level_index(line, "=")
+            aligned.append(line if index < 0 else f"{line[:index]}&{line[index:]}")
+        cleaned = aligned
+    body = " \\\\\n".join(cleaned)
+    return f"\\begin{{aligned}}\n{body}\n\\end{{aligned}}"
+
+
+def merge_tile_predictions(predictions: Sequence) -> object:
+    """
+    合并同一张图片各条带的识别结果（OCRPrediction），latex 为拼接后的 aligned 环境
+
+    置信度取各条带最小值，各阶段耗时取最大值（条带在同一批或并发批次中处理）。
+    """
+    first = predictions[0]
+    decodings = {p.decoding for p in predictions}
+    confidences = [p.confidence for p in predictions if p.confidence is not None]
+    return dataclasses.replace(
+        first,
+        latex=stitch_aligned([p.latex for p in predictions]),
+        decoding=first.decoding if len(decodings) == 1 else "mixed",
+        confidence=min(confidences) if confidences else None,
+        escalated=any(p.escalated for p in predictions),
+        issues=[issue for p in predictions for issue in p.issues],
+        generated_tokens=sum(p.generated_tokens for p in predictions),
+        decode_ms=max(p.decode_ms for p in predictions),
+        preprocess_ms=max(p.preprocess_ms for p in predictions),
+        encode_ms=max(p.encode_ms for p in predictions),
+        postprocess_ms=max(p.postprocess_ms for p in predictions),
+        queue_wait_ms=max(p.queue_wait_ms for p in predictions),
+    )
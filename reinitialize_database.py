@@ -5,8 +5,6 @@
 import sys
 import os
 import shutil
-import json
-import re
 
 # 添加 src 目录到 Python 路径
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -17,56 +15,7 @@ sys.path.insert(0, src_path)
 import chromadb
 from chromadb.config import Settings
 
-def extract_template_knowledge():
-    """直接从文件提取 LATEX_TEMPLATE_KNOWLEDGE 数据"""
-    knowledge_file = os.path.join(src_path, "autolatex", "tools", "knowledge_base.py")
-    
-    with open(knowledge_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 使用正则表达式找到 LATEX_TEMPLATE_KNOWLEDGE = [...] 的部分
-    # 匹配从 LATEX_TEMPLATE_KNOWLEDGE = [ 开始到对应的 ] 结束
-    pattern = r'LATEX_TEMPLATE_KNOWLEDGE\s*=\s*\['
-    match = re.search(pattern, content)
-    
-    if not match:
-        raise ValueError("Cannot find LATEX_TEMPLATE_KNOWLEDGE in file")
-    
-    start_idx = match.end() - 1  # 包含 [
-    
-    # 找到匹配的结束括号
-    bracket_count = 0
-    end_idx = start_idx
-    
-    for i, char in enumerate(content[start_idx:], start_idx):
-        if char == '[':
-            bracket_count += 1
-        elif char == ']':
-            bracket_count -= 1
-            if bracket_count == 0:
-                end_idx = i + 1
-                break
-    
-    # 提取列表字符串
-    list_str = content[start_idx:end_idx]
-    
-    # 创建一个安全的执行环境
-    safe_dict = {
-        '__builtins__': {
-            'True': True,
-            'False': False,
-            'None': None,
-        }
-    }
-    
-    # 执行提取的代码
-    try:
-        exec(f"LATEX_TEMPLATE_KNOWLEDGE = {list_str}", safe_dict)
-        return safe_dict['LATEX_TEMPLATE_KNOWLEDGE']
-    except Exception as e:
-        print(f"解析模板数据时出错: {e}")
-        # 如果失败，尝试使用 json（但需要先转换）
-        raise
+from autolatex.tools.knowledge_pack import get_template_pack
 
 def reinitialize_database():
     """重新初始化数据库"""
@@ -103,9 +52,10 @@ def reinitialize_database():
     
     # 提取模板数据
     print("正在读取模板数据...")
+    pack = get_template_pack()
     try:
-        LATEX_TEMPLATE_KNOWLEDGE = extract_template_knowledge()
-        print(f"✅ 成功读取 {len(LATEX_TEMPLATE_KNOWLEDGE)} 个模板")
+        entries = pack.entries()
+        print(f"✅ 成功读取 {len(entries)} 个模板（数据包版本 {pack.version}）")
     except Exception as e:
         print(f"❌ 读取模板数据失败: {e}")
         import traceback
@@ -114,9 +64,9 @@ def reinitialize_database():
     
     # 添加所有模板
     print("\n正在添加模板到数据库...")
-    documents = [item["document"] for item in LATEX_TEMPLATE_KNOWLEDGE]
-    metadatas = [item["metadata"] for item in LATEX_TEMPLATE_KNOWLEDGE]
-    ids = [f"template_{item['journal'].lower().replace(' ', '_')}" for item in LATEX_TEMPLATE_KNOWLEDGE]
+    documents = [document for document, _ in entries.values()]
+    metadatas = [metadata for _, metadata in entries.values()]
+    ids = list(entries)
     
     collection.add(
         documents=documents,
@@ -131,8 +81,8 @@ def reinitialize_database():
     # 列出所有模板
     print("\n模板列表:")
     print("-" * 60)
-    for item in LATEX_TEMPLATE_KNOWLEDGE:
-        print(f"  - {item['journal']}")
+    for journal_name in pack.journal_names():
+        print(f"  - {journal_name}")
     
     # 测试搜索
     print("\n" + "=" * 60)
@@ -0,0 +1,81 @@
+"""
+知识库搜索延迟对比：每次调用都初始化知识库（旧实现） vs 进程内共享的 KnowledgeBaseService
+
+旧实现每次搜索都会新建 PersistentClient、逐个检查模板 ID、重写 BIThesis 条目，
+再用 collection.get() 拉取全部文档做精确匹配；新实现只初始化一次，精确命中为字典查找，
+只有模糊查询才走向量检索。
+
+示例：
+    python scripts/bench_knowledge_base_search.py --repeat 20
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_PATH = PROJECT_ROOT / "src"
+if str(SRC_PATH) not in sys.path:
+    sys.path.insert(0, str(SRC_PATH))
+
+from autolatex.tools.knowledge_base import (
+    KnowledgeBaseService,
+    _normalize_journal_name,
+    get_all_journal_names,
+    initialize_knowledge_base,
+)
+
+# 模糊查询：不与任何期刊名完全一致
+FUZZY_QUERIES = ["IEEE", "computer vision conference", "Nature 子刊", "北理工 毕业论文"]
+
+
+def legacy_search(persist_directory: str, journal_name: str, n_results: int = 3):
+    """旧实现的调用路径：每次初始化 + 全量读取做精确匹配 + 向量检索"""
+    db = initialize_knowledge_base(persist_directory)
+    query = _normalize_journal_name(journal_name)
+    exact = any(
+        _normalize_journal_name(metadata.get("journal_name", "")) == query
+        for _, _, metadata in db.get_all_entries()
+    )
+    db.search(query=journal_name, n_results=n_results * 2)
+    return exact
+
+
+def _timed(fn, queries, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<28} 平均 {statistics.mean(samples):8.2f} ms   中位数 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库搜索延迟对比")
+    parser.add_argument("--persist-directory", type=str, default="data/vector_db", help="向量数据库目录")
+    parser.add_argument("--repeat", type=int, default=10, help="每个查询重复次数")
+    args = parser.parse_args()
+
+    exact_queries = get_all_journal_names()
+    print(f"精确查询 {len(exact_queries)} 个，模糊查询 {len(FUZZY_QUERIES)} 个，各重复 {args.repeat} 次\n")
+
+    _report("旧实现（精确查询）", _timed(lambda q: legacy_search(args.persist_directory, q), exact_queries, args.repeat))
+    _report("旧实现（模糊查询）", _timed(lambda q: legacy_search(args.persist_directory, q), FUZZY_QUERIES, args.repeat))
+
+    start = time.perf_counter()
+    service = KnowledgeBaseService(args.persist_directory)
+    print(f"\nKnowledgeBaseService 初始化耗时 {(time.perf_counter() - start) * 1000:.2f} ms（进程内一次）")
+    _report("新实现（精确查询）", _timed(service.search, exact_queries, args.repeat))
+    _report("新实现（模糊查询）", _timed(service.search, FUZZY_QUERIES, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+向量数据库后端对比：ChromaDB vs NumPy 平铺索引
+
+每个后端在独立子进程中测量：
+    - 导入耗时（导入后端模块及其依赖）
+    - 建库后的常驻内存（RSS）
+    - 查询延迟（查询向量预先算好，只计检索本身）
+两个后端使用同一个确定性的哈希嵌入，索引完全相同的向量，结果只反映后端本身的开销。
+
+示例：
+    python scripts/bench_vector_backends.py --num-documents 50 --queries 2000
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_PATH = PROJECT_ROOT / "src"
+if str(SRC_PATH) not in sys.path:
+    sys.path.insert(0, str(SRC_PATH))
+
+BACKENDS = ("chroma", "numpy")
+EMBEDDING_DIM = 384  # 与 all-MiniLM-L6-v2 相同
+
+
+def _rss_mb() -> float:
+    """当前进程的常驻内存（MB），无法获取时返回 -1"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return -1.0
+
+
+def _child(backend: str, num_documents: int, num_queries: int) -> dict:
+    """在子进程中运行：导入、建库、查询"""
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if backend == "chroma":
+        from autolatex.tools.vector_db import VectorDatabase as Database
+    else:
+        from autolatex.tools.numpy_vector_db import NumpyVectorDatabase as Database
+    import_ms = (time.perf_counter() - start) * 1000
+
+    import numpy as np
+    from autolatex.tools.embeddings import Embedder
+    from autolatex.tools.knowledge_base import template_entries
+
+    class HashEmbedder(Embedder):
+        """由文本哈希生成的确定性随机向量，只用于测量后端开销"""
+
+        name = "bench-hash"
+
+        def embed_documents(self, texts):
+            vectors = []
+            for text in texts:
+                seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+                vectors.append(np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).tolist())
+            return vectors
+
+    embedder = HashEmbedder()
+    entries = list(template_entries().values())
+    documents, metadatas, ids = [], [], []
+    for i in range(num_documents):
+        document, metadata = entries[i % len(entries)]
+        documents.append(f"{document}\n#{i}")
+        metadatas.append(metadata)
+        ids.append(f"doc_{i}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        db = Database(persist_directory=directory, embedder=embedder)
+        db.add_documents(documents=documents, metadatas=metadatas, ids=ids)
+        build_ms = (time.perf_counter() - start) * 1000
+        rss_after = _rss_mb()
+
+        queries = embedder.embed_documents([f"query {i}" for i in range(min(num_queries, 64))])
+        for query in queries[:8]:  # 预热
+            db.search_by_embedding(query, n_results=3)
+        samples = []
+        for i in range(num_queries):
+            start = time.perf_counter()
+            db.search_by_embedding(queries[i % len(queries)], n_results=3)
+            samples.append((time.perf_counter() - start) * 1000)
+        del db
+
+    samples.sort()
+    return {
+        "backend": backend,
+        "import_ms": import_ms,
+        "build_ms": build_ms,
+        "rss_mb": rss_after,
+        "rss_delta_mb": rss_after - rss_before if rss_before >= 0 else -1.0,
+        "query_mean_ms": statistics.mean(samples),
+        "query_p50_ms": samples[len(samples) // 2],
+        "query_p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量数据库后端对比（ChromaDB vs NumPy）")
+    parser.add_argument("--num-documents", type=int, default=50, help="索引中的文档数")
+    parser.add_argument("--queries", type=int, default=1000, help="查询次数")
+    parser.add_argument("--backends", type=str, default=",".join(BACKENDS), help="逗号分隔的后端列表")
+    parser.add_argument("--child", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.num_documents, args.queries)))
+        return
+
+    rows = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--child", backend,
+             "--num-documents", str(args.num_documents), "--queries", str(args.queries)],
+            capture_output=True, text=True, cwd=str(PROJECT_ROOT), env=dict(os.environ),
+        )
+        if completed.returncode != 0:
+            print(f"[{backend}] 运行失败:\n{completed.stderr.strip()}")
+            continue
+        rows.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"文档数 {args.num_documents}，查询 {args.queries} 次（top-3）\n")
+    print(f"{'后端':<8}{'导入(ms)':>10}{'建库(ms)':>10}{'RSS(MB)':>10}{'RSS增量(MB)':>13}"
+          f"{'查询均值(ms)':>14}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for row in rows:
+        print(f"{row['backend']:<8}{row['import_ms']:>10.1f}{row['build_ms']:>10.1f}{row['rss_mb']:>10.1f}"
+              f"{row['rss_delta_mb']:>13.1f}{row['query_mean_ms']:>14.4f}{row['query_p50_ms']:>10.4f}"
+              f"{row['query_p95_ms']:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+构建并校验 LaTeX 模板知识数据包
+
+读取 src/autolatex/tools/data/knowledge_pack/source/ 中的条目源文件，校验后写出
+templates.jsonl 与 index.json（含向量数据库同步所用的 content_hash）。
+修改或新增模板条目后运行本脚本；内容变化的条目会在服务下次启动同步时更新到向量数据库。
+条目内容变化后如使用了预计算向量，还需重新运行 scripts/precompute_template_embeddings.py。
+
+示例：
+    python scripts/build_knowledge_pack.py
+    python scripts/build_knowledge_pack.py --check   # 只校验现有数据包，不写文件
+"""
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_PATH = PROJECT_ROOT / "src"
+if str(SRC_PATH) not in sys.path:
+    sys.path.insert(0, str(SRC_PATH))
+
+from autolatex.tools.knowledge_pack import DEFAULT_PACK_DIR, TemplatePack, build_pack
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建并校验模板知识数据包")
+    parser.add_argument("--pack-dir", type=str, default=DEFAULT_PACK_DIR, help="数据包目录")
+    parser.add_argument("--source-dir", type=str, default=None, help="条目源文件目录，默认 <pack-dir>/source")
+    parser.add_argument("--check", action="store_true", help="只校验现有数据包")
+    args = parser.parse_args()
+
+    if not args.check:
+        try:
+            index = build_pack(args.pack_dir, args.source_dir)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"已构建数据包 {args.pack_dir}（版本 {index['version']}，{len(index['entries'])} 个条目）")
+
+    pack = TemplatePack(args.pack_dir)
+    errors = pack.validate()
+    if errors:
+        print("❌ 数据包校验失败:")
+        for error in errors:
+            print(f"  - {error}")
+        sys.exit(1)
+    print(f"✅ 数据包校验通过（版本 {pack.version}）")
+    for entry_id, content_hash in pack.content_hashes().items():
+        print(f"  {entry_id:<32} {content_hash[:12]}")
+
+
+if __name__ == "__main__":
+    main()
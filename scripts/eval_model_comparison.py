@@ -17,13 +17,21 @@
   python scripts/eval_model_comparison.py \\
     --checkpoint-dir checkpoints/mixtex_qlora_final_attempt/epoch_5 \\
     --deepseekocr-api-url http://localhost:8000
+
+  # 对比不同推理精度的准确率与延迟（生成 precision_report.md）
+  python scripts/eval_model_comparison.py \\
+    --checkpoint-dir checkpoints/mixtex_lora_10k_final_tuned/epoch_2 \\
+    --precisions fp32,bf16,int8-dynamic --intra-op-threads 4
 """
 import argparse
 import base64
+import copy
 import json
 import os
 import random
+import statistics
 import subprocess
+import sys
 import tempfile
 import time
 from pathlib import Path
@@ -52,6 +60,11 @@ EVAL_OUTPUT_DIR = PROJECT_ROOT / "evaluation_results"
 IMAGES_DIR = EVAL_OUTPUT_DIR / "eval_images"
 PREDICTIONS_DIR = EVAL_OUTPUT_DIR / "predictions"
 
+# 复用 OCR 服务的精度转换逻辑，保证评估结果与部署一致
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+from ocr_model_wrapper import SUPPORTED_PRECISIONS, apply_precision, configure_torch_threads
+
 
 def load_model_and_tokenizer(checkpoint_dir: str, device: torch.device, base_model_path: str = None):
     """加载微调后的模型（支持LoRA和全量模型）"""
@@ -97,7 +110,9 @@ def predict_with_local_model(
     start_time = time.time()
     
     with torch.no_grad():
-        pixel_values = image_processor(images=[image], return_tensors="pt").pixel_values.to(device)
+        # 输入精度与 encoder 权重保持一致（bf16 模型需要 bf16 输入）
+        input_dtype = next(model.encoder.parameters()).dtype
+        pixel_values = image_processor(images=[image], return_tensors="pt").pixel_values.to(device, dtype=input_dtype)
         # 使用简单、与 eval_finetuned_model 一致的生成方式，并显式提供 pad/eos，避免配置丢失导致乱码
         pad_id = tokenizer.pad_token_id or tokenizer.eos_token_id
         eos_id = tokenizer.eos_token_id
@@ -240,6 +255,108 @@ def predict_with_deepseek_api(
         return "", 0.0, None
 
 
+def normalized_edit_distance(pred: str, target: str) -> float:
+    """字符级编辑距离 / 较长串长度，0 表示完全一致"""
+    if pred == target:
+        return 0.0
+    if not pred or not target:
+        return 1.0
+    previous = list(range(len(target) + 1))
+    for i, pc in enumerate(pred, 1):
+        current = [i]
+        for j, tc in enumerate(target, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (pc != tc),
+            ))
+        previous = current
+    return previous[-1] / max(len(pred), len(target))
+
+
+def run_precision_sweep(
+    precisions: List[str],
+    model,
+    tokenizer,
+    image_processor,
+    samples: List[tuple],
+    device: torch.device,
+) -> List[Dict]:
+    """
+    在同一批样本上依次评估各推理精度，记录准确率与延迟
+    
+    Args:
+        precisions: 待评估的精度列表
+        model: fp32 合并后的模型（每种精度基于其副本转换）
+        samples: [(image_id, image, ground_truth), ...]
+    
+    Returns:
+        每种精度一条汇总记录
+    """
+    summary = []
+    for precision in precisions:
+        print(f"\n评估精度: {precision}")
+        variant = apply_precision(copy.deepcopy(model), precision, device)
+        variant.eval()
+        
+        # 预热一次，排除首次调用的初始化开销
+        predict_with_local_model(variant, tokenizer, image_processor, samples[0][1], device)
+        
+        latencies = []
+        exact = 0
+        distances = []
+        for image_id, image, ground_truth in tqdm(samples, desc=precision):
+            pred, elapsed = predict_with_local_model(variant, tokenizer, image_processor, image, device)
+            save_prediction(pred, image_id, f"precision_{precision}", PREDICTIONS_DIR)
+            latencies.append(elapsed)
+            exact += int(pred.strip() == ground_truth)
+            distances.append(normalized_edit_distance(pred.strip(), ground_truth))
+        
+        latencies.sort()
+        summary.append({
+            "precision": precision,
+            "samples": len(samples),
+            "exact_match": exact / len(samples),
+            "mean_edit_distance": statistics.mean(distances),
+            "latency_mean": statistics.mean(latencies),
+            "latency_p50": latencies[len(latencies) // 2],
+            "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        })
+        del variant
+    return summary
+
+
+def write_precision_report(summary: List[Dict], args, output_dir: Path) -> Path:
+    """将精度对比结果写为 Markdown 报告和 JSON"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "precision_report.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    
+    baseline = next((r for r in summary if r["precision"] == "fp32"), summary[0])
+    lines = [
+        "# OCR 推理精度对比报告",
+        "",
+        f"- checkpoint: `{args.checkpoint_dir}`",
+        f"- 设备: {args.device}，intra-op 线程: {torch.get_num_threads()}，"
+        f"inter-op 线程: {torch.get_num_interop_threads()}",
+        f"- 样本: linxy/LaTeX_OCR ({args.subset_name}) test split 随机 {summary[0]['samples']} 条，seed={args.seed}",
+        "",
+        "| 精度 | 完全匹配率 | 平均归一化编辑距离 | 平均延迟(秒) | P50(秒) | P95(秒) | 相对 fp32 加速 |",
+        "|------|-----------|-------------------|-------------|---------|---------|---------------|",
+    ]
+    for r in summary:
+        speedup = baseline["latency_mean"] / r["latency_mean"] if r["latency_mean"] else 0.0
+        lines.append(
+            f"| {r['precision']} | {r['exact_match']:.2%} | {r['mean_edit_distance']:.4f} | "
+            f"{r['latency_mean']:.3f} | {r['latency_p50']:.3f} | {r['latency_p95']:.3f} | {speedup:.2f}x |"
+        )
+    lines.append("")
+    lines.append("部署时通过环境变量 `OCR_PRECISION` 选择精度，`OCR_INTRA_OP_THREADS` / `OCR_INTER_OP_THREADS` 设置线程数。")
+    report_path = output_dir / "precision_report.md"
+    report_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return report_path
+
+
 def save_image(image: Image.Image, image_id: str, output_dir: Path):
     """保存图片到指定目录"""
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -468,12 +585,39 @@ def main():
         default=1800,
         help="DeepSeek-OCR 调用超时时间（秒），默认 1800 秒（30分钟）。首次调用需要加载模型，可能需要较长时间",
     )
+    parser.add_argument(
+        "--precisions",
+        type=str,
+        default=None,
+        help=f"逗号分隔的推理精度列表（可选: {', '.join(SUPPORTED_PRECISIONS)}），"
+             "设置后只做精度对比并生成 precision_report.md",
+    )
+    parser.add_argument(
+        "--intra-op-threads",
+        type=int,
+        default=None,
+        help="PyTorch 算子内线程数",
+    )
+    parser.add_argument(
+        "--inter-op-threads",
+        type=int,
+        default=None,
+        help="PyTorch 算子间线程数",
+    )
     
     args = parser.parse_args()
     
+    precisions = []
+    if args.precisions:
+        precisions = [p.strip() for p in args.precisions.split(",") if p.strip()]
+        unknown = [p for p in precisions if p not in SUPPORTED_PRECISIONS]
+        if unknown:
+            parser.error(f"不支持的精度: {', '.join(unknown)}")
+    
     # 设置随机种子
     random.seed(args.seed)
     torch.manual_seed(args.seed)
+    configure_torch_threads(args.intra_op_threads, args.inter_op_threads)
     
     # 创建输出目录
     EVAL_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -543,6 +687,20 @@ def main():
     
     print(f"从 {total_samples} 个测试样本中随机选择了 {len(selected_indices)} 个样本")
     
+    # 精度对比模式：只评估微调模型在不同精度下的准确率与延迟
+    if precisions:
+        samples = []
+        for sample_idx in selected_indices:
+            sample = ds[sample_idx]
+            image = sample["image"]
+            if not isinstance(image, Image.Image):
+                image = Image.fromarray(image)
+            samples.append((f"test_{sample_idx:05d}", image.convert("RGB"), sample["text"].strip()))
+        summary = run_precision_sweep(precisions, model, tokenizer, image_processor, samples, device)
+        report_path = write_precision_report(summary, args, EVAL_OUTPUT_DIR)
+        print(f"\n精度对比报告已保存到: {report_path}")
+        return
+    
     # 配置 DeepSeek-OCR（本地或 API）
     use_local_deepseekocr = False
     deepseekocr_path = args.deepseekocr_path
@@ -0,0 +1,113 @@
+"""
+导出预合并的 OCR 模型，加快 OCR 服务冷启动
+
+OCR 服务每次启动都要加载基础模型、挂载 LoRA 适配器再 merge_and_unload()。
+本脚本只做一次合并，将结果以 safetensors 格式保存（加载时按内存映射读取），
+同时写入基础模型与适配器的指纹。服务端设置 OCR_MERGED_MODEL_DIR 后，
+指纹一致时直接加载该目录，不一致时自动回退到现场合并。
+
+示例：
+    python scripts/export_merged_ocr_model.py \\
+        --checkpoint-dir checkpoints/mixtex_lora_10k_final_tuned/epoch_2 \\
+        --output-dir checkpoints/mixtex_lora_10k_final_tuned/epoch_2_merged
+
+    # 启动服务时使用
+    export OCR_CHECKPOINT_DIR=checkpoints/mixtex_lora_10k_final_tuned/epoch_2
+    export OCR_MERGED_MODEL_DIR=checkpoints/mixtex_lora_10k_final_tuned/epoch_2_merged
+    uvicorn ocr_api:app --host 0.0.0.0 --port 8001
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from transformers import AutoImageProcessor, AutoTokenizer, VisionEncoderDecoderModel
+
+from ocr_model_wrapper import (
+    MERGE_FINGERPRINT_FILE,
+    compute_merge_fingerprint,
+    load_model_from_checkpoint,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出预合并的 OCR 模型（safetensors + 指纹）")
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        default="checkpoints/mixtex_lora_10k_final_tuned/epoch_2",
+        help="LoRA 适配器（或全量模型）checkpoint 目录",
+    )
+    parser.add_argument(
+        "--base-model-path",
+        type=str,
+        default=None,
+        help="基础模型路径，默认 MixTex/ZhEn-Latex-OCR",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=None,
+        help="导出目录，默认为 <checkpoint-dir>_merged",
+    )
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir or f"{args.checkpoint_dir.rstrip('/')}_merged")
+
+    # 1. 现场合并（即服务当前的冷启动路径），同时计时作为对比基线
+    print(f"[1/3] 从 {args.checkpoint_dir} 加载并合并 LoRA ...")
+    start = time.perf_counter()
+    model, tokenizer, image_processor = load_model_from_checkpoint(
+        args.checkpoint_dir, args.base_model_path
+    )
+    merge_load_seconds = time.perf_counter() - start
+    print(f"      现场合并加载耗时: {merge_load_seconds:.2f} 秒")
+
+    # 2. 保存为 safetensors
+    print(f"[2/3] 保存预合并模型到 {output_dir} ...")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    tokenizer.save_pretrained(output_dir)
+    image_processor.save_pretrained(output_dir)
+    del model
+
+    # 3. 计时直接加载预合并模型
+    print("[3/3] 测量预合并模型加载耗时 ...")
+    start = time.perf_counter()
+    VisionEncoderDecoderModel.from_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(output_dir)
+    AutoImageProcessor.from_pretrained(output_dir)
+    merged_load_seconds = time.perf_counter() - start
+    print(f"      预合并模型加载耗时: {merged_load_seconds:.2f} 秒")
+
+    # 指纹最后写入：导出中途失败的目录不会被服务误用
+    fingerprint = compute_merge_fingerprint(args.checkpoint_dir, args.base_model_path)
+    metadata = {
+        "fingerprint": fingerprint,
+        "checkpoint_dir": args.checkpoint_dir,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "startup_seconds": {
+            "merge_on_load": round(merge_load_seconds, 3),
+            "pre_merged": round(merged_load_seconds, 3),
+        },
+    }
+    with open(output_dir / MERGE_FINGERPRINT_FILE, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    speedup = merge_load_seconds / merged_load_seconds if merged_load_seconds else 0.0
+    print("\n" + "=" * 60)
+    print(f"导出完成: {output_dir}")
+    print(f"指纹: {fingerprint}")
+    print(f"冷启动耗时: 现场合并 {merge_load_seconds:.2f} 秒 -> 预合并 {merged_load_seconds:.2f} 秒 ({speedup:.1f}x)")
+    print(f"使用方式: export OCR_MERGED_MODEL_DIR={output_dir}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
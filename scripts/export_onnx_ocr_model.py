@@ -0,0 +1,277 @@
+"""
+导出 OCR 模型为 ONNX，供 OCR 服务以 ONNX Runtime 后端推理
+
+导出三个图（与 optimum 的命名一致）：
+    encoder_model.onnx             pixel_values -> encoder last_hidden_state
+    decoder_model.onnx             首步：input_ids + encoder_hidden_states -> logits + present.*
+    decoder_with_past_model.onnx   后续步：单个 token + past_key_values.* -> logits + present.*
+LoRA checkpoint 会先合并进 decoder。目录中同时保存分词器、图片处理器，
+以及与预合并模型相同格式的指纹（merge_fingerprint.json，另含 KV 缓存布局等导出信息）。
+
+示例：
+    python scripts/export_onnx_ocr_model.py \\
+        --checkpoint-dir checkpoints/mixtex_lora_10k_final_tuned/epoch_2 \\
+        --output-dir checkpoints/mixtex_lora_10k_final_tuned/epoch_2_onnx
+
+    # 启动服务时使用
+    export OCR_CHECKPOINT_DIR=checkpoints/mixtex_lora_10k_final_tuned/epoch_2
+    export OCR_INFERENCE_BACKEND=onnx
+    export OCR_ONNX_DIR=checkpoints/mixtex_lora_10k_final_tuned/epoch_2_onnx
+    uvicorn ocr_api:app --host 0.0.0.0 --port 8001
+"""
+import argparse
+import inspect
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import torch
+
+from ocr_model_wrapper import MERGE_FINGERPRINT_FILE, compute_merge_fingerprint, load_model_from_checkpoint
+from ocr_onnx_backend import (
+    ONNX_DECODER_FILE,
+    ONNX_DECODER_WITH_PAST_FILE,
+    ONNX_ENCODER_FILE,
+    past_input_names,
+    present_output_names,
+)
+
+try:
+    from transformers import DynamicCache, EncoderDecoderCache
+except ImportError:  # 旧版 transformers 只接受 tuple 形式的 past_key_values
+    DynamicCache = EncoderDecoderCache = None
+
+# 以下生成参数会改变 logits，ONNX Runtime 后端的解码循环未实现
+UNSUPPORTED_GENERATION_PARAMS = {
+    "repetition_penalty": 1.0,
+    "no_repeat_ngram_size": 0,
+    "min_length": 0,
+    "min_new_tokens": None,
+    "bad_words_ids": None,
+    "forced_bos_token_id": None,
+    "forced_eos_token_id": None,
+    "suppress_tokens": None,
+}
+
+
+def _to_legacy(past):
+    """Cache 对象统一转换为 ((k, v, ...), ...) 形式"""
+    return past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+
+
+def _from_flat(past, per_layer: int):
+    """将扁平的 KV 张量列表还原为模型接受的 past_key_values"""
+    legacy = tuple(tuple(past[i:i + per_layer]) for i in range(0, len(past), per_layer))
+    if EncoderDecoderCache is not None and per_layer == 4:
+        return EncoderDecoderCache.from_legacy_cache(legacy)
+    if DynamicCache is not None and per_layer == 2:
+        return DynamicCache.from_legacy_cache(legacy)
+    return legacy
+
+
+class EncoderForExport(torch.nn.Module):
+    """pixel_values -> encoder last_hidden_state"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.encoder
+
+    def forward(self, pixel_values):
+        return self.encoder(pixel_values=pixel_values, return_dict=True).last_hidden_state
+
+
+class DecoderForExport(torch.nn.Module):
+    """
+    单步 decoder：输入扁平的 past 张量，输出 logits 与扁平的 present 张量
+
+    encoder 与 decoder 隐藏维度不同时，VisionEncoderDecoderModel 会先经过 enc_to_dec_proj，
+    这里一并导出，使 ONNX decoder 可以直接接收 encoder 的原始输出。
+    """
+
+    def __init__(self, model, per_layer: int):
+        super().__init__()
+        self.decoder = model.decoder
+        self.enc_to_dec_proj = getattr(model, "enc_to_dec_proj", None)
+        self.per_layer = per_layer
+
+    def forward(self, input_ids, encoder_hidden_states, *past):
+        if self.enc_to_dec_proj is not None:
+            encoder_hidden_states = self.enc_to_dec_proj(encoder_hidden_states)
+        outputs = self.decoder(
+            input_ids=input_ids,
+            encoder_hidden_states=encoder_hidden_states,
+            past_key_values=_from_flat(past, self.per_layer) if past else None,
+            use_cache=True,
+            return_dict=True,
+        )
+        present = [tensor for layer in _to_legacy(outputs.past_key_values) for tensor in layer]
+        return (outputs.logits, *present)
+
+
+def _export(module, args, path: Path, input_names, output_names, dynamic_axes, opset: int):
+    kwargs = {}
+    # 新版 torch 默认使用 dynamo 导出，这里固定使用 TorchScript 导出以支持 dynamic_axes
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+    torch.onnx.export(
+        module,
+        args,
+        str(path),
+        input_names=input_names,
+        output_names=output_names,
+        dynamic_axes=dynamic_axes,
+        opset_version=opset,
+        do_constant_folding=True,
+        **kwargs,
+    )
+
+
+def _generation_settings(model, tokenizer):
+    """ONNX Runtime 后端解码循环所需的特殊 token 与 beam search 参数"""
+    generation_config = model.generation_config
+    eos_token_id = generation_config.eos_token_id
+    if eos_token_id is None:
+        eos_token_id = tokenizer.eos_token_id
+    if isinstance(eos_token_id, (list, tuple)):
+        eos_token_id = eos_token_id[0]
+    pad_token_id = generation_config.pad_token_id
+    if pad_token_id is None:
+        pad_token_id = model.config.pad_token_id if model.config.pad_token_id is not None else eos_token_id
+    decoder_start_token_id = generation_config.decoder_start_token_id
+    if decoder_start_token_id is None:
+        decoder_start_token_id = model.config.decoder_start_token_id
+    for name, default in UNSUPPORTED_GENERATION_PARAMS.items():
+        value = getattr(generation_config, name, default)
+        if value not in (default, None):
+            print(f"[警告] generation_config.{name}={value}，ONNX Runtime 后端不支持该参数，输出可能与 PyTorch 不一致")
+    return {
+        "decoder_start_token_id": int(decoder_start_token_id),
+        "eos_token_id": int(eos_token_id),
+        "pad_token_id": int(pad_token_id),
+        "length_penalty": float(generation_config.length_penalty if generation_config.length_penalty is not None else 1.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 OCR 模型为 ONNX（encoder + decoder + decoder-with-past）")
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        default="checkpoints/mixtex_lora_10k_final_tuned/epoch_2",
+        help="LoRA 适配器（或全量模型）checkpoint 目录",
+    )
+    parser.add_argument("--base-model-path", type=str, default=None, help="基础模型路径，默认 MixTex/ZhEn-Latex-OCR")
+    parser.add_argument("--output-dir", type=str, default=None, help="导出目录，默认为 <checkpoint-dir>_onnx")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset 版本")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir or f"{args.checkpoint_dir.rstrip('/')}_onnx")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"[1/4] 从 {args.checkpoint_dir} 加载并合并模型 ...")
+    model, tokenizer, image_processor = load_model_from_checkpoint(args.checkpoint_dir, args.base_model_path)
+    model.eval()
+    model.config.use_cache = True
+    generation = _generation_settings(model, tokenizer)
+
+    # 用图片处理器的输出尺寸构造示例输入；批大小取 2，避免导出的图对 batch=1 做特化
+    blank = np.full((64, 256, 3), 255, dtype=np.uint8)
+    sample = image_processor(images=[blank, blank], return_tensors="pt").pixel_values
+    with torch.no_grad():
+        encoder_hidden_states = EncoderForExport(model)(sample)
+        start_ids = torch.full((2, 1), generation["decoder_start_token_id"], dtype=torch.long)
+        first = model.decoder(
+            input_ids=start_ids,
+            encoder_hidden_states=(
+                model.enc_to_dec_proj(encoder_hidden_states)
+                if getattr(model, "enc_to_dec_proj", None) is not None else encoder_hidden_states
+            ),
+            use_cache=True,
+            return_dict=True,
+        )
+    legacy_past = _to_legacy(first.past_key_values)
+    num_layers, per_layer = len(legacy_past), len(legacy_past[0])
+    print(f"      decoder {num_layers} 层，每层 {per_layer} 个 KV 张量")
+
+    past_names = past_input_names(num_layers, per_layer)
+    present_names = present_output_names(num_layers, per_layer)
+    kv_axes = {0: "batch", 2: "kv_sequence"}
+
+    print(f"[2/4] 导出 encoder -> {output_dir / ONNX_ENCODER_FILE}")
+    _export(
+        EncoderForExport(model), (sample,), output_dir / ONNX_ENCODER_FILE,
+        input_names=["pixel_values"], output_names=["last_hidden_state"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "last_hidden_state": {0: "batch"}},
+        opset=args.opset,
+    )
+
+    decoder = DecoderForExport(model, per_layer)
+    print(f"[3/4] 导出 decoder / decoder-with-past -> {output_dir}")
+    _export(
+        decoder, (start_ids, encoder_hidden_states), output_dir / ONNX_DECODER_FILE,
+        input_names=["input_ids", "encoder_hidden_states"],
+        output_names=["logits", *present_names],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+            **{name: kv_axes for name in present_names},
+        },
+        opset=args.opset,
+    )
+    past = [tensor for layer in legacy_past for tensor in layer]
+    next_ids = torch.full((2, 1), generation["eos_token_id"], dtype=torch.long)
+    _export(
+        decoder, (next_ids, encoder_hidden_states, *past), output_dir / ONNX_DECODER_WITH_PAST_FILE,
+        input_names=["input_ids", "encoder_hidden_states", *past_names],
+        output_names=["logits", *present_names],
+        dynamic_axes={
+            "input_ids": {0: "batch"},
+            "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"},
+            "logits": {0: "batch"},
+            **{name: kv_axes for name in past_names + present_names},
+        },
+        opset=args.opset,
+    )
+    tokenizer.save_pretrained(output_dir)
+    image_processor.save_pretrained(output_dir)
+
+    print("[4/4] 校验 encoder 输出 ...")
+    try:
+        import onnxruntime as ort
+        session = ort.InferenceSession(str(output_dir / ONNX_ENCODER_FILE), providers=["CPUExecutionProvider"])
+        onnx_hidden = session.run(None, {"pixel_values": sample.numpy()})[0]
+        max_diff = float(np.abs(onnx_hidden - encoder_hidden_states.numpy()).max())
+        print(f"      encoder 输出最大绝对误差: {max_diff:.2e}")
+    except ImportError:
+        print("      未安装 onnxruntime，跳过校验")
+
+    # 指纹最后写入：导出中途失败的目录不会被服务误用
+    metadata = {
+        "fingerprint": compute_merge_fingerprint(args.checkpoint_dir, args.base_model_path),
+        "checkpoint_dir": args.checkpoint_dir,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+        "onnx": {
+            "opset": args.opset,
+            "num_layers": num_layers,
+            "kv_per_layer": per_layer,
+            **generation,
+        },
+    }
+    with open(output_dir / MERGE_FINGERPRINT_FILE, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print(f"导出完成: {output_dir}")
+    print(f"使用方式: export OCR_INFERENCE_BACKEND=onnx OCR_ONNX_DIR={output_dir}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+构建期预计算知识数据包中的模板向量
+
+向量按条目 content_hash 保存到知识数据包目录下的 embeddings/<嵌入后端>.json
+（默认 src/autolatex/tools/data/knowledge_pack/embeddings/，可由 AUTOLATEX_TEMPLATE_EMBEDDINGS_DIR 指定）。
+服务启动同步知识库时直接使用这些向量，不再现场嵌入模板；模板内容修改后重新运行本脚本即可，
+未重新生成的条目会在启动时现场计算。
+
+示例：
+    # 使用本地 sentence-transformers 模型（离线环境）
+    python scripts/precompute_template_embeddings.py --model-path models/all-MiniLM-L6-v2
+
+    # 使用 ChromaDB 默认嵌入函数
+    python scripts/precompute_template_embeddings.py
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_PATH = PROJECT_ROOT / "src"
+if str(SRC_PATH) not in sys.path:
+    sys.path.insert(0, str(SRC_PATH))
+
+from autolatex.tools.embeddings import (
+    ChromaDefaultEmbedder,
+    SentenceTransformerEmbedder,
+    create_embedder_from_env,
+    save_template_embeddings,
+)
+from autolatex.tools.knowledge_base import template_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预计算知识库模板向量")
+    parser.add_argument(
+        "--model-path", type=str, default=None,
+        help="本地 sentence-transformers 模型目录；默认按 AUTOLATEX_EMBEDDING_MODEL，未设置时使用 ChromaDB 默认嵌入函数",
+    )
+    parser.add_argument("--output-dir", type=str, default=None, help="输出目录，默认 <知识数据包目录>/embeddings")
+    parser.add_argument("--chroma-default", action="store_true", help="强制使用 ChromaDB 默认嵌入函数")
+    args = parser.parse_args()
+
+    if args.chroma_default:
+        embedder = ChromaDefaultEmbedder()
+    elif args.model_path:
+        embedder = SentenceTransformerEmbedder(args.model_path)
+    else:
+        embedder = create_embedder_from_env()
+
+    entries = template_entries()
+    hashes = [metadata["content_hash"] for _, metadata in entries.values()]
+    documents = [document for document, _ in entries.values()]
+
+    print(f"嵌入后端: {embedder.name}，模板数: {len(documents)}")
+    start = time.perf_counter()
+    vectors = embedder.embed_documents(documents)
+    print(f"批量嵌入耗时 {time.perf_counter() - start:.2f} 秒，向量维度 {len(vectors[0]) if vectors else 0}")
+
+    path = save_template_embeddings(embedder.name, dict(zip(hashes, vectors)), args.output_dir)
+    print(f"已保存: {path}")
+
+
+if __name__ == "__main__":
+    main()
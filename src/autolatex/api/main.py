@@ -13,6 +13,7 @@ import uuid
 import re
 import zipfile
 import shutil
+import time
 from urllib.parse import quote
 
 # 添加 src 目录到路径（从 api/main.py 向上两级到 src）
@@ -21,7 +22,7 @@ src_path = os.path.join(project_root, 'src')
 if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
-from autolatex.tools.knowledge_base import knowledge_base_search, initialize_knowledge_base, get_all_journal_names
+from autolatex.tools.knowledge_base import knowledge_base_search, get_knowledge_base_service, get_all_journal_names
 from autolatex.crew import Autolatex
 
 app = FastAPI(
@@ -39,10 +40,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化知识库
+# 初始化知识库（进程内只初始化一次，之后的搜索复用同一实例）
 print("正在初始化知识库...")
 try:
-    initialize_knowledge_base()
+    get_knowledge_base_service()
     print("知识库初始化完成")
 except Exception as e:
     print(f"知识库初始化失败: {e}")
@@ -59,6 +60,7 @@ class KnowledgeSearchResponse(BaseModel):
     journal_name: str
     results: str
     message: Optional[str] = None
+    elapsed_ms: Optional[float] = None  # 搜索耗时（毫秒）
 
 class PaperConvertRequest(BaseModel):
     """论文转换请求"""
@@ -89,6 +91,7 @@ async def root():
         "endpoints": {
             "knowledge_search": "/api/v1/knowledge/search",
             "knowledge_journals": "/api/v1/knowledge/journals",
+            "knowledge_stats": "/api/v1/knowledge/stats",
             "paper_convert": "/api/v1/paper/convert",
             "health": "/api/v1/health"
         }
@@ -120,6 +123,21 @@ async def get_journals():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取期刊列表失败: {str(e)}")
 
+@app.get("/api/v1/knowledge/stats")
+async def get_knowledge_stats():
+    """
+    知识库统计
+    
+    返回条目数、嵌入后端以及搜索结果缓存的命中/未命中次数
+    """
+    try:
+        return {
+            "success": True,
+            **get_knowledge_base_service().stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取知识库统计失败: {str(e)}")
+
 @app.post("/api/v1/knowledge/search", response_model=KnowledgeSearchResponse)
 async def search_knowledge_base(request: KnowledgeSearchRequest):
     """
@@ -133,13 +151,16 @@ async def search_knowledge_base(request: KnowledgeSearchRequest):
             raise HTTPException(status_code=400, detail="期刊名称不能为空")
         
         # 执行搜索
+        start = time.perf_counter()
         results = knowledge_base_search(journal_name=journal_name, n_results=3)
+        elapsed_ms = (time.perf_counter() - start) * 1000
         
         return KnowledgeSearchResponse(
             success=True,
             journal_name=journal_name,
             results=results,
-            message="搜索成功"
+            message="搜索成功",
+            elapsed_ms=round(elapsed_ms, 2)
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
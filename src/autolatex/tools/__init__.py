@@ -1,16 +1,28 @@
 """
 工具模块
+
+导出项按需导入：只用到某个工具时不会连带加载 CrewAI、ChromaDB 等重量级依赖。
 """
-from .knowledge_tools import KnowledgeBaseSearchTool
-from .vector_db import VectorDatabase
-from .knowledge_base import knowledge_base_search, initialize_knowledge_base
-from .mixtex_ocr_tool import MixTexOCRTool
+import importlib
+
+# 导出名 -> 所在子模块
+_EXPORTS = {
+    "KnowledgeBaseSearchTool": ".knowledge_tools",
+    "VectorDatabase": ".vector_db",
+    "NumpyVectorDatabase": ".numpy_vector_db",
+    "knowledge_base_search": ".knowledge_base",
+    "knowledge_base_search_many": ".knowledge_base",
+    "initialize_knowledge_base": ".knowledge_base",
+    "MixTexOCRTool": ".mixtex_ocr_tool",
+}
+
+__all__ = list(_EXPORTS)
 
-__all__ = [
-    "KnowledgeBaseSearchTool",
-    "VectorDatabase",
-    "knowledge_base_search",
-    "initialize_knowledge_base",
-    "MixTexOCRTool",
-]
 
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,129 @@
+"""
+DeepSeek-OCR 常驻工作进程
+
+由 ocr_handler.py 的工作进程池以独立解释器启动（可以是专用的 deepseek-ocr
+conda 环境），模型只加载一次，随后通过 stdin/stdout 逐行接收识别任务。
+本脚本不依赖 autolatex 包，可直接用任意装有 DeepSeek-OCR 依赖的 Python 运行。
+
+协议（JSON Lines，每行一个对象）：
+    启动完成:  {"ready": true}
+    请求:      {"id": 1, "image": "/abs/a.png", "output_dir": "/abs/out"}
+    成功响应:  {"id": 1, "ok": true, "latex": "..."}
+    失败响应:  {"id": 1, "ok": false, "error": "..."}
+stdin 关闭后进程退出。
+"""
+import argparse
+import json
+import os
+import sys
+import traceback
+
+DEFAULT_MODEL_PATH = "deepseek-ai/DeepSeek-OCR"
+DEFAULT_PROMPT = "<image>\nFree OCR. "
+
+
+def open_protocol_stream():
+    """
+    模型推理时会向 stdout 打印大量日志，会破坏 JSON Lines 协议。
+    这里把原始 fd 1 复制出来专门用于协议输出，再把 fd 1 重定向到 stderr。
+    """
+    protocol_fd = os.dup(1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    return os.fdopen(protocol_fd, "w", encoding="utf-8", buffering=1)
+
+
+def load_model(model_path: str, device: str):
+    """加载 DeepSeek-OCR 模型与分词器（只在进程启动时调用一次）"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+    model = AutoModel.from_pretrained(model_path, trust_remote_code=True, use_safetensors=True)
+    model = model.eval()
+    if device == "cuda":
+        model = model.cuda().to(torch.bfloat16)
+    return model, tokenizer
+
+
+def recognize(
+    model, tokenizer, image_path: str, output_dir: str, prompt: str,
+    base_size: int = 1024, image_size: int = 640, crop_mode: bool = True,
+) -> str:
+    """识别单张图片，并与 run_ocr.py 一样在 output_dir 下写出 <图片名>.mmd"""
+    os.makedirs(output_dir, exist_ok=True)
+    result = model.infer(
+        tokenizer,
+        prompt=prompt,
+        image_file=image_path,
+        output_path=output_dir,
+        base_size=base_size,
+        image_size=image_size,
+        crop_mode=crop_mode,
+        save_results=False,
+        eval_mode=True,
+    )
+    latex = (result or "").strip()
+    image_base_name = os.path.splitext(os.path.basename(image_path))[0]
+    with open(os.path.join(output_dir, f"{image_base_name}.mmd"), "w", encoding="utf-8") as f:
+        f.write(latex)
+    return latex
+
+
+def serve(model, tokenizer, prompt: str, protocol, **generation):
+    """主循环：逐行读取请求并写回响应；generation 为 base_size / image_size / crop_mode"""
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            latex = recognize(model, tokenizer, job["image"], job["output_dir"], prompt, **generation)
+            response = {"id": job_id, "ok": True, "latex": latex}
+        except Exception as e:
+            traceback.print_exc()
+            response = {"id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        protocol.write(json.dumps(response, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeepSeek-OCR 常驻工作进程")
+    parser.add_argument(
+        "--model-path",
+        default=os.getenv("DEEPSEEK_OCR_MODEL_PATH", DEFAULT_MODEL_PATH),
+        help="DeepSeek-OCR 模型路径或 HuggingFace 名称",
+    )
+    parser.add_argument(
+        "--device",
+        default=os.getenv("DEEPSEEK_OCR_DEVICE", "cuda"),
+        help="设备 (cuda, cpu)",
+    )
+    parser.add_argument(
+        "--prompt",
+        default=os.getenv("DEEPSEEK_OCR_PROMPT", DEFAULT_PROMPT),
+        help="识别提示词",
+    )
+    parser.add_argument("--base-size", type=int, default=int(os.getenv("DEEPSEEK_OCR_BASE_SIZE", 1024)))
+    parser.add_argument("--image-size", type=int, default=int(os.getenv("DEEPSEEK_OCR_IMAGE_SIZE", 640)))
+    parser.add_argument(
+        "--crop-mode",
+        default=os.getenv("DEEPSEEK_OCR_CROP_MODE", "1"),
+        help="是否启用裁剪模式 (1/0)",
+    )
+    args = parser.parse_args()
+
+    protocol = open_protocol_stream()
+    model, tokenizer = load_model(args.model_path, args.device)
+    serve(
+        model, tokenizer, args.prompt, protocol,
+        base_size=args.base_size,
+        image_size=args.image_size,
+        crop_mode=args.crop_mode.lower() not in ("0", "false", "no"),
+    )
+
+
+if __name__ == "__main__":
+    main()
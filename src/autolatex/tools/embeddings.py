@@ -0,0 +1,164 @@
+"""
+文本嵌入模块
+为 VectorDatabase 提供可替换的嵌入后端，以及构建期预计算的模板向量
+"""
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+
+from .knowledge_pack import DEFAULT_PACK_DIR, EMBEDDINGS_DIR_NAME, get_template_pack
+
+# 预计算模板向量的默认目录（随代码分发的数据包内），每个嵌入后端一个文件
+DEFAULT_TEMPLATE_EMBEDDINGS_DIR = os.path.join(DEFAULT_PACK_DIR, EMBEDDINGS_DIR_NAME)
+
+
+class Embedder(ABC):
+    """
+    嵌入后端接口
+
+    name 用于区分不同模型：不同后端的向量维度与语义空间不同，
+    向量数据库集合与预计算文件都按 name 区分。子类至少实现 embed_documents。
+    """
+
+    name: str = "embedder"
+
+    @abstractmethod
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        """批量计算文档向量"""
+
+    def embed_query(self, text: str) -> List[float]:
+        """计算查询向量"""
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: Sequence[str]) -> List[List[float]]:
+        """批量计算查询向量（对称模型与文档向量相同）"""
+        return self.embed_documents(texts)
+
+    def warmup(self):
+        """加载模型并完成一次推理，避免首个查询承担加载开销"""
+        self.embed_query("warmup")
+
+
+class ChromaDefaultEmbedder(Embedder):
+    """ChromaDB 默认的嵌入函数（all-MiniLM-L6-v2 ONNX，首次使用时下载或加载）"""
+
+    name = "chroma-default"
+
+    def __init__(self):
+        self._function = None
+
+    def _get_function(self):
+        if self._function is None:
+            from chromadb.utils import embedding_functions
+            self._function = embedding_functions.DefaultEmbeddingFunction()
+        return self._function
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        return [[float(x) for x in vector] for vector in self._get_function()(list(texts))]
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """从本地目录加载的 sentence-transformers 模型，不访问网络，适用于离线环境"""
+
+    def __init__(self, model_path: str, device: Optional[str] = None, batch_size: int = 32):
+        """
+        Args:
+            model_path: 本地模型目录（如 all-MiniLM-L6-v2 的下载目录）
+            device: 推理设备，默认由 sentence-transformers 自动选择
+            batch_size: 批量嵌入的批大小
+        """
+        if not os.path.isdir(model_path):
+            raise ValueError(f"嵌入模型目录不存在: {model_path}")
+        self.model_path = model_path
+        self.device = device
+        self.batch_size = batch_size
+        self.name = f"st-{os.path.basename(os.path.normpath(model_path))}"
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError("本地嵌入模型需要安装 sentence-transformers") from e
+            self._model = SentenceTransformer(self.model_path, device=self.device)
+        return self._model
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = self._get_model().encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False
+        )
+        return vectors.tolist()
+
+
+def create_embedder_from_env() -> Embedder:
+    """
+    按环境变量创建嵌入后端
+
+    AUTOLATEX_EMBEDDING_MODEL 指向本地 sentence-transformers 模型目录时使用该模型，
+    否则使用 ChromaDB 默认的嵌入函数。
+    """
+    model_path = os.getenv("AUTOLATEX_EMBEDDING_MODEL")
+    if model_path:
+        return SentenceTransformerEmbedder(
+            model_path,
+            device=os.getenv("AUTOLATEX_EMBEDDING_DEVICE") or None,
+            batch_size=int(os.getenv("AUTOLATEX_EMBEDDING_BATCH_SIZE", 32)),
+        )
+    return ChromaDefaultEmbedder()
+
+
+def template_embeddings_dir() -> str:
+    """
+    预计算模板向量所在目录
+
+    AUTOLATEX_TEMPLATE_EMBEDDINGS_DIR 优先；否则为当前知识数据包目录下的 embeddings/，
+    与包内路径绑定，不依赖进程的工作目录。
+    """
+    return os.getenv("AUTOLATEX_TEMPLATE_EMBEDDINGS_DIR") or os.path.join(
+        get_template_pack().pack_dir, EMBEDDINGS_DIR_NAME
+    )
+
+
+def _embeddings_file(embedder_name: str, directory: str) -> str:
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", embedder_name)
+    return os.path.join(directory, f"{safe_name}.json")
+
+
+def load_template_embeddings(embedder_name: str, directory: Optional[str] = None) -> Dict[str, List[float]]:
+    """
+    读取构建期预计算的模板向量
+
+    Args:
+        embedder_name: 嵌入后端名称，只读取同一后端生成的文件
+        directory: 预计算文件目录，默认见 template_embeddings_dir
+
+    Returns:
+        {条目 content_hash: 向量}；文件不存在或损坏时返回空字典
+    """
+    directory = directory or template_embeddings_dir()
+    try:
+        with open(_embeddings_file(embedder_name, directory), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("embedder") != embedder_name:
+        return {}
+    return data.get("vectors", {})
+
+
+def save_template_embeddings(embedder_name: str, vectors: Dict[str, List[float]], directory: Optional[str] = None) -> str:
+    """
+    保存预计算的模板向量
+
+    Returns:
+        写入的文件路径
+    """
+    directory = directory or template_embeddings_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = _embeddings_file(embedder_name, directory)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"embedder": embedder_name, "vectors": vectors}, f)
+    return path
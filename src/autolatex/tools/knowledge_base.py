@@ -1,497 +1,148 @@
 """
 知识库初始化和管理模块
-"""
-import os
-import json
-from typing import List, Dict
-from .vector_db import VectorDatabase
-
-# LaTeX 模板知识库数据
-LATEX_TEMPLATE_KNOWLEDGE = [
-
-    {
-        "journal": "IEEE Access",
-        "document": """
-IEEE Access 必须使用特定的文档类和宏包配置。请严格遵守以下骨架代码：
-
-\\documentclass{ieeeaccess}
-\\usepackage{cite}
-\\usepackage{amsmath,amssymb,amsfonts}
-\\usepackage{algorithmic}
-\\usepackage{graphicx}
-\\usepackage{textcomp}
-\\def\\BibTeX{{\\rm B\\kern-.05em{\\sc i\\kern-.025em b}\\kern-.08em
-    T\\kern-.1667em\\lower.7ex\\hbox{E}\\kern-.125emX}}
-
-\\begin{document}
-% 必须包含历史日期和DOI
-\\history{Date of publication xxxx 00, 0000, date of current version xxxx 00, 0000.}
-\\doi{10.1109/ACCESS.2017.DOI}
-
-\\title{你的论文标题}
-
-% 注意 IEEE Access 的特殊作者写法
-\\author{\\uppercase{First A. Author}\\authorrefmark{1}, \\IEEEmembership{Fellow, IEEE},
-\\uppercase{Second B. Author\\authorrefmark{2}, and Third C. Author,
-Jr}.\\authorrefmark{3},
-\\IEEEmembership{Member, IEEE}}
-
-\\address[1]{National Institute of Standards and Technology, Boulder, CO 80305 USA}
-\\address[2]{Department of Physics, Colorado State University, Fort Collins, CO 80523 USA}
-\\address[3]{Electrical Engineering Department, University of Colorado, Boulder, CO 80309 USA}
-
-% 必须包含通讯作者
-\\corresp{Corresponding author: First A. Author (e-mail: author@boulder.nist.gov).}
-
-\\begin{abstract}
-摘要内容...
-\\end{abstract}
-
-\\begin{keywords}
-关键词1, 关键词2...
-\\end{keywords}
-
-\\titlepgskip=-15pt
-\\maketitle
-
-\\section{Introduction}
-...
-\\bibliographystyle{IEEEtran}
-\\bibliography{main}
-\\EOD %注意一定要有EOD
-\\end{document}
-""",
-        "metadata": {
-            "journal_name": "IEEE Access",
-            "template_type": "journal",
-            "documentclass": "ieeeaccess",
-            "key_packages": "ieeeaccess, cite, amsmath, amssymb, amsfonts, algorithmic, graphicx, textcomp",
-            "template_dir_path": "模板\\IEEE_Access_LaTeX_template"
-        },
-        "requirements":"""
-        1. 使用所给模板完成论文编写
-        2. 图片插入需要严格按照这种格式
-        \\Figure[t!](topskip=0pt, botskip=0pt, midskip=0pt){图片}
-{图片描述}}，坚决禁止如下方式
-\\begin{figure}[htbp]
-\\centering
-\\includegraphics[width=0.8\linewidth]{parsed_images/427120e0-5f58-41a0-b1d7-68118c35bbdd.png}
-\\caption{Impact of frame sampling rate on model accuracy. Performance saturates after 64 frames.}
-\\label{fig:ablation}
-\\end{figure}坚决禁止！！！！！
-        3. 引用参考文档应使用\\cite{}而不是\\citep{}
-        4. 要用\\bibliographystyle{IEEEtran}而不是\\bibliographystyle{ieeeaccess}
-        """
-    },
-{
-  "journal": "cvpr",
-  "document": """
-CVPR 论文必须严格使用官方 LaTeX 模板完成，不得自行修改文档类或会议宏定义。请严格遵守以下骨架代码：
-
-\\documentclass[10pt,twocolumn,letterpaper]{article}
-
-%%%%%%%%% PAPER TYPE
-
-% \\usepackage{cvpr}              % Camera-ready 版本（仅官方允许时使用）
-\\usepackage[review]{cvpr}        % Review / 投稿版本
-% \\usepackage[pagenumbers]{cvpr} % arXiv 版本（仅官方允许时使用）
-
-%%%%%%%%% ADDITIONAL PACKAGES
-
-% 额外宏包必须在 preamble.tex 中统一管理
-\\input{preamble}
-
-%%%%%%%%% HYPERREF (必须启用)
-
-\\definecolor{cvprblue}{rgb}{0.21,0.49,0.74}
-\\usepackage[pagebackref,breaklinks,colorlinks,allcolors=cvprblue]{hyperref}
-
-%%%%%%%%% PAPER METADATA (必须填写)
-
-\\def\\paperID{*****}
-\\def\\confName{CVPR}
-\\def\\confYear{2026}
-
-%%%%%%%%% TITLE
-
-\\title{你的论文标题}
-
-%%%%%%%%% AUTHORS
-% Review 阶段必须满足匿名投稿要求
-
-\\author{
-Anonymous Author(s)
-}
-
-\\begin{document}
-
-\\maketitle
-
-%%%%%%%%% SECTION INPUTS (必须使用 \\input 方式组织)
-
-\\input{sec/0_abstract}
-\\input{sec/1_intro}
-\\input{sec/2_formatting}
-\\input{sec/3_finalcopy}
-
-%%%%%%%%% BIBLIOGRAPHY (必须使用 BibTeX)
-
-{
-  \\small
-  \\bibliographystyle{ieeenat_fullname}
-  \\bibliography{main}
-}
-
-%%%%%%%%% SUPPLEMENTARY (可选)
-
-% \\input{sec/X_suppl}
-
-\\end{document}
-""",
-  "metadata": {
-    "journal_name": "cvpr",
-    "template_type": "conference",
-    "documentclass": "article",
-    "key_packages": "cvpr, hyperref, xcolor, natbib",
-    "template_dir_path": "模板/cvpr"
-  },
-  "requirements": """
-1. 必须严格使用 CVPR 官方 LaTeX 模板，不得修改 \\documentclass、cvpr.sty 或会议相关宏定义。
-   - 文档类固定为：
-     \\documentclass[10pt,twocolumn,letterpaper]{article}
-   - Review 阶段必须使用：
-     \\usepackage[review]{cvpr}
 
-2. 论文结构必须通过 \\input{sec/...} 方式组织，禁止将正文直接写在主 tex 文件中。
-   - 至少包含以下文件：
-     - sec/0_abstract.tex
-     - sec/1_intro.tex
-     - sec/2_formatting.tex
-     - sec/3_finalcopy.tex
-
-3. 标题、作者和会议信息必须使用模板中提供的宏：
-   - \\title{...}
-   - \\author{...}
-   - \\def\\confName{CVPR}
-   - \\def\\confYear{2026}
-   - \\def\\paperID{*****}
-   Review 阶段作者信息必须匿名。
-
-4. 图片插入必须使用标准 figure 环境，并符合 CVPR 双栏排版规范：
-   \\begin{figure}[t]
-     \\centering
-     \\includegraphics[width=\\linewidth]{image}
-     \\caption{Image caption.}
-     \\label{fig:example}
-   \\end{figure}
-   禁止越界、压缩比例失真或随意跨栏（除非使用 figure*）。
-
-5. 参考文献必须使用 BibTeX，不得手写参考文献列表：
-   - \\bibliographystyle{ieeenat_fullname}
-   - \\bibliography{main}
-   文中引用需使用 \\cite{}, \\citet{}, \\citeauthor{} 等 natbib 兼容命令。
-
-6. 不得修改 cvpr.sty 或 preamble.tex 中的核心排版参数，
-   包括页边距、字体大小、行距、列间距等。
-
-7. 超链接必须通过 hyperref 宏包生成，并使用模板中定义的颜色：
-   \\definecolor{cvprblue}{rgb}{0.21,0.49,0.74}
-   禁止自行修改链接颜色或关闭链接。
-
-8. 最终生成的 PDF 必须符合 CVPR 官方页数限制、匿名性要求以及提交规范。
+模板条目存放在知识数据包中（见 knowledge_pack），导入本模块不读取任何模板内容。
 """
-}
-,
-    {
-        "journal": "arvix",
-        "document": """
-arXiv LaTeX 模版核心规范（基于官方 arxiv.sty）：
-
-1. 文档类：
-
-   - 必须使用 \\documentclass{article}。
-
-   - 必须加载 \\usepackage{arxiv}，否则不符合 arXiv 官方排版。
-
-2. 编码与基础宏包：
-
-   - 推荐使用 \\usepackage[utf8]{inputenc}。
-
-   - 字体编码使用 \\usepackage[T1]{fontenc}。
-
-   - 超链接使用 \\usepackage{hyperref}。
-
-3. 参考文献（⚠️ 与 IEEE 模版完全不同）：
-
-   - **允许且推荐**使用 natbib：\\usepackage{natbib}。
-
-   - 允许使用 \\citep{} 与 \\citet{}。
-
-   - 参考文献样式通常使用 \\bibliographystyle{unsrtnat}。
-
-   - bibtex 是 arXiv 官方支持方式。
-
-4. 作者信息：
-
-   - 使用标准 \\author{...}。
-
-   - 支持 \\thanks{}、ORCID、\\href{}。
-
-   - 多作者使用 \\And 分隔。
-
-5. 图片与表格：
-
-   - 使用标准 figure / table 环境。
-
-   - 推荐加载 \\usepackage{graphicx} 与 \\usepackage{booktabs}。
-
-6. 常见避坑指南：
-
-   - 不要使用 IEEE / ACM 专用 documentclass。
-
-   - 不要删除 arxiv.sty 却仍声称是 arXiv 模版。
-
-   - 不要混用 biblatex 与 natbib。
-""",
-        "metadata": {
-            "journal_name": "arvix",
-            "template_type": "preprint",
-            "documentclass": "article",
-            "key_packages": "arxiv, natbib, graphicx, hyperref, booktabs",
-            "template_dir_path": "arXiv_LaTeX_template",
-            "main_tex_path": "main.tex",
-            "paper_template_specification": {
-                "document_class": "article",
-                "required_packages": ["arxiv", "natbib", "graphicx"],
-                "citation_commands": ["\\citep", "\\citet", "\\cite"],
-                "forbidden_packages": ["biblatex"],
-                "bib_style": "unsrtnat",
-                "image_folder": "figures"
-            }
-        }
-    },
-    {
-        "journal": "Scientific Reports",
-        "document": """
-Scientific Reports LaTeX 模版核心规范（基于官方 wlscirep.cls）：
-
-1. 文档类：
-
-   - 必须使用 \\documentclass[fleqn,10pt]{wlscirep}。
-
-   - 该 documentclass 为 Nature / Scientific Reports 官方样式。
-
-2. 编码与基础宏包：
-
-   - 推荐使用 \\usepackage[utf8]{inputenc}。
-
-   - 字体编码使用 \\usepackage[T1]{fontenc}。
-
-   - 超链接通常由模板内部或 hyperref 自动管理。
-
-3. 作者与机构信息（⚠️ 与 arXiv / IEEE 不同）：
-
-   - 使用 \\author[<affil>]{Name} 声明作者。
-
-   - 使用 \\affil[<id>]{Affiliation} 定义机构。
-
-   - 通讯作者使用 \\affil[*]{email}。
-
-   - 共同贡献作者使用 \\affil[+]{...}。
-
-   - 不使用 \\thanks{}。
-
-4. 章节结构规范：
-
-   - 使用无编号章节：\\section*{}。
-
-   - 允许最多三级无编号结构：
-
-     - \\section*
-
-     - \\subsection*
-
-     - \\subsubsection*
-
-   - Introduction 与 Discussion 不允许子标题。
-
-5. 摘要规范：
-
-   - 使用 \\begin{abstract} ... \\end{abstract}。
-
-   - 摘要中不得包含引用或子标题。
-
-6. 参考文献：
-
-   - 使用 \\bibliography{sample}。
-
-   - 使用 BibTeX 管理文献。
-
-   - 引用命令使用 \\cite{}。
-
-   - 参考文献样式由 wlscirep 自动控制（不可手动更换）。
-
-7. 图片与表格：
-
-   - 使用标准 figure / table 环境。
-
-   - 图片使用 \\includegraphics。
-
-   - 图注与表注最大 350 字。
-
-   - 使用 \\label{} + \\ref{} 进行交叉引用。
-
-8. 必须包含的附加章节：
+import os
+import threading
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple
+from .embeddings import Embedder, create_embedder_from_env, load_template_embeddings
+from .knowledge_pack import TEMPLATE_ID_PREFIX, get_template_pack
+from .knowledge_pack import normalize_journal_name as _normalize_journal_name
+from .search_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, SearchResultCache
 
-   - Acknowledgements（可选）
+if TYPE_CHECKING:
+    from .vector_db import VectorDatabase
 
-   - Author contributions statement（强制）
+# 向量数据库后端：chroma（默认）或 numpy（内存映射的平铺索引，不依赖 ChromaDB）
+VECTOR_BACKENDS = ("chroma", "numpy")
 
-   - Additional information（强制，含 Competing interests）
 
-9. 常见避坑指南：
+def __getattr__(name: str):
+    """
+    LATEX_TEMPLATE_KNOWLEDGE 保留为按需加载的兼容属性
 
-   - 不要改用 article / revtex / IEEE 类。
+    模板条目已移至知识数据包（见 knowledge_pack），访问该属性时才从数据包读取全部条目。
+    """
+    if name == "LATEX_TEMPLATE_KNOWLEDGE":
+        return get_template_pack().items()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-   - 不要给章节编号。
 
-   - 不要在 Abstract 中使用 \\cite{}。
+def template_entries(ids: Optional[List[str]] = None) -> Dict[str, Tuple[str, Dict]]:
+    """
+    知识数据包中的模板条目在向量数据库中的目标状态
+    
+    Args:
+        ids: 只读取这些条目，默认全部
+        
+    Returns:
+        {条目 ID: (文档, 带 journal_key 与 content_hash 的元数据)}
+    """
+    return get_template_pack().entries(ids)
 
-   - 不要手动加载不兼容的 bibliography 样式。
-""",
-        "metadata": {
-            "journal_name": "Scientific Reports",
-            "publisher": "Nature Portfolio",
-            "template_type": "journal_article",
-            "documentclass": "wlscirep",
-            "documentclass_options": ["fleqn", "10pt"],
-            "key_packages": "inputenc, fontenc",
-            "template_dir_path": "ScientificReports_LaTeX_template",
-            "main_tex_path": "main.tex",
-            "paper_template_specification": {
-                "document_class": "wlscirep",
-                "required_packages": ["inputenc", "fontenc"],
-                "citation_commands": ["\\cite"],
-                "forbidden_packages": ["biblatex", "natbib"],
-                "bib_style": "wlscirep default",
-                "image_folder": "figures",
-                "sectioning_rules": {
-                    "numbered_sections": False,
-                    "max_subsection_level": 3
-                },
-                "mandatory_sections": [
-                    "Author contributions statement",
-                    "Additional information"
-                ]
-            }
-        }
-    }
-]
 
-def _clean_metadata(metadata: Dict) -> Dict:
+def sync_knowledge_base(db: "VectorDatabase") -> Dict[str, List[str]]:
     """
-    清理 metadata，将嵌套字典转换为 JSON 字符串
+    将知识数据包中的模板条目增量同步到向量数据库
     
-    ChromaDB 的 metadata 只支持基本类型（str, int, float, bool, None），
-    不支持嵌套字典或列表。需要将嵌套结构转换为 JSON 字符串。
+    每个条目的元数据中保存 content_hash；与数据包索引中的哈希比较，只读取并批量 upsert
+    哈希变化（新增或修改）的条目，并删除已从数据包中移除的模板条目。内容未变时不读取条目内容，
+    也不做任何写入和嵌入计算。
+    需要写入的条目优先使用构建期预计算的向量（见 scripts/precompute_template_embeddings.py），
+    缺失的才由嵌入后端现场计算。
     
     Args:
-        metadata: 原始 metadata 字典
+        db: 向量数据库实例
         
     Returns:
-        清理后的 metadata 字典
+        {"added": [...], "updated": [...], "deleted": [...]}，元素为条目 ID
     """
-    cleaned = {}
-    for key, value in metadata.items():
-        if isinstance(value, (dict, list)):
-            # 将嵌套字典或列表转换为 JSON 字符串
-            cleaned[key] = json.dumps(value, ensure_ascii=False)
-        else:
-            # 基本类型直接保留
-            cleaned[key] = value
-    return cleaned
-
-def initialize_knowledge_base(persist_directory: str = "data/vector_db") -> VectorDatabase:
+    desired = get_template_pack().content_hashes()
+    existing = db.get_all_metadatas()
+    added, updated = [], []
+    for template_id, content_hash in desired.items():
+        if template_id not in existing:
+            added.append(template_id)
+        elif existing[template_id].get("content_hash") != content_hash:
+            updated.append(template_id)
+    deleted = [
+        doc_id for doc_id in existing
+        if doc_id.startswith(TEMPLATE_ID_PREFIX) and doc_id not in desired
+    ]
+    
+    changed = added + updated
+    if changed:
+        entries = template_entries(changed)
+        documents = [entries[template_id][0] for template_id in changed]
+        metadatas = [entries[template_id][1] for template_id in changed]
+        precomputed = load_template_embeddings(db.embedder.name)
+        embeddings = [precomputed.get(metadata["content_hash"]) for metadata in metadatas]
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+        if missing:
+            computed = db.embedder.embed_documents([documents[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                embeddings[i] = vector
+        db.upsert_documents(documents=documents, metadatas=metadatas, ids=changed, embeddings=embeddings)
+    if deleted:
+        db.delete_documents(ids=deleted)
+    return {"added": added, "updated": updated, "deleted": deleted}
+
+
+def _report_changes(db: "VectorDatabase", changes: Dict[str, List[str]]):
+    if changes["added"]:
+        print(f"知识库已更新，新增 {len(changes['added'])} 个模板: {', '.join(changes['added'])}")
+    if changes["updated"]:
+        print(f"知识库已更新，更新 {len(changes['updated'])} 个模板: {', '.join(changes['updated'])}")
+    if changes["deleted"]:
+        print(f"知识库已更新，删除 {len(changes['deleted'])} 个模板: {', '.join(changes['deleted'])}")
+    if any(changes.values()):
+        print(f"知识库当前包含 {db.get_collection_count()} 个文档")
+    else:
+        print(f"知识库已存在，当前包含 {db.get_collection_count()} 个文档，所有模板已是最新")
+
+
+def create_vector_database(
+    persist_directory: str = "data/vector_db",
+    embedder: Optional[Embedder] = None,
+    backend: Optional[str] = None
+) -> "VectorDatabase":
     """
-    初始化知识库
+    按配置创建向量数据库
     
     Args:
         persist_directory: 向量数据库持久化目录
+        embedder: 嵌入后端，默认按环境变量创建（见 embeddings.create_embedder_from_env）
+        backend: chroma 或 numpy，默认读取 AUTOLATEX_VECTOR_BACKEND（未设置时为 chroma）
         
     Returns:
-        初始化好的 VectorDatabase 实例
+        VectorDatabase 或接口相同的 NumpyVectorDatabase
     """
-    db = VectorDatabase(persist_directory=persist_directory)
+    backend = backend or os.getenv("AUTOLATEX_VECTOR_BACKEND", "chroma")
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"不支持的向量数据库后端: {backend}，可选: {', '.join(VECTOR_BACKENDS)}")
+    embedder = embedder or create_embedder_from_env()
+    # 按需导入，numpy 后端不加载 ChromaDB
+    if backend == "numpy":
+        from .numpy_vector_db import NumpyVectorDatabase
+        return NumpyVectorDatabase(persist_directory=persist_directory, embedder=embedder)
+    from .vector_db import VectorDatabase
+    return VectorDatabase(persist_directory=persist_directory, embedder=embedder)
+
+
+def initialize_knowledge_base(persist_directory: str = "data/vector_db", embedder: Optional[Embedder] = None) -> "VectorDatabase":
+    """
+    初始化知识库，并按内容哈希增量同步模板条目
     
-    # 如果数据库为空，则初始化所有数据
-    if db.get_collection_count() == 0:
-        documents = [item["document"] for item in LATEX_TEMPLATE_KNOWLEDGE]
-        metadatas = [_clean_metadata(item["metadata"]) for item in LATEX_TEMPLATE_KNOWLEDGE]
-        ids = [f"template_{item['journal'].lower().replace(' ', '_')}" for item in LATEX_TEMPLATE_KNOWLEDGE]
-        
-        db.add_documents(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print(f"知识库已初始化，共添加 {len(documents)} 个模板")
-    else:
-        # 检查并添加缺失的模板，或更新已存在的模板
-        existing_count = db.get_collection_count()
-        new_templates = []
-        updated_templates = []
-        new_documents = []
-        new_metadatas = []
-        new_ids = []
-        
-        # 首先检查并删除旧的 "BIThesis" 条目（如果存在）
-        old_bithesis_id = "template_bithesis"
-        if db.id_exists(old_bithesis_id):
-            try:
-                db.delete_documents(ids=[old_bithesis_id])
-                print(f"已删除旧的 BIThesis 条目")
-            except Exception as e:
-                print(f"删除旧 BIThesis 条目时出错: {e}")
-        
-        for item in LATEX_TEMPLATE_KNOWLEDGE:
-            template_id = f"template_{item['journal'].lower().replace(' ', '_')}"
-            if not db.id_exists(template_id):
-                # 新模板
-                new_templates.append(item['journal'])
-                new_documents.append(item["document"])
-                new_metadatas.append(_clean_metadata(item["metadata"]))
-                new_ids.append(template_id)
-            elif item['journal'] in ['BIThesis-Graduate', 'BIThesis-Undergraduate', 'BIThesis-Undergraduate-English']:
-                # BIThesis 模板需要更新（删除旧的后添加新的）
-                try:
-                    db.delete_documents(ids=[template_id])
-                    updated_templates.append(item['journal'])
-                    new_documents.append(item["document"])
-                    new_metadatas.append(_clean_metadata(item["metadata"]))
-                    new_ids.append(template_id)
-                except Exception as e:
-                    # 如果删除失败（可能不存在），仍然尝试添加
-                    print(f"更新 {item['journal']} 时删除旧条目失败（可能不存在）: {e}")
-                    updated_templates.append(item['journal'])
-                    new_documents.append(item["document"])
-                    new_metadatas.append(_clean_metadata(item["metadata"]))
-                    new_ids.append(template_id)
+    Args:
+        persist_directory: 向量数据库持久化目录
+        embedder: 嵌入后端，默认按环境变量创建（见 embeddings.create_embedder_from_env）
         
-        if new_templates or updated_templates:
-            if new_documents:
-                db.add_documents(
-                    documents=new_documents,
-                    metadatas=new_metadatas,
-                    ids=new_ids
-                )
-            if new_templates:
-                print(f"知识库已更新，新增 {len(new_templates)} 个模板: {', '.join(new_templates)}")
-            if updated_templates:
-                print(f"知识库已更新，更新 {len(updated_templates)} 个模板: {', '.join(updated_templates)}")
-            print(f"知识库当前包含 {db.get_collection_count()} 个文档")
-        else:
-            print(f"知识库已存在，当前包含 {db.get_collection_count()} 个文档，所有模板已是最新")
-    
+    Returns:
+        初始化好的向量数据库实例（后端见 create_vector_database）
+    """
+    db = create_vector_database(persist_directory, embedder)
+    _report_changes(db, sync_knowledge_base(db))
     return db
 
 def get_all_journal_names() -> List[str]:
@@ -501,64 +152,16 @@ def get_all_journal_names() -> List[str]:
     Returns:
         期刊名称列表，按字母顺序排序
     """
-    journal_names = [item["journal"] for item in LATEX_TEMPLATE_KNOWLEDGE]
+    journal_names = get_template_pack().journal_names()
     # 按字母顺序排序，中文期刊排在后面
     sorted_names = sorted(journal_names, key=lambda x: (not x.isascii(), x))
     return sorted_names
 
-def knowledge_base_search(journal_name: str, n_results: int = 3) -> str:
-    """
-    在知识库中搜索期刊模板信息
-    
-    Args:
-        journal_name: 期刊名称
-        n_results: 返回结果数量
-        
-    Returns:
-        格式化的搜索结果字符串
-    """
-    # 初始化或加载知识库
-    db = initialize_knowledge_base()
-    
-    # 首先尝试精确匹配（通过元数据过滤）
-    exact_match = None
-    query_lower = journal_name.lower().strip()
-    
-    # 检查是否有精确匹配的 journal_name
-    try:
-        all_results = db.collection.get()
-        if all_results and all_results.get('ids'):
-            for i, metadata in enumerate(all_results.get('metadatas', [])):
-                if metadata and metadata.get('journal_name', '').lower() == query_lower:
-                    # 找到精确匹配，获取完整信息
-                    doc_id = all_results['ids'][i]
-                    doc_text = all_results['documents'][i] if all_results.get('documents') else ""
-                    exact_match = {
-                        'document': doc_text,
-                        'metadata': metadata,
-                        'distance': 0.0,
-                        'id': doc_id
-                    }
-                    break
-    except Exception as e:
-        print(f"精确匹配检查时出错: {e}")
-    
-    # 执行向量搜索
-    vector_results = db.search(query=journal_name, n_results=n_results * 2)  # 获取更多结果以便过滤
-    
-    # 合并结果：如果有精确匹配，将其放在第一位
-    if exact_match:
-        # 移除向量搜索结果中的精确匹配（如果存在）
-        filtered_results = [r for r in vector_results 
-                          if r.get('metadata', {}).get('journal_name', '').lower() != query_lower]
-        results = [exact_match] + filtered_results[:n_results - 1]
-    else:
-        results = vector_results[:n_results]
-    
+def _format_results(journal_name: str, results: List[Dict], is_exact: bool) -> str:
+    """将搜索结果格式化为供 Agent 阅读的文本"""
     if not results:
         return f"未找到与 '{journal_name}' 相关的 LaTeX 模板信息。"
     
-    # 格式化返回结果
     output_parts = []
     for i, result in enumerate(results, 1):
         doc = result['document']
@@ -567,7 +170,7 @@ def knowledge_base_search(journal_name: str, n_results: int = 3) -> str:
         similarity = 1 - distance if distance else 1.0  # 转换为相似度分数
         
         # 如果是精确匹配，标注出来
-        match_type = "（精确匹配）" if i == 1 and exact_match and result == exact_match else ""
+        match_type = "（精确匹配）" if is_exact else ""
         
         output_parts.append(f"【结果 {i}】相似度: {similarity:.2%}{match_type}")
         output_parts.append(f"期刊: {metadata.get('journal_name', 'Unknown')}")
@@ -579,3 +182,207 @@ def knowledge_base_search(journal_name: str, n_results: int = 3) -> str:
     
     return "\n".join(output_parts)
 
+
+class KnowledgeBaseService:
+    """
+    进程内共享的知识库服务
+
+    只在创建时初始化一次向量数据库。条目元数据中保存规范化期刊名 journal_key，
+    精确匹配按 journal_key 在向量数据库内过滤、只读取命中的一条；只有模糊查询才走向量检索。
+    格式化后的搜索结果按 (规范化查询, n_results) 缓存，知识库同步出现变化时清空。
+    每次搜索前检查知识数据包版本，数据包被重新构建后自动 refresh；
+    绕过数据包直接修改向量数据库的改动只在缓存条目过期（TTL）或重启后可见。
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "data/vector_db",
+        embedder: Optional[Embedder] = None,
+        cache: Optional[SearchResultCache] = None,
+        warmup: bool = True,
+    ):
+        """
+        Args:
+            persist_directory: 向量数据库持久化目录
+            embedder: 嵌入后端，默认按环境变量创建
+            cache: 搜索结果缓存，默认按 AUTOLATEX_KB_CACHE_SIZE / AUTOLATEX_KB_CACHE_TTL 创建
+            warmup: 是否在初始化时预加载查询嵌入模型
+        """
+        # 先记录版本再同步：两者之间数据包被重新构建时，下次搜索会多做一次 refresh 而不是漏掉
+        self._pack_version = get_template_pack().version
+        self._refresh_lock = threading.Lock()
+        self.db = initialize_knowledge_base(persist_directory, embedder)
+        self.cache = cache or SearchResultCache(
+            max_entries=int(os.getenv("AUTOLATEX_KB_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.getenv("AUTOLATEX_KB_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+        )
+        self._journal_keys = set()
+        self._load_journal_keys()
+        if warmup:
+            try:
+                self.db.warmup()
+            except Exception as e:
+                # 离线环境下默认嵌入模型可能无法加载，精确匹配仍可用
+                print(f"查询嵌入模型预热失败: {e}")
+
+    def _load_journal_keys(self):
+        """读取已有的 journal_key 集合（只读元数据），未收录的期刊名无需查询数据库"""
+        self._journal_keys = {
+            metadata["journal_key"] for metadata in self.db.get_all_metadatas().values()
+            if metadata.get("journal_key")
+        }
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """
+        重新同步知识数据包；集合有变化时重建期刊名索引并清空结果缓存
+        
+        Returns:
+            sync_knowledge_base 的变更列表
+        """
+        self._pack_version = get_template_pack().version
+        changes = sync_knowledge_base(self.db)
+        if any(changes.values()):
+            _report_changes(self.db, changes)
+            self._load_journal_keys()
+            self.cache.clear()
+        return changes
+
+    def _refresh_if_pack_changed(self):
+        """数据包版本变化（被重新构建）时 refresh；TemplatePack 每次只对 index.json 做一次 stat"""
+        if get_template_pack().version == self._pack_version:
+            return
+        with self._refresh_lock:
+            if get_template_pack().version != self._pack_version:
+                self.refresh()
+
+    def get_exact(self, journal_name: str) -> Optional[Dict]:
+        """按期刊名精确查找（忽略大小写与多余空白），未命中返回 None"""
+        journal_key = _normalize_journal_name(journal_name)
+        if journal_key not in self._journal_keys:
+            return None
+        matches = self.db.get_by_metadata(
+            {"journal_key": journal_key}, include=("documents", "metadatas"), limit=1
+        )
+        if not matches:
+            return None
+        return {
+            "document": matches[0]["document"],
+            "metadata": matches[0]["metadata"],
+            "distance": 0.0,
+            "id": matches[0]["id"],
+        }
+
+    def search(self, journal_name: str, n_results: int = 3) -> Tuple[List[Dict], bool]:
+        """
+        搜索期刊模板
+
+        Args:
+            journal_name: 期刊名称
+            n_results: 模糊查询时返回的结果数量
+
+        Returns:
+            (结果列表, 是否为精确匹配)；精确命中时只返回该条目，不做向量检索
+        """
+        return self.search_many([journal_name], n_results=n_results)[0]
+
+    def search_many(
+        self, journal_names: List[str], n_results: int = 3, where: Optional[Dict] = None
+    ) -> List[Tuple[List[Dict], bool]]:
+        """
+        批量搜索期刊模板：精确命中的直接返回，其余查询一次批量嵌入、一次向量检索
+
+        Args:
+            journal_names: 期刊名称列表
+            n_results: 模糊查询时每个名称返回的结果数量
+            where: 模糊查询的元数据过滤条件（如 {"template_type": "journal"}）
+
+        Returns:
+            与 journal_names 顺序一致的 [(结果列表, 是否为精确匹配)]
+        """
+        self._refresh_if_pack_changed()
+        outcomes: List[Optional[Tuple[List[Dict], bool]]] = []
+        fuzzy = []
+        for i, journal_name in enumerate(journal_names):
+            exact_match = self.get_exact(journal_name)
+            if exact_match is not None:
+                outcomes.append(([exact_match], True))
+            else:
+                outcomes.append(None)
+                fuzzy.append(i)
+        if fuzzy:
+            vector_results = self.db.search_many(
+                [journal_names[i] for i in fuzzy], n_results=n_results, where=where
+            )
+            for i, results in zip(fuzzy, vector_results):
+                outcomes[i] = (results, False)
+        return outcomes
+
+    def search_text(self, journal_name: str, n_results: int = 3) -> str:
+        """搜索并返回格式化文本，结果按 (规范化查询, n_results) 缓存"""
+        return self.search_text_many([journal_name], n_results=n_results)[0]
+
+    def search_text_many(self, journal_names: List[str], n_results: int = 3) -> List[str]:
+        """批量搜索并返回格式化文本；未命中缓存的名称合并为一次 search_many"""
+        self._refresh_if_pack_changed()
+        keys = [(_normalize_journal_name(name), n_results) for name in journal_names]
+        texts: List[Optional[str]] = [self.cache.get(key) for key in keys]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        if missing:
+            outcomes = self.search_many([journal_names[i] for i in missing], n_results=n_results)
+            for i, (results, is_exact) in zip(missing, outcomes):
+                texts[i] = _format_results(journal_names[i], results, is_exact)
+                self.cache.put(keys[i], texts[i])
+        return texts
+
+    def stats(self) -> Dict:
+        """知识库条目数、嵌入后端与结果缓存命中统计"""
+        return {
+            "entries": self.db.get_collection_count(),
+            "journals": len(self._journal_keys),
+            "embedder": self.db.embedder.name,
+            "cache": self.cache.stats(),
+        }
+
+
+_services: Dict[str, KnowledgeBaseService] = {}
+_services_lock = threading.Lock()
+
+
+def get_knowledge_base_service(persist_directory: str = "data/vector_db") -> KnowledgeBaseService:
+    """获取进程内共享的知识库服务，首次调用时初始化"""
+    key = os.path.abspath(persist_directory)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = KnowledgeBaseService(persist_directory)
+        return service
+
+
+def knowledge_base_search(journal_name: str, n_results: int = 3) -> str:
+    """
+    在知识库中搜索期刊模板信息
+
+    期刊名精确命中时直接返回该模板，否则按向量相似度返回最相关的 n_results 个模板。
+    
+    Args:
+        journal_name: 期刊名称
+        n_results: 返回结果数量
+        
+    Returns:
+        格式化的搜索结果字符串
+    """
+    return get_knowledge_base_service().search_text(journal_name, n_results=n_results)
+
+
+def knowledge_base_search_many(journal_names: List[str], n_results: int = 3) -> List[str]:
+    """
+    批量搜索多个期刊名（如候选期刊名或模板列表），模糊查询合并为一次批量检索
+    
+    Args:
+        journal_names: 期刊名称列表
+        n_results: 每个名称返回的结果数量
+        
+    Returns:
+        与 journal_names 顺序一致的格式化搜索结果
+    """
+    return get_knowledge_base_service().search_text_many(journal_names, n_results=n_results)
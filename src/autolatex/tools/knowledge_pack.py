@@ -0,0 +1,342 @@
+"""
+LaTeX 模板知识数据包
+
+模板条目不再写在 Python 源码中，而是以数据包形式存放在 data/knowledge_pack/ 目录：
+    source/<条目>.json   人工维护的条目源文件（journal、document、metadata 等）
+    templates.jsonl      构建产物，每行一个条目
+    index.json           构建产物，记录每个条目的 ID、期刊名、content_hash 及其在 templates.jsonl 中的字节位置
+    embeddings/          构建产物（可选），scripts/precompute_template_embeddings.py 生成的模板向量
+
+运行时只读取 index.json，条目内容按需 seek 读取单行；修改 source/ 后运行
+scripts/build_knowledge_pack.py 重新构建并校验。
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PACK_FORMAT_VERSION = 1
+DEFAULT_PACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge_pack")
+SOURCE_DIR_NAME = "source"
+TEMPLATES_FILE = "templates.jsonl"
+INDEX_FILE = "index.json"
+# 构建期预计算的模板向量目录（<pack_dir>/embeddings/<嵌入后端>.json），见 embeddings.load_template_embeddings
+EMBEDDINGS_DIR_NAME = "embeddings"
+
+# 知识库模板条目的 ID 前缀；同步时只管理带此前缀的条目
+TEMPLATE_ID_PREFIX = "template_"
+
+
+def clean_metadata(metadata: Dict) -> Dict:
+    """
+    清理 metadata，将嵌套字典转换为 JSON 字符串
+
+    ChromaDB 的 metadata 只支持基本类型（str, int, float, bool, None），
+    不支持嵌套字典或列表。需要将嵌套结构转换为 JSON 字符串。
+
+    Args:
+        metadata: 原始 metadata 字典
+
+    Returns:
+        清理后的 metadata 字典
+    """
+    cleaned = {}
+    for key, value in metadata.items():
+        if isinstance(value, (dict, list)):
+            # 将嵌套字典或列表转换为 JSON 字符串
+            cleaned[key] = json.dumps(value, ensure_ascii=False)
+        else:
+            # 基本类型直接保留
+            cleaned[key] = value
+    return cleaned
+
+
+def normalize_journal_name(name: str) -> str:
+    """精确匹配用的期刊名：去掉首尾空白、合并连续空白并转为小写"""
+    return " ".join(name.split()).lower()
+
+
+def template_id(item: Dict) -> str:
+    """模板条目在向量数据库中的 ID"""
+    return f"{TEMPLATE_ID_PREFIX}{item['journal'].lower().replace(' ', '_')}"
+
+
+def content_hash(document: str, metadata: Dict) -> str:
+    """条目内容哈希：文档与（清理后的）元数据任一变化都会改变哈希"""
+    payload = json.dumps({"document": document, "metadata": metadata}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def entry_metadata(item: Dict) -> Dict:
+    """
+    条目写入向量数据库的元数据
+
+    Returns:
+        清理后的元数据，带 journal_key（规范化期刊名，供精确匹配按元数据过滤）与 content_hash
+    """
+    metadata = clean_metadata(item["metadata"])
+    metadata["journal_key"] = normalize_journal_name(metadata.get("journal_name", item["journal"]))
+    metadata["content_hash"] = content_hash(item["document"], metadata)
+    return metadata
+
+
+def validate_item(item: Dict) -> List[str]:
+    """
+    检查单个条目的结构
+
+    Returns:
+        错误信息列表，为空表示通过
+    """
+    errors = []
+    if not isinstance(item, dict):
+        return ["条目必须是 JSON 对象"]
+    for field in ("journal", "document"):
+        if not isinstance(item.get(field), str) or not item[field].strip():
+            errors.append(f"缺少非空字符串字段 {field}")
+    metadata = item.get("metadata")
+    if not isinstance(metadata, dict):
+        errors.append("缺少 metadata 对象")
+    else:
+        for key, value in metadata.items():
+            if not isinstance(value, (str, int, float, bool, dict, list)) and value is not None:
+                errors.append(f"metadata.{key} 的类型不受支持: {type(value).__name__}")
+    if "requirements" in item and not isinstance(item["requirements"], str):
+        errors.append("requirements 必须是字符串")
+    return errors
+
+
+def _read_source(source_dir: str) -> List[Tuple[str, Dict]]:
+    items = []
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(source_dir, filename), "r", encoding="utf-8") as f:
+            items.append((filename, json.load(f)))
+    return items
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_pack(pack_dir: str = DEFAULT_PACK_DIR, source_dir: Optional[str] = None) -> Dict:
+    """
+    由 source/ 中的条目源文件构建数据包
+
+    校验每个条目的结构、ID 与期刊名不重复，计算 content_hash，写出 templates.jsonl 与 index.json。
+
+    Args:
+        pack_dir: 数据包目录
+        source_dir: 条目源文件目录，默认 <pack_dir>/source
+
+    Returns:
+        写出的索引内容
+
+    Raises:
+        ValueError: 条目不合法或存在重复
+    """
+    source_dir = source_dir or os.path.join(pack_dir, SOURCE_DIR_NAME)
+    errors = []
+    lines, entries = [], []
+    seen_ids, seen_keys = {}, {}
+    offset = 0
+    for filename, item in _read_source(source_dir):
+        item_errors = validate_item(item)
+        if item_errors:
+            errors.extend(f"{filename}: {error}" for error in item_errors)
+            continue
+        entry_id = template_id(item)
+        metadata = entry_metadata(item)
+        if entry_id in seen_ids:
+            errors.append(f"{filename}: ID {entry_id} 与 {seen_ids[entry_id]} 重复")
+            continue
+        if metadata["journal_key"] in seen_keys:
+            errors.append(f"{filename}: 期刊名 {metadata['journal_key']} 与 {seen_keys[metadata['journal_key']]} 重复")
+            continue
+        seen_ids[entry_id] = filename
+        seen_keys[metadata["journal_key"]] = filename
+
+        line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+        lines.append(line)
+        entries.append({
+            "id": entry_id,
+            "journal": item["journal"],
+            "journal_key": metadata["journal_key"],
+            "content_hash": metadata["content_hash"],
+            "offset": offset,
+            "length": len(line),
+        })
+        offset += len(line)
+    if errors:
+        raise ValueError("知识数据包构建失败:\n" + "\n".join(errors))
+
+    # 数据包版本由全部条目哈希决定，内容不变时重复构建结果完全相同
+    version = hashlib.sha256("".join(entry["content_hash"] for entry in entries).encode("utf-8")).hexdigest()[:16]
+    index = {"format_version": PACK_FORMAT_VERSION, "version": version, "entries": entries}
+    os.makedirs(pack_dir, exist_ok=True)
+    _write_atomic(os.path.join(pack_dir, TEMPLATES_FILE), b"".join(lines))
+    _write_atomic(
+        os.path.join(pack_dir, INDEX_FILE),
+        (json.dumps(index, ensure_ascii=False, indent=2) + "\n").encode("utf-8"),
+    )
+    return index
+
+
+class TemplatePack:
+    """
+    模板知识数据包的只读视图
+
+    索引在首次访问时加载，index.json 被重新构建后自动重新加载；
+    条目内容按索引中的字节位置单独读取，不把整个数据包放入内存。
+    """
+
+    def __init__(self, pack_dir: str = DEFAULT_PACK_DIR):
+        self.pack_dir = pack_dir
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._version: Optional[str] = None
+        self._index_mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _index(self) -> Dict[str, Dict]:
+        # index.json 的 mtime 变化（数据包被重新构建）时重新加载，进程内 refresh 能看到新内容
+        index_path = os.path.join(self.pack_dir, INDEX_FILE)
+        mtime_ns = os.stat(index_path).st_mtime_ns
+        if self._entries is None or mtime_ns != self._index_mtime_ns:
+            with self._lock:
+                if self._entries is None or mtime_ns != self._index_mtime_ns:
+                    with open(index_path, "r", encoding="utf-8") as f:
+                        index = json.load(f)
+                    if index.get("format_version") != PACK_FORMAT_VERSION:
+                        raise ValueError(
+                            f"不支持的知识数据包格式版本: {index.get('format_version')}，"
+                            f"请运行 scripts/build_knowledge_pack.py 重新构建"
+                        )
+                    self._version = index["version"]
+                    self._entries = {entry["id"]: entry for entry in index["entries"]}
+                    self._index_mtime_ns = mtime_ns
+        return self._entries
+
+    @property
+    def version(self) -> str:
+        """数据包版本（全部条目哈希的摘要）"""
+        self._index()
+        return self._version
+
+    def ids(self) -> List[str]:
+        """全部条目 ID"""
+        return list(self._index())
+
+    def journal_names(self) -> List[str]:
+        """全部条目的期刊名（条目的 journal 字段）"""
+        return [entry["journal"] for entry in self._index().values()]
+
+    def content_hashes(self) -> Dict[str, str]:
+        """{条目 ID: content_hash}，只读索引"""
+        return {entry_id: entry["content_hash"] for entry_id, entry in self._index().items()}
+
+    def find_id(self, journal_name: str) -> Optional[str]:
+        """按规范化期刊名查找条目 ID，未找到返回 None"""
+        key = normalize_journal_name(journal_name)
+        for entry_id, entry in self._index().items():
+            if entry["journal_key"] == key:
+                return entry_id
+        return None
+
+    def _read_lines(self, entries: List[Dict]) -> List[bytes]:
+        lines = []
+        with open(os.path.join(self.pack_dir, TEMPLATES_FILE), "rb") as f:
+            for entry in entries:
+                f.seek(entry["offset"])
+                lines.append(f.read(entry["length"]))
+        return lines
+
+    def get_items(self, ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        读取指定条目的原始内容
+
+        Args:
+            ids: 条目 ID
+
+        Returns:
+            {条目 ID: 条目（journal、document、metadata 等）}
+
+        Raises:
+            KeyError: ID 不在数据包中
+        """
+        index = self._index()
+        entries = [index[entry_id] for entry_id in ids]
+        return {
+            entry["id"]: json.loads(line.decode("utf-8"))
+            for entry, line in zip(entries, self._read_lines(entries))
+        }
+
+    def get_item(self, entry_id: str) -> Dict:
+        """读取单个条目的原始内容"""
+        return self.get_items([entry_id])[entry_id]
+
+    def items(self) -> List[Dict]:
+        """按数据包顺序读取全部条目"""
+        return list(self.get_items(self.ids()).values())
+
+    def entries(self, ids: Optional[Iterable[str]] = None) -> Dict[str, Tuple[str, Dict]]:
+        """
+        条目在向量数据库中的目标状态
+
+        Args:
+            ids: 只读取这些条目，默认全部
+
+        Returns:
+            {条目 ID: (文档, 带 journal_key 与 content_hash 的元数据)}
+        """
+        items = self.get_items(self.ids() if ids is None else ids)
+        return {entry_id: (item["document"], entry_metadata(item)) for entry_id, item in items.items()}
+
+    def validate(self) -> List[str]:
+        """
+        完整校验数据包：逐条读取，检查结构、ID 与索引一致、content_hash 与内容一致
+
+        Returns:
+            错误信息列表，为空表示通过
+        """
+        errors = []
+        try:
+            index = self._index()
+        except (OSError, ValueError, KeyError) as e:
+            return [f"无法读取索引: {e}"]
+        for entry_id, entry in index.items():
+            try:
+                item = self.get_item(entry_id)
+            except ValueError as e:
+                errors.append(f"{entry_id}: 无法解析条目: {e}")
+                continue
+            item_errors = validate_item(item)
+            if item_errors:
+                errors.extend(f"{entry_id}: {error}" for error in item_errors)
+                continue
+            if template_id(item) != entry_id:
+                errors.append(f"{entry_id}: 条目内容对应的 ID 为 {template_id(item)}")
+            if entry_metadata(item)["content_hash"] != entry["content_hash"]:
+                errors.append(f"{entry_id}: content_hash 与条目内容不一致")
+        return errors
+
+
+_packs: Dict[str, TemplatePack] = {}
+_packs_lock = threading.Lock()
+
+
+def get_template_pack(pack_dir: Optional[str] = None) -> TemplatePack:
+    """
+    获取进程内共享的数据包实例
+
+    Args:
+        pack_dir: 数据包目录，默认 AUTOLATEX_KNOWLEDGE_PACK_DIR 或随代码分发的 data/knowledge_pack/
+    """
+    pack_dir = os.path.abspath(pack_dir or os.getenv("AUTOLATEX_KNOWLEDGE_PACK_DIR") or DEFAULT_PACK_DIR)
+    with _packs_lock:
+        if pack_dir not in _packs:
+            _packs[pack_dir] = TemplatePack(pack_dir)
+        return _packs[pack_dir]
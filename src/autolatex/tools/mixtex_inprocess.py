@@ -0,0 +1,100 @@
+"""
+MixTex OCR 进程内后端
+
+crew 与 OCR 模型部署在同一台机器时，MixTexOCRTool 可直接在进程内调用 OCRModelWrapper，
+省去 multipart 编码、本地 socket 往返与 JSON 序列化。模型按与 OCR API 服务相同的
+OCR_* 环境变量懒加载为进程内单例，并使用与服务端相同的动态批处理队列（MicroBatcher）。
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# ocr_model_wrapper / ocr_batching / ocr_tiling 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+
+class InProcessOCRBackend:
+    """进程内的模型封装 + 动态批处理器，接口与 /predict_batch 的语义一致。"""
+
+    def __init__(self):
+        if str(PROJECT_ROOT) not in sys.path:
+            sys.path.insert(0, str(PROJECT_ROOT))
+        from ocr_batching import create_batcher_from_env
+        from ocr_model_wrapper import create_model_wrapper_from_env
+        from ocr_tiling import merge_tile_predictions, split_formula_lines
+
+        self._split_formula_lines = split_formula_lines
+        self._merge_tile_predictions = merge_tile_predictions
+        print("[MixTex OCR] 进程内后端：加载 OCR 模型 ...")
+        self.model_wrapper = create_model_wrapper_from_env()
+        self.batcher = create_batcher_from_env(self.model_wrapper)
+        self.batcher.start()
+
+    def identity(self) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """与 /health 相同的模型标识、生成参数与各适配器标识，用于构造缓存键"""
+        wrapper = self.model_wrapper
+        return f"mixtex:{wrapper.model_id}", wrapper.generation_config(), dict(wrapper.model_ids)
+
+    def recognize(
+        self,
+        image_paths: Sequence[str],
+        max_lengths: Sequence[int],
+        enhance: bool = True,
+        decoding: Optional[str] = None,
+        tile: bool = False,
+        adapter: Optional[str] = None,
+    ) -> List[Tuple[str, bool]]:
+        """
+        识别多张图片：全部提交到批处理队列后统一等待，由 MicroBatcher 负责聚批。
+
+        Returns:
+            与 image_paths 顺序一致的 [(LaTeX 或错误说明, 是否成功)]
+        """
+        from PIL import Image
+
+        jobs: List[Any] = []
+        for path, max_length in zip(image_paths, max_lengths):
+            try:
+                image = Image.open(path)
+                image.load()
+                strips = self._split_formula_lines(image) if tile else [image]
+                # 同一张图片的条带整体入队，不会只入队一部分
+                jobs.append(self.batcher.submit_many(
+                    strips, max_length, enhance=enhance, decoding=decoding, adapter=adapter
+                ))
+            except Exception as e:
+                jobs.append(e)
+
+        results: List[Tuple[str, bool]] = []
+        for job in jobs:
+            if isinstance(job, Exception):
+                results.append((f"识别失败：{job}", False))
+                continue
+            try:
+                predictions = [future.result() for future in job]
+            except Exception as e:
+                results.append((f"识别失败：{e}", False))
+                continue
+            prediction = predictions[0] if len(predictions) == 1 else self._merge_tile_predictions(predictions)
+            if prediction.latex:
+                results.append((prediction.latex, True))
+            else:
+                results.append(("识别失败：结果为空", False))
+        return results
+
+
+_backend: Optional[InProcessOCRBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_inprocess_backend() -> InProcessOCRBackend:
+    """获取进程内共享的后端实例，首次调用时加载模型"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = InProcessOCRBackend()
+        return _backend
@@ -2,17 +2,30 @@
 MixTex OCR API 工具
 
 通过 HTTP 调用本地/远程的 MixTex FastAPI `/predict` 接口，将图片转为 LaTeX。
+整个公式目录可通过 `/predict_batch` 接口一次请求完成识别。
 """
 
 from __future__ import annotations
 
+import json
 import os
 import mimetypes
-from typing import Type
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
 
 import requests
+from requests.adapters import HTTPAdapter
 from crewai.tools import BaseTool  # type: ignore
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .mixtex_inprocess import get_inprocess_backend
+from .ocr_cache import OCRResultCache, get_ocr_cache
+
+# http：调用 OCR API 服务；inprocess：在当前进程内加载模型直接识别
+OCR_BACKENDS = ("http", "inprocess")
 
 
 class MixTexOCRToolInput(BaseModel):
@@ -20,7 +33,10 @@ class MixTexOCRToolInput(BaseModel):
 
     image_path: str = Field(
         ...,
-        description="待识别图片的路径（绝对路径或相对项目根目录）",
+        description=(
+            "待识别图片的路径（绝对路径或相对项目根目录）；"
+            "也可以是公式图片目录，此时一次请求识别目录下全部图片"
+        ),
     )
     max_length: int = Field(
         512,
@@ -32,6 +48,40 @@ class MixTexOCRToolInput(BaseModel):
     )
 
 
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+
+
+def _guess_image_mime_type(image_path: str) -> str:
+    """根据文件扩展名确定图片的 MIME 类型"""
+    mime_type, _ = mimetypes.guess_type(image_path)
+    if not mime_type or not mime_type.startswith('image/'):
+        # 如果无法识别，根据扩展名手动设置
+        ext = os.path.splitext(image_path)[1].lower()
+        mime_map = {
+            '.png': 'image/png',
+            '.jpg': 'image/jpeg',
+            '.jpeg': 'image/jpeg',
+            '.gif': 'image/gif',
+            '.bmp': 'image/bmp',
+            '.webp': 'image/webp',
+        }
+        mime_type = mime_map.get(ext, 'image/png')  # 默认使用 PNG
+    return mime_type
+
+
+def _service_url_for(api_url: str, endpoint: str) -> str:
+    """由 /predict 地址推导同一服务上其他接口的地址"""
+    base = api_url.rstrip("/")
+    if base.endswith("/predict"):
+        base = base[: -len("/predict")]
+    return f"{base}/{endpoint}"
+
+
+def _batch_url_for(api_url: str) -> str:
+    """由 /predict 地址推导 /predict_batch 地址"""
+    return _service_url_for(api_url, "predict_batch")
+
+
 class MixTexOCRTool(BaseTool):
     """
     调用已启动的 MixTex OCR FastAPI 服务，将图片转换为 LaTeX 代码。
@@ -49,52 +99,123 @@ class MixTexOCRTool(BaseTool):
         default="http://localhost:8001/predict",
         description="OCR API 服务地址"
     )
+    batch_api_url: str = Field(
+        default="http://localhost:8001/predict_batch",
+        description="OCR 批量识别 API 服务地址"
+    )
+    use_cache: bool = Field(
+        default=True,
+        description="是否使用按图片内容寻址的 OCR 结果缓存"
+    )
+    decoding: Optional[str] = Field(
+        default_factory=lambda: os.getenv("MIXTEX_OCR_DECODING") or None,
+        description="解码策略 beam / greedy / adaptive，未设置时使用服务端默认值"
+    )
+    adapter: Optional[str] = Field(
+        default_factory=lambda: os.getenv("MIXTEX_OCR_ADAPTER") or None,
+        description="服务端多适配器模式下使用的 LoRA 适配器，未设置时使用服务端默认适配器"
+    )
+    tile: bool = Field(
+        default_factory=lambda: os.getenv("MIXTEX_OCR_TILE", "").lower() in ("1", "true", "yes"),
+        description="是否按行切分多行公式分别识别，再拼接为 aligned 环境"
+    )
+    stream_token_timeout: Optional[float] = Field(
+        default_factory=lambda: float(os.getenv("MIXTEX_OCR_STREAM_TOKEN_TIMEOUT", 0)) or None,
+        description="设置后单张图片改用 /predict_stream 流式识别，超过该秒数未收到新 token 即中断"
+    )
 
-    def __init__(self, api_url: str | None = None, **kwargs):
+    backend: str = Field(
+        default_factory=lambda: os.getenv("MIXTEX_OCR_BACKEND", "http"),
+        description="http 调用 OCR API 服务；inprocess 在当前进程内加载模型（按 OCR_* 环境变量配置）"
+    )
+    max_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("MIXTEX_OCR_MAX_CONCURRENCY", 4)),
+        description="批量识别时同时在途的请求数"
+    )
+    batch_chunk_size: int = Field(
+        default_factory=lambda: int(os.getenv("MIXTEX_OCR_BATCH_CHUNK_SIZE", 16)),
+        description="批量识别时每个 /predict_batch 请求包含的图片数"
+    )
+    max_retries: int = Field(
+        default_factory=lambda: int(os.getenv("MIXTEX_OCR_MAX_RETRIES", 3)),
+        description="遇到 5xx（含 503 排队已满）或连接错误时的最大重试次数"
+    )
+    identity_ttl_seconds: float = Field(
+        default_factory=lambda: float(os.getenv("MIXTEX_OCR_IDENTITY_TTL", 60)),
+        description="服务端模型标识的有效期（秒）；服务端切换 checkpoint 或适配器后，最迟经过该时间缓存键随之更新"
+    )
+
+    # 复用 TCP 连接的会话，首次请求时创建
+    _session: Optional[requests.Session] = PrivateAttr(default=None)
+    _session_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    # 最近一次批量识别的吞吐统计
+    _last_run_stats: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    # 服务端模型标识、生成参数与各适配器的模型标识，使用缓存时从 /health 获取，过期后重新获取
+    _server_identity: Optional[Tuple[str, Dict[str, Any], Dict[str, str]]] = PrivateAttr(default=None)
+    _server_identity_at: float = PrivateAttr(default=0.0)
+
+    def __init__(self, api_url: str | None = None, batch_api_url: str | None = None, **kwargs):
         # 确定 API URL：优先使用参数，其次环境变量，最后默认值
         final_api_url = (
             api_url
             or os.getenv("MIXTEX_OCR_API_URL")
             or "http://localhost:8001/predict"
         )
-        super().__init__(api_url=final_api_url, **kwargs)
+        final_batch_api_url = (
+            batch_api_url
+            or os.getenv("MIXTEX_OCR_BATCH_API_URL")
+            or _batch_url_for(final_api_url)
+        )
+        super().__init__(api_url=final_api_url, batch_api_url=final_batch_api_url, **kwargs)
+        if self.backend not in OCR_BACKENDS:
+            raise ValueError(f"不支持的 OCR 后端: {self.backend}，可选: {', '.join(OCR_BACKENDS)}")
 
     def _run(self, image_path: str, max_length: int = 512, enhance: bool = True) -> str:
         abs_image_path = os.path.abspath(image_path)
         if not os.path.exists(abs_image_path):
             return f"错误：图片不存在 - {abs_image_path}"
 
-        # FastAPI 对 form bool 使用 "true"/"false" 字符串即可正确解析
-        form_data = {
+        if os.path.isdir(abs_image_path):
+            return self._run_directory(abs_image_path, max_length=max_length, enhance=enhance)
+
+        if self.backend == "inprocess":
+            # 进程内后端不经过 HTTP，单张图片也走同一批处理队列
+            return self.recognize_many([abs_image_path], max_length=max_length, enhance=enhance)[0]
+
+        stream = self.stream_token_timeout is not None
+        cache = self._get_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = self._cache_key(abs_image_path, max_length, enhance, stream=stream)
+            cached = cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                return cached
+
+        if stream:
+            latex = self.recognize_stream(abs_image_path, max_length=max_length, enhance=enhance)
+            if cache is not None and cache_key and not latex.startswith(("调用", "识别失败")):
+                cache.put(cache_key, latex)
+            return latex
+
+        # /predict 的 max_length、enhance 为查询参数；
+        # FastAPI 对 bool 使用 "true"/"false" 字符串即可正确解析
+        query_params = {
             "max_length": str(max_length),
             "enhance": "true" if enhance else "false",
         }
+        if self.decoding:
+            query_params["decoding"] = self.decoding
+        if self.tile:
+            query_params["tile"] = "true"
+        if self.adapter:
+            query_params["adapter"] = self.adapter
 
         try:
-            # 根据文件扩展名确定正确的 MIME 类型
-            mime_type, _ = mimetypes.guess_type(abs_image_path)
-            if not mime_type or not mime_type.startswith('image/'):
-                # 如果无法识别，根据扩展名手动设置
-                ext = os.path.splitext(abs_image_path)[1].lower()
-                mime_map = {
-                    '.png': 'image/png',
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.gif': 'image/gif',
-                    '.bmp': 'image/bmp',
-                    '.webp': 'image/webp',
-                }
-                mime_type = mime_map.get(ext, 'image/png')  # 默认使用 PNG
-            
+            mime_type = _guess_image_mime_type(abs_image_path)
             with open(abs_image_path, "rb") as f:
-                files = {
-                    "file": (
-                        os.path.basename(abs_image_path),
-                        f,
-                        mime_type,
-                    )
-                }
-                resp = requests.post(self.api_url, data=form_data, files=files, timeout=60)
+                image_bytes = f.read()
+            files = {"file": (os.path.basename(abs_image_path), image_bytes, mime_type)}
+            resp = self._post_with_retry(self.api_url, params=query_params, files=files, timeout=60)
         except Exception as e:  # pragma: no cover - 主要用于运行时错误提示
             return f"调用 MixTex OCR API 失败：{e}"
 
@@ -113,6 +234,340 @@ class MixTexOCRTool(BaseTool):
         if not latex:
             return "API 响应中未找到 LaTeX 字段。"
 
+        if cache is not None and cache_key:
+            cache.put(cache_key, latex)
         return latex
 
+    def _get_session(self) -> requests.Session:
+        """返回复用连接的会话，连接池大小与并发数一致"""
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.max_concurrency, 1))
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def _post_with_retry(self, url: str, **kwargs) -> requests.Response:
+        """
+        POST 请求，遇到 5xx 或连接错误时按带抖动的指数退避重试。
+
+        服务端返回 Retry-After 时按其等待；否则在 [0, min(8, 0.5 * 2^n)] 秒内随机等待，
+        避免并发请求同时重试。files 中应传入字节而不是文件对象，以便重试时重新发送。
+        """
+        session = self._get_session()
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = session.post(url, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                if resp.status_code < 500 or attempt >= self.max_retries:
+                    return resp
+                retry_after = resp.headers.get("Retry-After")
+            try:
+                delay = float(retry_after) if retry_after else random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+            except ValueError:
+                delay = random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+            time.sleep(delay)
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    def last_run_stats(self) -> Dict[str, Any]:
+        """最近一次 recognize_many 的吞吐统计（图片数、请求数、耗时、每秒图片数）"""
+        return dict(self._last_run_stats)
+
+    def _get_cache(self) -> Optional[OCRResultCache]:
+        return get_ocr_cache() if self.use_cache else None
+
+    def _fetch_server_identity(self) -> Optional[Tuple[str, Dict[str, Any], Dict[str, str]]]:
+        """
+        从 /health 获取服务端模型标识和生成参数，失败时返回 None（此时不使用缓存）
+
+        结果缓存 identity_ttl_seconds 秒，过期后重新获取，避免服务端热切换适配器或 checkpoint 后
+        仍用旧的模型标识命中过期结果。
+        """
+        if self._server_identity is not None and time.monotonic() - self._server_identity_at < self.identity_ttl_seconds:
+            return self._server_identity
+        self._server_identity = None
+        if self.backend == "inprocess":
+            identity = get_inprocess_backend().identity()
+        else:
+            try:
+                resp = self._get_session().get(_service_url_for(self.api_url, "health"), timeout=5)
+                payload = resp.json() if resp.status_code == 200 else {}
+            except Exception:
+                return None
+            model_id = payload.get("model_id")
+            if not model_id:
+                return None
+            identity = (
+                f"mixtex:{model_id}",
+                payload.get("generation") or {},
+                payload.get("adapters") or {},
+            )
+        self._server_identity = identity
+        self._server_identity_at = time.monotonic()
+        return self._server_identity
+
+    def _cache_key(
+        self, abs_image_path: str, max_length: int, enhance: bool, stream: bool = False
+    ) -> Optional[str]:
+        identity = self._fetch_server_identity()
+        if identity is None:
+            return None
+        model_id, generation, adapters = identity
+        if self.adapter:
+            # 各适配器输出不同，缓存键使用所选适配器的标识；服务端未加载该适配器时不使用缓存
+            if self.adapter not in adapters:
+                return None
+            model_id = f"mixtex:{adapters[self.adapter]}"
+        # 显式指定的解码策略覆盖服务端默认值
+        params = dict(generation, max_length=max_length, enhance=enhance)
+        if stream:
+            # 流式识别固定贪心解码，且不分块
+            params["decoding"] = "greedy"
+        else:
+            if self.decoding:
+                params["decoding"] = self.decoding
+            if self.tile:
+                params["tile"] = True
+        with open(abs_image_path, "rb") as f:
+            image_bytes = f.read()
+        return OCRResultCache.make_key(image_bytes, model_id, **params)
+
+    def recognize_stream(
+        self,
+        image_path: str,
+        max_length: int = 512,
+        enhance: bool = True,
+        token_timeout: Optional[float] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """
+        通过 `/predict_stream` 流式识别单张图片。
+
+        Args:
+            image_path: 图片路径
+            max_length: 生成的最大长度
+            enhance: 是否启用图片增强预处理
+            token_timeout: 两个 token 之间的最长等待秒数，超时即断开连接（服务端随之停止生成）；
+                默认使用 stream_token_timeout，均未设置时为 60 秒
+            on_token: 每收到一段 LaTeX 片段时调用，可用于界面实时展示
+
+        Returns:
+            完整的 LaTeX；失败时为以“调用”/“识别失败”开头的说明文字
+        """
+        abs_image_path = os.path.abspath(image_path)
+        token_timeout = token_timeout or self.stream_token_timeout or 60
+        query_params = {
+            "max_length": str(max_length),
+            "enhance": "true" if enhance else "false",
+        }
+        if self.adapter:
+            query_params["adapter"] = self.adapter
+
+        started = False
+        try:
+            with open(abs_image_path, "rb") as f:
+                files = {"file": (os.path.basename(abs_image_path), f, _guess_image_mime_type(abs_image_path))}
+                # 读超时作用于每次 socket 读取，即两次收到数据之间的间隔
+                with self._get_session().post(
+                    _service_url_for(self.api_url, "predict_stream"),
+                    params=query_params,
+                    files=files,
+                    stream=True,
+                    timeout=(10, token_timeout),
+                ) as resp:
+                    if resp.status_code != 200:
+                        return f"调用失败（HTTP {resp.status_code}）：{resp.text}"
+                    started = True
+                    event = None
+                    for line in resp.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[len("event:"):].strip()
+                        elif line.startswith("data:"):
+                            data = json.loads(line[len("data:"):])
+                            if event == "token" and on_token is not None:
+                                on_token(data.get("text", ""))
+                            elif event == "done":
+                                return data.get("latex") or "识别失败：API 响应中未找到 LaTeX 字段。"
+                            elif event == "error":
+                                return f"识别失败：{data.get('message', '未知错误')}"
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            # iter_lines 中的读超时会被包装为 ConnectionError
+            if started:
+                return f"调用 MixTex OCR API 失败：超过 {token_timeout} 秒未收到新的 token，已中断"
+            return f"调用 MixTex OCR API 失败：{e}"
+        except Exception as e:  # pragma: no cover - 主要用于运行时错误提示
+            return f"调用 MixTex OCR API 失败：{e}"
+        return "识别失败：流式响应提前结束"
+
+    def _run_directory(self, dir_path: str, max_length: int = 512, enhance: bool = True) -> str:
+        """识别目录下全部图片，返回 {文件名: LaTeX} 的 JSON 字符串。"""
+        image_paths = sorted(
+            os.path.join(dir_path, name)
+            for name in os.listdir(dir_path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not image_paths:
+            return f"错误：目录中没有图片 - {dir_path}"
+
+        latex_list = self.recognize_many(image_paths, max_length=max_length, enhance=enhance)
+        results = {
+            os.path.basename(path): latex
+            for path, latex in zip(image_paths, latex_list)
+        }
+        return json.dumps(results, ensure_ascii=False, indent=2)
+
+    def recognize_many(
+        self,
+        paths: Sequence[str],
+        max_length: int | Sequence[int] = 512,
+        enhance: bool = True,
+    ) -> List[str]:
+        """
+        通过 `/predict_batch` 识别多张图片。
+
+        图片按 batch_chunk_size 分块，最多 max_concurrency 个请求并发在途，
+        复用同一会话的连接；5xx 响应按带抖动的指数退避重试。吞吐统计见 last_run_stats()。
+
+        Args:
+            paths: 图片路径列表
+            max_length: 统一的最大长度，或与 paths 等长的逐图最大长度
+            enhance: 是否启用图片增强预处理
+
+        Returns:
+            与 paths 顺序一致的结果列表；失败的条目为以“错误”/“识别失败”开头的说明文字
+        """
+        abs_paths = [os.path.abspath(p) for p in paths]
+        if not abs_paths:
+            return []
+
+        results: List[str] = [""] * len(abs_paths)
+        lengths = (
+            [max_length] * len(abs_paths)
+            if isinstance(max_length, int)
+            else list(max_length)
+        )
+        if len(lengths) != len(abs_paths):
+            raise ValueError("max_length 列表长度必须与 paths 一致")
+
+        # 不存在的图片直接在本地报错，命中缓存的图片直接返回，均不占用请求
+        cache = self._get_cache()
+        cache_keys: Dict[int, str] = {}
+        present = []
+        for i, path in enumerate(abs_paths):
+            if not os.path.exists(path):
+                results[i] = f"错误：图片不存在 - {path}"
+                continue
+            if cache is not None:
+                key = self._cache_key(path, lengths[i], enhance)
+                cached = cache.get(key) if key else None
+                if cached is not None:
+                    results[i] = cached
+                    continue
+                if key:
+                    cache_keys[i] = key
+            present.append(i)
+        if not present:
+            return results
+
+        started_at = time.perf_counter()
+        if self.backend == "inprocess":
+            # 全部图片直接进入进程内批处理队列，由 MicroBatcher 聚批
+            outcomes = get_inprocess_backend().recognize(
+                [abs_paths[i] for i in present],
+                [lengths[i] for i in present],
+                enhance=enhance,
+                decoding=self.decoding,
+                tile=self.tile,
+                adapter=self.adapter,
+            )
+            request_count, workers = 0, 0
+        else:
+            # 分块后并发提交：总耗时接近最慢的一块，而不是所有请求之和
+            chunk_size = max(self.batch_chunk_size, 1)
+            chunks = [present[i:i + chunk_size] for i in range(0, len(present), chunk_size)]
+            workers = max(1, min(self.max_concurrency, len(chunks)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mixtex-ocr") as executor:
+                chunk_results = list(executor.map(
+                    lambda chunk: self._recognize_chunk(abs_paths, chunk, lengths, enhance),
+                    chunks,
+                ))
+            outcomes = [outcome for chunk_result in chunk_results for outcome in chunk_result]
+            request_count = len(chunks)
+        elapsed = time.perf_counter() - started_at
+
+        for i, (latex, ok) in zip(present, outcomes):
+            results[i] = latex
+            if ok and cache is not None and i in cache_keys:
+                cache.put(cache_keys[i], latex)
+
+        self._last_run_stats = {
+            "backend": self.backend,
+            "images": len(present),
+            "requests": request_count,
+            "concurrency": workers,
+            "elapsed_seconds": round(elapsed, 3),
+            "images_per_second": round(len(present) / elapsed, 2) if elapsed > 0 else None,
+        }
+        if len(present) > 1:
+            print(
+                f"[MixTex OCR] 识别 {len(present)} 张图片（{self.backend}，{request_count} 个请求，并发 {workers}），"
+                f"耗时 {elapsed:.2f} 秒，吞吐 {self._last_run_stats['images_per_second']} 张/秒"
+            )
+        return results
+
+    def _recognize_chunk(
+        self,
+        abs_paths: List[str],
+        chunk: List[int],
+        lengths: List[int],
+        enhance: bool,
+    ) -> List[Tuple[str, bool]]:
+        """用一个 /predict_batch 请求识别一块图片，返回 [(结果或错误说明, 是否成功)]"""
+        form_data = {
+            "max_lengths": json.dumps([lengths[i] for i in chunk]),
+            "enhance": "true" if enhance else "false",
+        }
+        if self.decoding:
+            form_data["decoding"] = self.decoding
+        if self.tile:
+            form_data["tile"] = "true"
+        if self.adapter:
+            form_data["adapter"] = self.adapter
+
+        try:
+            files = []
+            for i in chunk:
+                with open(abs_paths[i], "rb") as f:
+                    image_bytes = f.read()
+                files.append(
+                    ("files", (os.path.basename(abs_paths[i]), image_bytes, _guess_image_mime_type(abs_paths[i])))
+                )
+            # 批量请求的耗时随图片数增长，超时相应放宽
+            timeout = max(60, 15 * len(chunk))
+            resp = self._post_with_retry(self.batch_api_url, data=form_data, files=files, timeout=timeout)
+        except Exception as e:  # pragma: no cover - 主要用于运行时错误提示
+            return [(f"调用 MixTex OCR API 失败：{e}", False)] * len(chunk)
+
+        if resp.status_code != 200:
+            return [(f"调用失败（HTTP {resp.status_code}）：{resp.text}", False)] * len(chunk)
+
+        try:
+            items = resp.json().get("results", [])
+        except ValueError:
+            items = []
+        if len(items) != len(chunk):
+            return [(f"API 返回结果数量异常：{resp.text[:200]}", False)] * len(chunk)
 
+        chunk_result = []
+        for item in items:
+            if item.get("success", False) and item.get("latex"):
+                chunk_result.append((item["latex"], True))
+            else:
+                chunk_result.append((f"识别失败：{item.get('message', '未知错误')}", False))
+        return chunk_result
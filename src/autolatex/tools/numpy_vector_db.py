@@ -0,0 +1,371 @@
+"""
+NumPy 向量数据库模块
+知识库只有几十个模板，用一个内存映射的 NumPy 矩阵 + JSON 元数据文件代替 ChromaDB，
+省去 ChromaDB / SQLite / HNSW 的导入与内存开销；接口与 VectorDatabase 一致
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .embeddings import ChromaDefaultEmbedder, Embedder
+
+# (ID 列表, 文档列表, 元数据列表, 归一化向量矩阵或 None)
+_State = Tuple[List[str], List[str], List[Dict], Optional[np.ndarray]]
+_EMPTY_STATE: _State = ([], [], [], None)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _matches_where(metadata: Dict, where: Dict) -> bool:
+    """
+    元数据过滤，支持 ChromaDB where 语法的常用子集：
+    {"key": value}、{"key": {"$eq" / "$ne" / "$in" / "$nin": ...}}、{"$and": [...]}、{"$or": [...]}
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches_where(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    matched = value == operand
+                elif operator == "$ne":
+                    matched = value != operand
+                elif operator == "$in":
+                    matched = value in operand
+                elif operator == "$nin":
+                    matched = value not in operand
+                else:
+                    raise ValueError(f"不支持的 where 运算符: {operator}")
+                if not matched:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorDatabase:
+    """
+    基于 NumPy 的平铺（flat）向量索引
+
+    向量归一化后存放在 <collection>.npy（按内存映射加载），ID、文档与元数据存放在
+    <collection>.json。检索为一次矩阵-向量乘积加 argpartition 取 top-k，
+    返回的 distance 为余弦距离（1 - 余弦相似度），与 ChromaDB 的 cosine 空间一致。
+
+    四者保存在一个元组 self._state 中，写入时整体替换；读取方法先取一次快照再使用，
+    不会看到写入过程中 ID、文档与矩阵行数不一致的中间状态。
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = "data/vector_db",
+        collection_name: str = "latex_templates",
+        embedder: Optional[Embedder] = None
+    ):
+        """
+        初始化向量数据库
+
+        Args:
+            persist_directory: 数据库持久化目录
+            collection_name: 集合名称；非默认嵌入后端的集合名会追加后端名称
+            embedder: 嵌入后端，默认使用 ChromaDB 默认的嵌入函数
+        """
+        self.persist_directory = persist_directory
+        self.embedder = embedder or ChromaDefaultEmbedder()
+        if self.embedder.name != ChromaDefaultEmbedder.name:
+            collection_name = f"{collection_name}_{re.sub(r'[^A-Za-z0-9_.-]', '_', self.embedder.name)}"[:63]
+        self.collection_name = collection_name
+        os.makedirs(persist_directory, exist_ok=True)
+        self._matrix_path = os.path.join(persist_directory, f"{collection_name}.npy")
+        self._sidecar_path = os.path.join(persist_directory, f"{collection_name}.json")
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """加载矩阵与元数据；两者不一致（如写入中断）时视为空集合"""
+        self._state = self._read_state()
+
+    def _read_state(self) -> _State:
+        try:
+            with open(self._sidecar_path, "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+            matrix = np.load(self._matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return _EMPTY_STATE
+        try:
+            ids, documents, metadatas = sidecar["ids"], sidecar["documents"], sidecar["metadatas"]
+            valid = (
+                sidecar["embedder"] == self.embedder.name
+                and all(isinstance(column, list) for column in (ids, documents, metadatas))
+                and all(isinstance(metadata, dict) for metadata in metadatas)
+                and matrix.shape[0] == len(ids) == len(documents) == len(metadatas)
+            )
+        except (KeyError, TypeError, IndexError):
+            # 文件能解析但缺少字段或类型不对（如被手工编辑）
+            valid = False
+        if not valid:
+            print(f"向量数据库 {self._sidecar_path} 已损坏或与当前嵌入后端、向量文件不一致，按空集合处理")
+            return _EMPTY_STATE
+        return ids, documents, metadatas, matrix
+
+    def _save(self, ids: List[str], documents: List[str], metadatas: List[Dict], matrix: Optional[np.ndarray]):
+        """
+        先整体发布内存中的新状态（同时释放旧的内存映射），再写向量与元数据文件，
+        均为临时文件 + 原子替换，最后重新按内存映射加载
+        """
+        self._state = (ids, documents, metadatas, matrix)
+        if matrix is None:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        tmp_matrix = f"{self._matrix_path}.tmp.npy"
+        np.save(tmp_matrix, np.ascontiguousarray(matrix, dtype=np.float32))
+        os.replace(tmp_matrix, self._matrix_path)
+        tmp_sidecar = f"{self._sidecar_path}.tmp"
+        with open(tmp_sidecar, "w", encoding="utf-8") as f:
+            json.dump({
+                "embedder": self.embedder.name,
+                "ids": ids,
+                "documents": documents,
+                "metadatas": metadatas,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_sidecar, self._sidecar_path)
+        self._load()
+
+    def _embed(self, documents: List[str], embeddings: Optional[List[List[float]]]) -> np.ndarray:
+        vectors = embeddings if embeddings is not None else self.embedder.embed_documents(documents)
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+    def _current(self) -> _State:
+        # 复制出内存中的副本，写入前即可释放内存映射（Windows 下被映射的文件无法替换）
+        ids, documents, metadatas, matrix = self._state
+        matrix = None if matrix is None or matrix.shape[0] == 0 else np.array(matrix)
+        return list(ids), list(documents), list(metadatas), matrix
+
+    def add_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """
+        添加文档到向量数据库
+
+        Args:
+            documents: 文档文本列表
+            metadatas: 元数据列表
+            ids: 文档ID列表（可选）
+            embeddings: 预先算好的向量（可选），未提供时由嵌入后端批量计算
+        """
+        if ids is None:
+            ids = [f"doc_{i}" for i in range(len(documents))]
+        vectors = self._embed(documents, embeddings)
+        with self._lock:
+            current_ids, current_documents, current_metadatas, matrix = self._current()
+            duplicated = set(ids) & set(current_ids)
+            if duplicated:
+                raise ValueError(f"文档ID已存在: {', '.join(sorted(duplicated))}")
+            self._save(
+                current_ids + list(ids),
+                current_documents + list(documents),
+                current_metadatas + list(metadatas),
+                vectors if matrix is None else np.vstack([matrix, vectors]),
+            )
+
+    def upsert_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict],
+        ids: List[str],
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """
+        批量写入文档：ID 已存在则覆盖，否则新增（只为传入的文档计算嵌入向量）
+
+        Args:
+            documents: 文档文本列表
+            metadatas: 元数据列表
+            ids: 文档ID列表
+            embeddings: 预先算好的向量（可选），未提供时由嵌入后端批量计算
+        """
+        vectors = self._embed(documents, embeddings)
+        with self._lock:
+            current_ids, current_documents, current_metadatas, matrix = self._current()
+            rows = [] if matrix is None else list(matrix)
+            positions = {doc_id: i for i, doc_id in enumerate(current_ids)}
+            for doc_id, document, metadata, vector in zip(ids, documents, metadatas, vectors):
+                if doc_id in positions:
+                    i = positions[doc_id]
+                    current_documents[i], current_metadatas[i], rows[i] = document, metadata, vector
+                else:
+                    positions[doc_id] = len(current_ids)
+                    current_ids.append(doc_id)
+                    current_documents.append(document)
+                    current_metadatas.append(metadata)
+                    rows.append(vector)
+            self._save(current_ids, current_documents, current_metadatas, np.vstack(rows) if rows else None)
+
+    def search(self, query: str, n_results: int = 3) -> List[Dict]:
+        """
+        搜索相似文档
+
+        Args:
+            query: 查询文本
+            n_results: 返回结果数量
+
+        Returns:
+            搜索结果列表，每个结果包含文档内容、元数据和相似度分数
+        """
+        return self.search_many([query], n_results=n_results)[0]
+
+    def search_many(self, queries: List[str], n_results: int = 3, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        批量搜索：所有查询一次批量嵌入，并以一次矩阵乘积完成检索
+
+        Args:
+            queries: 查询文本列表
+            n_results: 每个查询返回的结果数量
+            where: 元数据过滤条件（ChromaDB where 语法的常用子集，见 _matches_where）
+
+        Returns:
+            与 queries 顺序一致的结果列表
+        """
+        if not queries:
+            return []
+        return self.search_many_by_embedding(self.embedder.embed_queries(queries), n_results=n_results, where=where)
+
+    def search_by_embedding(self, embedding: List[float], n_results: int = 3) -> List[Dict]:
+        """按查询向量检索"""
+        return self.search_many_by_embedding([embedding], n_results=n_results)[0]
+
+    def search_many_by_embedding(
+        self,
+        embeddings: List[List[float]],
+        n_results: int = 3,
+        where: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """按多个查询向量检索：一次矩阵乘积 + 逐行 argpartition 取 top-k"""
+        _, documents, metadatas, matrix = self._state
+        if not embeddings:
+            return []
+        if matrix is None or matrix.shape[0] == 0 or n_results < 1:
+            return [[] for _ in embeddings]
+        candidates = None
+        if where:
+            candidates = np.array([i for i, metadata in enumerate(metadatas) if _matches_where(metadata, where)], dtype=np.int64)
+            if candidates.size == 0:
+                return [[] for _ in embeddings]
+            matrix = matrix[candidates]
+        queries = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        scores = queries @ matrix.T  # (查询数, 文档数)
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        all_results = []
+        for rows, row_scores in zip(top, top_scores):
+            results = []
+            for i, score in zip(rows, row_scores):
+                index = int(candidates[i]) if candidates is not None else int(i)
+                results.append({
+                    'document': documents[index],
+                    'metadata': metadatas[index],
+                    'distance': float(1.0 - score)
+                })
+            all_results.append(results)
+        return all_results
+
+    def warmup(self):
+        """提前加载嵌入模型，避免首个查询承担模型加载开销"""
+        self.embedder.warmup()
+
+    def get_collection_count(self) -> int:
+        """获取集合中的文档数量"""
+        return len(self._state[0])
+
+    def get_all_ids(self) -> List[str]:
+        """获取集合中所有文档的ID列表"""
+        return list(self._state[0])
+
+    def get_all_metadatas(self) -> Dict[str, Dict]:
+        """获取集合中所有文档的 {ID: 元数据}"""
+        ids, _, metadatas, _ = self._state
+        return dict(zip(ids, metadatas))
+
+    def get_by_metadata(
+        self,
+        where: Dict,
+        include: Tuple[str, ...] = ("metadatas",),
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        按元数据条件读取文档，只返回需要的字段
+
+        Args:
+            where: 元数据过滤条件（语法见 _matches_where）
+            include: 需要返回的字段，"documents" 和/或 "metadatas"
+            limit: 最多返回的条目数
+
+        Returns:
+            [{"id": ..., "document": ..., "metadata": ...}]，只包含 include 中的字段
+        """
+        ids, documents, metadatas, _ = self._state
+        entries = []
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            if limit is not None and len(entries) >= limit:
+                break
+            if not _matches_where(metadata, where):
+                continue
+            entry = {"id": doc_id}
+            if "documents" in include:
+                entry["document"] = document
+            if "metadatas" in include:
+                entry["metadata"] = metadata
+            entries.append(entry)
+        return entries
+
+    def get_all_entries(self) -> List[Tuple[str, str, Dict]]:
+        """获取集合中所有文档的 [(ID, 文档, 元数据)]"""
+        ids, documents, metadatas, _ = self._state
+        return list(zip(ids, documents, metadatas))
+
+    def id_exists(self, doc_id: str) -> bool:
+        """检查指定的文档ID是否已存在"""
+        return doc_id in self._state[0]
+
+    def delete_documents(self, ids: List[str]):
+        """
+        删除指定的文档
+
+        Args:
+            ids: 要删除的文档ID列表
+        """
+        removed = set(ids)
+        with self._lock:
+            current_ids, current_documents, current_metadatas, matrix = self._current()
+            keep = [i for i, doc_id in enumerate(current_ids) if doc_id not in removed]
+            if len(keep) == len(current_ids):
+                return
+            self._save(
+                [current_ids[i] for i in keep],
+                [current_documents[i] for i in keep],
+                [current_metadatas[i] for i in keep],
+                matrix[keep] if keep else None,
+            )
+
+    def clear_collection(self):
+        """清空集合（用于重新初始化）"""
+        with self._lock:
+            self._save([], [], [], None)
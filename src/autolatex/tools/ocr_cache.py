@@ -0,0 +1,165 @@
+"""
+OCR 结果缓存模块
+
+按图片内容寻址的持久化缓存，供 MixTex 与 DeepSeek 两条 OCR 路径共用。
+缓存键由图片字节的哈希、模型/适配器标识以及生成参数共同决定，
+因此同名不同图不会冲突，同图不同名也不会重复推理。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = "data/OCR_cache"
+DEFAULT_MAX_ENTRIES = 5000
+CACHE_SUFFIX = ".tex"
+
+
+class OCRResultCache:
+    """
+    磁盘上的有界 LRU 缓存。
+
+    每条结果保存为 `<cache_dir>/<键前两位>/<键>.tex`。命中时刷新文件 mtime，
+    写入后若条目数超过上限，则按 mtime 从旧到新淘汰，实现磁盘上的 LRU。
+    写入采用临时文件 + 原子替换，多进程共享同一目录也不会读到半截内容。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_entries: 最大条目数，超出后淘汰最久未使用的条目
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries 必须 >= 1")
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entry_count: Optional[int] = None  # 首次写入时扫描目录得到
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image_bytes: bytes, model_id: str, **params: Any) -> str:
+        """
+        计算缓存键。
+
+        Args:
+            image_bytes: 图片文件的原始字节
+            model_id: 模型及适配器的标识
+            **params: 影响输出的生成参数（如 max_length、enhance、num_beams）
+
+        Returns:
+            十六进制 SHA-256 字符串
+        """
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(image_bytes).digest())
+        digest.update(model_id.encode("utf-8"))
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中返回 None"""
+        path = self._path_for(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+        except (FileNotFoundError, OSError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # 刷新 mtime，作为 LRU 的“最近使用”时间
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: str):
+        """写入缓存；空结果不缓存"""
+        if not value:
+            return
+        path = self._path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._entry_count is None:
+                self._entry_count = len(self._scan())
+            elif not existed:
+                self._entry_count += 1
+            if self._entry_count > self.max_entries:
+                self._evict()
+
+    def _scan(self) -> Dict[str, float]:
+        """返回 {文件路径: mtime}"""
+        entries: Dict[str, float] = {}
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(CACHE_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    entries[path] = os.path.getmtime(path)
+                except OSError:
+                    continue
+        return entries
+
+    def _evict(self):
+        """淘汰最久未使用的条目，留出 10% 余量以免每次写入都触发扫描"""
+        entries = self._scan()
+        target = int(self.max_entries * 0.9)
+        excess = len(entries) - target
+        if excess > 0:
+            for path, _ in sorted(entries.items(), key=lambda item: item[1])[:excess]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+        self._entry_count = min(len(entries), target)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "max_entries": self.max_entries,
+            "cache_dir": self.cache_dir,
+        }
+
+
+_default_cache: Optional[OCRResultCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRResultCache]:
+    """
+    获取进程内共享的默认缓存实例。
+
+    目录与容量分别由环境变量 `OCR_CACHE_DIR`、`OCR_CACHE_MAX_ENTRIES` 配置；
+    设置 `OCR_CACHE_DISABLED=1` 时返回 None。
+    """
+    global _default_cache
+    if os.getenv("OCR_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OCRResultCache(
+                cache_dir=os.getenv("OCR_CACHE_DIR", DEFAULT_CACHE_DIR),
+                max_entries=int(os.getenv("OCR_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _default_cache
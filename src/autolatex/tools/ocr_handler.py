@@ -1,6 +1,15 @@
 # filename: src/autolatex/tools/ocr_handler.py
+import atexit
+import json
 import os
+import queue
 import subprocess
+import threading
+
+try:
+    from .ocr_cache import OCRResultCache, get_ocr_cache
+except ImportError:  # pragma: no cover
+    from ocr_cache import OCRResultCache, get_ocr_cache  # type: ignore
 
 # ==============================================================================
 # --- 1. 重要配置区域 ---
@@ -24,6 +33,22 @@ DEEPSEEK_OCR_CONDA_ENV_PYTHON_PATH = None  # None 表示使用当前 Python 解
 # --- (以下路径通常不需要修改) ---
 OCR_SCRIPT_PATH = "vendor/DeepSeek-OCR/run_ocr.py"
 OUTPUT_PATH = 'data/OCR_output'
+# 模型标识，参与 OCR 结果缓存键计算；更换模型权重时请修改
+DEEPSEEK_OCR_MODEL_ID = os.getenv("DEEPSEEK_OCR_MODEL_ID", "deepseek-ocr")
+# 生成参数：传给常驻工作进程，并参与 OCR 结果缓存键计算
+DEEPSEEK_OCR_PROMPT = os.getenv("DEEPSEEK_OCR_PROMPT", "<image>\nFree OCR. ")
+DEEPSEEK_OCR_BASE_SIZE = int(os.getenv("DEEPSEEK_OCR_BASE_SIZE", 1024))
+DEEPSEEK_OCR_IMAGE_SIZE = int(os.getenv("DEEPSEEK_OCR_IMAGE_SIZE", 640))
+DEEPSEEK_OCR_CROP_MODE = os.getenv("DEEPSEEK_OCR_CROP_MODE", "1").lower() not in ("0", "false", "no")
+
+# --- 常驻工作进程池配置 ---
+# 工作进程只加载一次模型，避免每张图片都重新启动解释器、重新加载模型
+WORKER_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "deepseek_ocr_worker.py")
+USE_WORKER_POOL = os.getenv("DEEPSEEK_OCR_USE_WORKER", "1").lower() not in ("0", "false", "no")
+WORKER_POOL_SIZE = int(os.getenv("DEEPSEEK_OCR_WORKERS", 1))
+WORKER_MAX_JOBS = int(os.getenv("DEEPSEEK_OCR_MAX_JOBS", 200))  # 处理多少张图片后回收重启，防止内存泄漏累积
+WORKER_STARTUP_TIMEOUT = float(os.getenv("DEEPSEEK_OCR_STARTUP_TIMEOUT", 600))  # 模型加载超时（秒）
+WORKER_JOB_TIMEOUT = float(os.getenv("DEEPSEEK_OCR_JOB_TIMEOUT", 300))  # 单张图片超时（秒）
 
 # ==============================================================================
 # --- 2. 检查配置有效性并确定最终使用的 Python 路径 ---
@@ -56,43 +81,232 @@ if not os.path.exists(DEEPSEEK_OCR_CONDA_ENV_PYTHON_PATH):
 
 
 # ==============================================================================
-# --- 3. 可供外部导入的核心工具函数 ---
+# --- 3. DeepSeek-OCR 常驻工作进程池 ---
 # ==============================================================================
 
-def recognize_image_to_latex(image_path: str) -> str:
+class WorkerCrashed(RuntimeError):
+    """工作进程退出、超时或管道断开"""
+
+
+class _OCRWorker:
+    """单个常驻工作进程，通过 stdin/stdout 的 JSON Lines 协议通信（见 deepseek_ocr_worker.py）"""
+
+    def __init__(self, command, log_path, startup_timeout):
+        self.command = command
+        self.log_path = log_path
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.jobs_done = 0
+        self._lines = None
+        self._next_id = 0
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as log_file:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=log_file,  # 模型日志写入文件，stdout 只用于协议
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+                cwd=os.path.abspath("."),
+            )
+        self.jobs_done = 0
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_stdout, args=(self.process, self._lines), daemon=True).start()
+
+        # 握手失败（超时、提前退出或首条消息不是 ready）时结束子进程，避免遗留仍占用显存的模型进程
+        try:
+            message = self._read_message(self.startup_timeout)
+            if not message.get("ready"):
+                raise WorkerCrashed(f"工作进程未能就绪: {message}")
+        except BaseException:
+            self.close(timeout=0)
+            raise
+
+    @staticmethod
+    def _read_stdout(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)  # EOF：进程已退出
+
+    def _read_message(self, timeout):
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                raise WorkerCrashed(f"工作进程在 {timeout:.0f} 秒内无响应")
+            if line is None:
+                try:
+                    returncode = self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    returncode = None
+                raise WorkerCrashed(f"工作进程已退出 (返回码 {returncode})，详见 {self.log_path}")
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return json.loads(line)
+            except ValueError:
+                continue  # 忽略非协议输出
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def recognize(self, image_path, output_dir, timeout):
+        """返回 (是否成功, LaTeX 或错误信息)"""
+        self._next_id += 1
+        job = {"id": self._next_id, "image": image_path, "output_dir": output_dir}
+        try:
+            self.process.stdin.write(json.dumps(job, ensure_ascii=False) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise WorkerCrashed(f"无法向工作进程发送任务: {e}")
+        while True:
+            message = self._read_message(timeout)
+            if message.get("id") == job["id"]:
+                break
+        self.jobs_done += 1
+        if message.get("ok"):
+            return True, message.get("latex", "")
+        return False, message.get("error", "未知错误")
+
+    def close(self, timeout=10):
+        """关闭 stdin 让工作进程自行退出，timeout 秒内未退出则强制结束；两种情况都回收子进程"""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except (OSError, ValueError):
+            pass
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+class DeepSeekOCRWorkerPool:
     """
-    通过调用一个在独立Conda环境中的外部脚本来执行OCR，并返回LaTeX代码字符串。
-    具有缓存功能，如果.mmd输出文件已存在，则直接读取。
+    DeepSeek-OCR 工作进程池
+
+    - 每个工作进程只加载一次模型
+    - 工作进程崩溃或超时时自动重启并重试一次
+    - 每个工作进程处理 max_jobs 张图片后回收重启
     """
-    # --- 步骤 1: 路径准备和缓存检查 ---
-    # (这部分保持不变)
-    image_base_name = os.path.splitext(os.path.basename(image_path))[0]
-    output_mmd_path = os.path.join(OUTPUT_PATH, f"{image_base_name}.mmd")
 
-    if os.path.exists(output_mmd_path):
-        print(f"  - [OCR Cache] 命中缓存，直接读取: {output_mmd_path}")
-        with open(output_mmd_path, 'r', encoding='utf-8') as f:
-            return f.read().strip()
+    def __init__(self, command, size=1, max_jobs=200, startup_timeout=600.0, job_timeout=300.0, log_dir=OUTPUT_PATH):
+        self.command = command
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.job_timeout = job_timeout
+        self._idle = queue.Queue()
+        self._workers = [
+            _OCRWorker(command, os.path.abspath(os.path.join(log_dir, f"deepseek_ocr_worker_{i}.log")), startup_timeout)
+            for i in range(self.size)
+        ]
 
-    # ====================== 开始修改 ======================
-    # --- 步骤 2: 将所有相对路径转换为绝对路径，然后构造命令 ---
+    def start(self):
+        """
+        启动全部工作进程；一个都启动不了时抛出 WorkerCrashed
 
-    # 获取当前脚本所在目录的项目根目录 (AutoLatex 文件夹)
-    # 通常假设我们是从项目根目录运行的，os.getcwd() 就可以。
-    # 为了更健壮，我们可以用 os.path.abspath()
+        启动失败的工作进程也放回空闲队列（排在已就绪的之后），下次被取用时由 recognize 重新启动，
+        进程池不会因一次启动失败而永久变小。
+        """
+        errors, failed = [], []
+        for worker in self._workers:
+            try:
+                worker.start()
+                self._idle.put(worker)
+            except (WorkerCrashed, OSError) as e:
+                errors.append(str(e))
+                failed.append(worker)
+        if len(failed) == len(self._workers):
+            raise WorkerCrashed("; ".join(errors) or "没有可用的工作进程")
+        for worker in failed:
+            self._idle.put(worker)
+        if errors:
+            print(f"  - [OCR Worker] 部分工作进程启动失败: {'; '.join(errors)}")
+
+    def recognize(self, image_path, output_dir):
+        """识别单张图片，失败返回空字符串"""
+        worker = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    if not worker.is_alive() or worker.jobs_done >= self.max_jobs:
+                        reason = "回收" if worker.is_alive() else "启动"
+                        print(f"  - [OCR Worker] {reason}工作进程（已处理 {worker.jobs_done} 张）")
+                        worker.close()
+                        worker.start()
+                    ok, payload = worker.recognize(image_path, output_dir, self.job_timeout)
+                except (WorkerCrashed, OSError) as e:
+                    print(f"  - [OCR Worker] 工作进程异常（第 {attempt + 1} 次尝试）: {e}")
+                    worker.close()
+                    continue
+                if not ok:
+                    print(f"  - [OCR Worker] 识别失败: {payload}")
+                    return ""
+                return payload.strip()
+            return ""
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+
+_worker_pool = None
+_worker_pool_failed = False
+_worker_pool_lock = threading.Lock()
 
-    # 将所有路径转换为绝对路径
-    abs_ocr_script_path = os.path.abspath(OCR_SCRIPT_PATH)
-    abs_image_path = os.path.abspath(image_path)
-    abs_output_path = os.path.abspath(OUTPUT_PATH)
 
-    # 检查转换后的路径是否存在，便于调试
+def get_worker_pool():
+    """获取（必要时启动）进程内共享的工作进程池；无法启动时返回 None"""
+    global _worker_pool, _worker_pool_failed
+    if not USE_WORKER_POOL:
+        return None
+    with _worker_pool_lock:
+        if _worker_pool is None and not _worker_pool_failed:
+            pool = DeepSeekOCRWorkerPool(
+                [
+                    DEEPSEEK_OCR_CONDA_ENV_PYTHON_PATH, WORKER_SCRIPT_PATH,
+                    "--prompt", DEEPSEEK_OCR_PROMPT,
+                    "--base-size", str(DEEPSEEK_OCR_BASE_SIZE),
+                    "--image-size", str(DEEPSEEK_OCR_IMAGE_SIZE),
+                    "--crop-mode", "1" if DEEPSEEK_OCR_CROP_MODE else "0",
+                ],
+                size=WORKER_POOL_SIZE,
+                max_jobs=WORKER_MAX_JOBS,
+                startup_timeout=WORKER_STARTUP_TIMEOUT,
+                job_timeout=WORKER_JOB_TIMEOUT,
+            )
+            print(f"  - [OCR Worker] 正在启动 {pool.size} 个常驻工作进程（首次需要加载模型）...")
+            try:
+                pool.start()
+                _worker_pool = pool
+                atexit.register(pool.close)
+                print("  - [OCR Worker] 工作进程池已就绪。")
+            except (WorkerCrashed, OSError) as e:
+                _worker_pool_failed = True
+                print(f"  - [OCR Worker] 工作进程池启动失败，回退到单次子进程模式: {e}")
+        return _worker_pool
+
+
+# ==============================================================================
+# --- 4. 可供外部导入的核心工具函数 ---
+# ==============================================================================
+
+def _recognize_one_shot(abs_image_path: str, abs_output_path: str) -> str:
+    """单次子进程模式：启动 run_ocr.py 识别一张图片（每次都会重新加载模型）"""
+    abs_ocr_script_path = os.path.abspath(OCR_SCRIPT_PATH)
     if not os.path.exists(abs_ocr_script_path):
         print(f"  - 错误：无法找到OCR执行脚本: {abs_ocr_script_path}")
         return ""
-    if not os.path.exists(abs_image_path):
-        print(f"  - 错误：无法找到输入图片: {abs_image_path}")
-        return ""
 
     command = [
         DEEPSEEK_OCR_CONDA_ENV_PYTHON_PATH,
@@ -100,12 +314,11 @@ def recognize_image_to_latex(image_path: str) -> str:
         "--input_image", abs_image_path,
         "--output_dir", abs_output_path
     ]
-    # ====================== 修改结束 ======================
 
     print(f"  - [OCR Handler] 调用外部进程执行OCR...")
     try:
         os.makedirs(abs_output_path, exist_ok=True)  # 使用绝对路径确保目录被正确创建
-        result = subprocess.run(
+        subprocess.run(
             command,
             check=True,
             capture_output=True,
@@ -117,14 +330,12 @@ def recognize_image_to_latex(image_path: str) -> str:
         print("  - [OCR Handler] 外部进程成功执行。")
 
     except FileNotFoundError:
-        # (这部分保持不变)
         print("=" * 60)
         print("!!!!!! 严重配置错误 in ocr_handler.py !!!!!!")
         print(f"无法找到 Python 解释器: {DEEPSEEK_OCR_CONDA_ENV_PYTHON_PATH}")
         print("=" * 60)
         return ""
     except subprocess.CalledProcessError as e:
-        # (这部分保持不变)
         print(f"!!!!!! [OCR Handler] 外部OCR脚本执行失败 !!!!!!")
         print(f"  - 命令: {' '.join(e.cmd)}")
         print(f"  - 返回码: {e.returncode}")
@@ -132,12 +343,60 @@ def recognize_image_to_latex(image_path: str) -> str:
         print("  - STDERR (标准错误):\n", e.stderr)
         return ""
 
-    # --- 步骤 3: 读取外部脚本生成的结果文件 ---
-    # (这部分保持不变, 但用绝对路径检查更可靠)
-    abs_output_mmd_path = os.path.abspath(output_mmd_path)
+    # 读取外部脚本生成的结果文件
+    image_base_name = os.path.splitext(os.path.basename(abs_image_path))[0]
+    abs_output_mmd_path = os.path.join(abs_output_path, f"{image_base_name}.mmd")
     if os.path.exists(abs_output_mmd_path):
         with open(abs_output_mmd_path, 'r', encoding='utf-8') as f:
             return f.read().strip()
+    print(f"  - 错误：OCR脚本执行成功，但未找到预期的输出文件 {abs_output_mmd_path}")
+    return ""
+
+
+def _generation_params() -> dict:
+    """影响 DeepSeek-OCR 输出的生成参数，参与缓存键计算"""
+    return {
+        "prompt": DEEPSEEK_OCR_PROMPT,
+        "base_size": DEEPSEEK_OCR_BASE_SIZE,
+        "image_size": DEEPSEEK_OCR_IMAGE_SIZE,
+        "crop_mode": DEEPSEEK_OCR_CROP_MODE,
+    }
+
+
+def recognize_image_to_latex(image_path: str) -> str:
+    """
+    执行 DeepSeek-OCR 识别，并返回LaTeX代码字符串。
+    优先使用常驻工作进程池（模型只加载一次）；工作进程池无法启动时，
+    回退为每张图片调用一次外部脚本。
+    具有缓存功能：按图片内容、模型标识与生成参数寻址（见 ocr_cache.py），同名不同图不会误命中。
+    """
+    # --- 步骤 1: 路径准备和缓存检查 ---
+    abs_image_path = os.path.abspath(image_path)
+    abs_output_path = os.path.abspath(OUTPUT_PATH)
+    if not os.path.exists(abs_image_path):
+        print(f"  - 错误：无法找到输入图片: {abs_image_path}")
+        return ""
+
+    cache = get_ocr_cache()
+    cache_key = None
+    if cache is not None:
+        with open(abs_image_path, 'rb') as f:
+            cache_key = OCRResultCache.make_key(
+                f.read(), f"deepseek:{DEEPSEEK_OCR_MODEL_ID}", **_generation_params()
+            )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"  - [OCR Cache] 命中缓存: {image_path}")
+            return cached.strip()
+
+    # --- 步骤 2: 识别 ---
+    pool = get_worker_pool()
+    if pool is not None:
+        latex = pool.recognize(abs_image_path, abs_output_path)
     else:
-        print(f"  - 错误：OCR脚本执行成功，但未找到预期的输出文件 {abs_output_mmd_path}")
-        return ""
\ No newline at end of file
+        latex = _recognize_one_shot(abs_image_path, abs_output_path)
+
+    # --- 步骤 3: 写入缓存 ---
+    if latex and cache is not None and cache_key:
+        cache.put(cache_key, latex)
+    return latex
@@ -7,12 +7,20 @@
 from .manager import (
     get_journal_template_files,
     get_journal_template_dir,
+    get_main_tex,
+    get_template_file_index,
     list_available_journals,
 )
+from .index import TemplateFileInfo, TemplateIndex, clear_template_indexes
 
 __all__ = [
     "get_journal_template_files",
     "get_journal_template_dir",
+    "get_main_tex",
+    "get_template_file_index",
     "list_available_journals",
+    "TemplateFileInfo",
+    "TemplateIndex",
+    "clear_template_indexes",
 ]
 
@@ -0,0 +1,206 @@
+"""
+模板文件索引
+
+每个模板目录在进程内只扫描一次，记录文件列表、大小、文本/二进制分类与内容哈希；
+文件内容按需读取并缓存。模板目录（含子目录）的 mtime 变化时索引失效并重建，
+读取文件时再核对该文件的大小与 mtime，捕获未改变目录 mtime 的原地修改。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 按扩展名直接归为二进制，不尝试解码
+BINARY_EXTENSIONS = {
+    ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".eps", ".ps",
+    ".bin", ".zip", ".gz", ".tar", ".dvi", ".xdv", ".otf", ".ttf", ".pfb", ".tfm",
+}
+
+# 主文件候选，按优先级排列
+MAIN_TEX_CANDIDATES = ("_main.tex", "main.tex", "cvpr_header.tex")
+
+
+@dataclass
+class TemplateFileInfo:
+    """模板中单个文件的索引信息"""
+
+    path: str  # 相对模板目录的路径
+    size: int
+    mtime_ns: int
+    is_text: bool
+    sha256: str
+    _text: Optional[str] = field(default=None, repr=False)
+
+
+# 内容探测读取的字节数；哈希按块流式计算
+SNIFF_BYTES = 8192
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _looks_like_text(head: bytes, truncated: bool) -> bool:
+    """
+    根据文件开头判断是否为 UTF-8 文本：不含 NUL 且能解码
+
+    Args:
+        head: 文件开头的字节
+        truncated: head 之后还有内容，此时容忍末尾被截断的多字节字符
+    """
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 截断点恰好落在多字节字符中间
+        return truncated and e.start >= len(head) - 3 and e.reason == "unexpected end of data"
+    return True
+
+
+def _scan_file(file_path: Path, relative_path: str) -> TemplateFileInfo:
+    """
+    登记单个文件：流式计算内容哈希，不整体读入内存
+
+    BINARY_EXTENSIONS 中的扩展名直接归为二进制，其余文件只探测开头 SNIFF_BYTES 字节；
+    探测窗口之后的非法 UTF-8 在 read_text 时发现并改记为二进制。
+    """
+    stat = file_path.stat()
+    suffix = file_path.suffix.lower()
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        digest.update(head)
+        truncated = len(head) < stat.st_size
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return TemplateFileInfo(
+        path=relative_path,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        is_text=suffix not in BINARY_EXTENSIONS and _looks_like_text(head, truncated),
+        sha256=digest.hexdigest(),
+    )
+
+
+class TemplateIndex:
+    """单个模板目录的文件索引"""
+
+    def __init__(self, template_dir: Path):
+        self.template_dir = template_dir
+        self.files: Dict[str, TemplateFileInfo] = {}
+        self._dir_mtimes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._build()
+
+    def _build(self):
+        files: Dict[str, TemplateFileInfo] = {}
+        dir_mtimes: Dict[str, int] = {}
+        for root, dirnames, filenames in os.walk(self.template_dir):
+            dirnames.sort()
+            dir_mtimes[root] = os.stat(root).st_mtime_ns
+            for filename in sorted(filenames):
+                file_path = Path(root) / filename
+                relative_path = str(file_path.relative_to(self.template_dir))
+                try:
+                    files[relative_path] = _scan_file(file_path, relative_path)
+                except OSError:
+                    # 跳过无法读取的文件
+                    continue
+        self.files = files
+        self._dir_mtimes = dir_mtimes
+
+    def is_stale(self) -> bool:
+        """模板目录或其任一子目录的 mtime 变化（增删、重命名文件）时返回 True"""
+        for directory, mtime_ns in self._dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def text_files(self) -> List[str]:
+        """全部文本文件的相对路径"""
+        return [path for path, info in self.files.items() if info.is_text]
+
+    def read_text(self, relative_path: str) -> str:
+        """
+        读取文本文件内容，首次读取后缓存
+
+        Args:
+            relative_path: 相对模板目录的路径
+
+        Raises:
+            KeyError: 文件不在索引中
+            ValueError: 文件为二进制文件（含探测窗口之后才出现非法 UTF-8 的文件）
+        """
+        info = self.files[relative_path]
+        if not info.is_text:
+            raise ValueError(f"不是文本文件: {relative_path}")
+        file_path = self.template_dir / relative_path
+        with self._lock:
+            stat = file_path.stat()
+            if stat.st_size != info.size or stat.st_mtime_ns != info.mtime_ns:
+                # 文件被原地修改：重新登记该文件
+                info = _scan_file(file_path, relative_path)
+                self.files[relative_path] = info
+                if not info.is_text:
+                    raise ValueError(f"不是文本文件: {relative_path}")
+            if info._text is None:
+                try:
+                    info._text = file_path.read_text(encoding="utf-8")
+                except UnicodeDecodeError:
+                    info.is_text = False
+                    raise ValueError(f"不是文本文件: {relative_path}")
+            return info._text
+
+    def main_tex_path(self) -> Optional[str]:
+        """
+        主文件的相对路径
+
+        依次尝试 MAIN_TEX_CANDIDATES、含 \\documentclass 的 .tex 文件（顶层优先），最后退回第一个文本文件。
+        读取时发现不是 UTF-8 的文件会被改记为二进制并跳过。
+        """
+        for candidate in MAIN_TEX_CANDIDATES:
+            info = self.files.get(candidate)
+            if info is not None and info.is_text:
+                return candidate
+        text_files = self.text_files()
+        tex_files = sorted((path for path in text_files if path.endswith(".tex")), key=lambda path: path.count(os.sep))
+        for path in tex_files:
+            try:
+                if "\\documentclass" in self.read_text(path):
+                    return path
+            except ValueError:
+                continue
+        text_files = self.text_files()
+        return text_files[0] if text_files else None
+
+
+_indexes: Dict[str, TemplateIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_template_index(template_dir: Path) -> TemplateIndex:
+    """
+    获取模板目录的进程内索引，目录 mtime 变化时重建
+
+    Args:
+        template_dir: 模板目录（需已确认存在）
+    """
+    key = str(template_dir.resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.is_stale():
+            index = TemplateIndex(Path(key))
+            _indexes[key] = index
+        return index
+
+
+def clear_template_indexes():
+    """清空全部模板索引（测试或批量替换模板后使用）"""
+    with _indexes_lock:
+        _indexes.clear()
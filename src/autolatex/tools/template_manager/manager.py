@@ -4,25 +4,14 @@
 提供读取和管理期刊模板文件的功能。
 """
 
-import os
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from .index import TemplateIndex, get_template_index
 
-def get_journal_template_files(journal_name: str, base_path: Optional[str] = None) -> Dict[str, str]:
-    """
-    读取指定期刊模板文件夹中的所有文件。
-    
-    Args:
-        journal_name: 期刊名称（例如 'cvpr', 'ieee'）
-        base_path: 模板基础路径，默认为 None（使用默认路径）
-    
-    Returns:
-        字典，键为文件相对路径，值为文件内容
-    
-    Raises:
-        FileNotFoundError: 如果模板目录不存在
-    """
+
+def _template_dir(journal_name: str, base_path: Optional[str] = None) -> Path:
+    """期刊模板目录，不存在时抛出 FileNotFoundError"""
     if base_path is None:
         # 默认路径：项目根目录/模板/{journal_name}
         # 通过 __file__ 动态计算项目根目录
@@ -35,23 +24,77 @@ def get_journal_template_files(journal_name: str, base_path: Optional[str] = Non
     
     if not template_dir.exists() or not template_dir.is_dir():
         raise FileNotFoundError(f"模板目录不存在: {template_dir}")
+    return template_dir
+
+
+def get_template_file_index(journal_name: str, base_path: Optional[str] = None) -> TemplateIndex:
+    """
+    获取期刊模板的文件索引（文件列表、大小、文本/二进制分类、内容哈希）。
+    
+    索引在进程内只构建一次，模板目录 mtime 变化时自动重建；文件内容通过 read_text 按需读取。
+    
+    Args:
+        journal_name: 期刊名称（例如 'cvpr', 'ieee'）
+        base_path: 模板基础路径，默认为 None（使用默认路径）
+    
+    Raises:
+        FileNotFoundError: 如果模板目录不存在
+    """
+    return get_template_index(_template_dir(journal_name, base_path))
+
+
+def get_main_tex(journal_name: str, base_path: Optional[str] = None) -> Optional[str]:
+    """
+    读取期刊模板的主文件内容，只读取主文件本身。
+    
+    Args:
+        journal_name: 期刊名称（例如 'cvpr', 'ieee'）
+        base_path: 模板基础路径，默认为 None（使用默认路径）
+    
+    Returns:
+        主文件内容；模板中没有文本文件时返回 None
+    
+    Raises:
+        FileNotFoundError: 如果模板目录不存在
+    """
+    index = get_template_file_index(journal_name, base_path)
+    # 主文件在探测窗口之后才出现非法 UTF-8 时，读取会将其改记为二进制，重新选择主文件
+    while True:
+        main_path = index.main_tex_path()
+        if main_path is None:
+            return None
+        try:
+            return index.read_text(main_path)
+        except ValueError:
+            continue
+
+
+def get_journal_template_files(journal_name: str, base_path: Optional[str] = None) -> Dict[str, str]:
+    """
+    读取指定期刊模板文件夹中的所有文本文件。
+    
+    只需要主文件时使用 get_main_tex，避免读取整个模板。
     
-    template_files: Dict[str, str] = {}
-    
-    # 递归遍历模板目录中的所有文件
-    for file_path in template_dir.rglob("*"):
-        if file_path.is_file():
-            # 计算相对路径（相对于模板目录）
-            relative_path = file_path.relative_to(template_dir)
-            try:
-                # 读取文件内容
-                with open(file_path, "r", encoding="utf-8") as f:
-                    template_files[str(relative_path)] = f.read()
-            except (UnicodeDecodeError, PermissionError):
-                # 跳过二进制文件或无法读取的文件
-                continue
-    
-    return template_files
+    Args:
+        journal_name: 期刊名称（例如 'cvpr', 'ieee'）
+        base_path: 模板基础路径，默认为 None（使用默认路径）
+    
+    Returns:
+        字典，键为文件相对路径，值为文件内容（二进制文件不包含在内）
+    
+    Raises:
+        FileNotFoundError: 如果模板目录不存在
+    """
+    index = get_template_file_index(journal_name, base_path)
+    # 二进制文件已在建索引时按扩展名与文件开头分类，这里只读取文本文件（内容有缓存）
+    files = {}
+    for path in index.text_files():
+        try:
+            files[path] = index.read_text(path)
+        except ValueError:
+            # 探测窗口之后才出现非法 UTF-8，按二进制文件跳过
+            continue
+    return files
 
 
 def get_journal_template_dir(journal_name: str, base_path: Optional[str] = None) -> str:
@@ -8,7 +8,7 @@ from pathlib import Path
 
 from crewai.tools import BaseTool  # type: ignore
 
-from .template_manager import get_journal_template_files
+from .template_manager import get_main_tex
 
 
 class TemplateRetrievalTool(BaseTool):
@@ -28,16 +28,11 @@ class TemplateRetrievalTool(BaseTool):
         Returns:
             模板文件内容字符串，如果是文件夹则返回主要文件内容
         """
-        # 尝试作为期刊文件夹模板读取
+        # 尝试作为期刊文件夹模板读取；只读取主文件（_main.tex, main.tex 等），不加载整个模板
         try:
-            template_files = get_journal_template_files(template_name)
-            if template_files:
-                # 如果有多个文件，优先返回主文件（main.tex, _main.tex 等）
-                for key in ["_main.tex", "main.tex", "cvpr_header.tex"]:
-                    if key in template_files:
-                        return template_files[key]
-                # 如果没有主文件，返回第一个文件
-                return list(template_files.values())[0]
+            main_tex = get_main_tex(template_name)
+            if main_tex is not None:
+                return main_tex
         except FileNotFoundError:
             pass
         
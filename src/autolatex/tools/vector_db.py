@@ -3,23 +3,33 @@
 使用 ChromaDB 存储和检索 LaTeX 模板知识库
 """
 import os
+import re
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Optional
-import json
+from typing import List, Dict, Optional, Tuple
+from .embeddings import ChromaDefaultEmbedder, Embedder
 
 class VectorDatabase:
     """向量数据库管理类"""
     
-    def __init__(self, persist_directory: str = "data/vector_db", collection_name: str = "latex_templates"):
+    def __init__(
+        self,
+        persist_directory: str = "data/vector_db",
+        collection_name: str = "latex_templates",
+        embedder: Optional[Embedder] = None
+    ):
         """
         初始化向量数据库
         
         Args:
             persist_directory: 数据库持久化目录
-            collection_name: 集合名称
+            collection_name: 集合名称；非默认嵌入后端的向量维度不同，集合名会追加后端名称
+            embedder: 嵌入后端，默认使用 ChromaDB 默认的嵌入函数
         """
         self.persist_directory = persist_directory
+        self.embedder = embedder or ChromaDefaultEmbedder()
+        if self.embedder.name != ChromaDefaultEmbedder.name:
+            collection_name = f"{collection_name}_{re.sub(r'[^A-Za-z0-9_.-]', '_', self.embedder.name)}"[:63]
         self.collection_name = collection_name
         
         # 确保目录存在
@@ -37,7 +47,13 @@ class VectorDatabase:
             metadata={"hnsw:space": "cosine"}  # 使用余弦相似度
         )
     
-    def add_documents(self, documents: List[str], metadatas: List[Dict], ids: Optional[List[str]] = None):
+    def add_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ):
         """
         添加文档到向量数据库
         
@@ -45,15 +61,39 @@ class VectorDatabase:
             documents: 文档文本列表
             metadatas: 元数据列表
             ids: 文档ID列表（可选）
+            embeddings: 预先算好的向量（可选），未提供时由嵌入后端批量计算
         """
         if ids is None:
             ids = [f"doc_{i}" for i in range(len(documents))]
         
-        # ChromaDB 会自动生成嵌入向量
         self.collection.add(
             documents=documents,
             metadatas=metadatas,
-            ids=ids
+            ids=ids,
+            embeddings=embeddings if embeddings is not None else self.embedder.embed_documents(documents)
+        )
+    
+    def upsert_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict],
+        ids: List[str],
+        embeddings: Optional[List[List[float]]] = None
+    ):
+        """
+        批量写入文档：ID 已存在则覆盖，否则新增（只为传入的文档计算嵌入向量）
+        
+        Args:
+            documents: 文档文本列表
+            metadatas: 元数据列表
+            ids: 文档ID列表
+            embeddings: 预先算好的向量（可选），未提供时由嵌入后端批量计算
+        """
+        self.collection.upsert(
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids,
+            embeddings=embeddings if embeddings is not None else self.embedder.embed_documents(documents)
         )
     
     def search(self, query: str, n_results: int = 3) -> List[Dict]:
@@ -67,22 +107,61 @@ class VectorDatabase:
         Returns:
             搜索结果列表，每个结果包含文档内容、元数据和相似度分数
         """
+        return self.search_many([query], n_results=n_results)[0]
+    
+    def search_many(self, queries: List[str], n_results: int = 3, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        批量搜索：所有查询一次批量嵌入，并在一次 collection.query 中检索
+        
+        Args:
+            queries: 查询文本列表
+            n_results: 每个查询返回的结果数量
+            where: 元数据过滤条件（ChromaDB where 语法，如 {"template_type": "journal"}）
+            
+        Returns:
+            与 queries 顺序一致的结果列表
+        """
+        if not queries:
+            return []
+        return self.search_many_by_embedding(self.embedder.embed_queries(queries), n_results=n_results, where=where)
+    
+    def search_by_embedding(self, embedding: List[float], n_results: int = 3) -> List[Dict]:
+        """按查询向量检索"""
+        return self.search_many_by_embedding([embedding], n_results=n_results)[0]
+    
+    def search_many_by_embedding(
+        self,
+        embeddings: List[List[float]],
+        n_results: int = 3,
+        where: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """按多个查询向量批量检索，返回与输入顺序一致的结果列表"""
+        if not embeddings:
+            return []
         results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+            query_embeddings=embeddings,
+            n_results=n_results,
+            where=where
         )
         
         # 格式化返回结果
-        formatted_results = []
-        if results['documents'] and len(results['documents'][0]) > 0:
-            for i in range(len(results['documents'][0])):
+        all_formatted = []
+        for q in range(len(embeddings)):
+            documents = results['documents'][q] if results['documents'] else []
+            formatted_results = []
+            for i in range(len(documents)):
                 formatted_results.append({
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                    'distance': results['distances'][0][i] if results['distances'] else None
+                    'document': documents[i],
+                    'metadata': results['metadatas'][q][i] if results['metadatas'] else {},
+                    'distance': results['distances'][q][i] if results['distances'] else None
                 })
+            all_formatted.append(formatted_results)
         
-        return formatted_results
+        return all_formatted
+    
+    def warmup(self):
+        """提前加载嵌入模型，避免首个查询承担模型加载开销"""
+        self.embedder.warmup()
     
     def get_collection_count(self) -> int:
         """获取集合中的文档数量"""
@@ -93,6 +172,56 @@ class VectorDatabase:
         results = self.collection.get()
         return results.get('ids', []) if results else []
     
+    def get_all_metadatas(self) -> Dict[str, Dict]:
+        """获取集合中所有文档的 {ID: 元数据}（不读取文档正文）"""
+        results = self.collection.get(include=["metadatas"])
+        if not results:
+            return {}
+        return {
+            doc_id: metadata or {}
+            for doc_id, metadata in zip(results.get('ids', []), results.get('metadatas') or [])
+        }
+    
+    def get_by_metadata(
+        self,
+        where: Dict,
+        include: Tuple[str, ...] = ("metadatas",),
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        按元数据条件读取文档，过滤在 ChromaDB 内完成，只返回需要的字段
+        
+        Args:
+            where: 元数据过滤条件（ChromaDB where 语法，如 {"journal_key": "cvpr"}）
+            include: 需要返回的字段，"documents" 和/或 "metadatas"
+            limit: 最多返回的条目数
+            
+        Returns:
+            [{"id": ..., "document": ..., "metadata": ...}]，只包含 include 中的字段
+        """
+        results = self.collection.get(where=where, include=list(include), limit=limit)
+        if not results:
+            return []
+        entries = []
+        for i, doc_id in enumerate(results.get('ids', [])):
+            entry = {"id": doc_id}
+            if "documents" in include:
+                entry["document"] = results['documents'][i]
+            if "metadatas" in include:
+                entry["metadata"] = results['metadatas'][i] or {}
+            entries.append(entry)
+        return entries
+    
+    def get_all_entries(self) -> List[Tuple[str, str, Dict]]:
+        """获取集合中所有文档的 [(ID, 文档, 元数据)]"""
+        results = self.collection.get(include=["documents", "metadatas"])
+        if not results:
+            return []
+        ids = results.get('ids', [])
+        documents = results.get('documents') or [""] * len(ids)
+        metadatas = results.get('metadatas') or [{}] * len(ids)
+        return [(doc_id, document, metadata or {}) for doc_id, document, metadata in zip(ids, documents, metadatas)]
+    
     def id_exists(self, doc_id: str) -> bool:
         """检查指定的文档ID是否已存在"""
         try:
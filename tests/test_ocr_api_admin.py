@@ -0,0 +1,78 @@
+"""/admin/adapters 接口测试：未设置口令时关闭、口令校验与 checkpoint 目录白名单，使用假的多适配器模型封装。"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("peft")
+
+# ocr_api 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from fastapi.testclient import TestClient
+
+import ocr_api
+from ocr_model_wrapper import MultiAdapterOCRModelWrapper
+
+TOKEN = "s3cret"
+
+
+class StubMultiAdapterWrapper(MultiAdapterOCRModelWrapper):
+    """只记录加载的适配器，不加载模型"""
+
+    def __init__(self):
+        self.default_adapter = "base"
+        self.adapter_dirs = {}
+        self.model_ids = {}
+
+    def load_adapter(self, name, checkpoint_dir):
+        self.adapter_dirs[name] = checkpoint_dir
+        self.model_ids[name] = f"id-{name}"
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path: Path):
+    (tmp_path / "adapters" / "e1").mkdir(parents=True)
+    (tmp_path / "outside").mkdir()
+    monkeypatch.setattr(ocr_api, "model_wrapper", StubMultiAdapterWrapper())
+    monkeypatch.setattr(ocr_api, "ADAPTER_ROOT", str(tmp_path / "adapters"))
+    monkeypatch.setenv("OCR_ADMIN_TOKEN", TOKEN)
+    return TestClient(ocr_api.app)
+
+
+def test_admin_disabled_without_token(client, monkeypatch) -> None:
+    monkeypatch.delenv("OCR_ADMIN_TOKEN")
+    assert client.get("/admin/adapters").status_code == 404
+    assert client.get("/admin/adapters", headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_wrong_or_missing_token_is_forbidden(client) -> None:
+    assert client.get("/admin/adapters").status_code == 403
+    assert client.get("/admin/adapters", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/adapters", headers={"X-Admin-Token": TOKEN}).status_code == 200
+
+
+def test_checkpoint_dir_must_be_under_adapter_root(client, tmp_path: Path) -> None:
+    headers = {"X-Admin-Token": TOKEN}
+    for checkpoint_dir in (str(tmp_path / "outside"), str(tmp_path / "adapters" / ".." / "outside"), "/etc"):
+        response = client.post("/admin/adapters", json={"name": "x", "checkpoint_dir": checkpoint_dir}, headers=headers)
+        assert response.status_code == 400
+
+    (tmp_path / "adapters" / "link").symlink_to(tmp_path / "outside")
+    response = client.post(
+        "/admin/adapters", json={"name": "x", "checkpoint_dir": str(tmp_path / "adapters" / "link")}, headers=headers
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        "/admin/adapters", json={"name": "e1", "checkpoint_dir": str(tmp_path / "adapters" / "e1")}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["adapters"]["e1"]["checkpoint_dir"] == str((tmp_path / "adapters" / "e1").resolve())
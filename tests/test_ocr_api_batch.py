@@ -0,0 +1,146 @@
+"""/predict_batch 接口测试：多文件上传、zip 上传、单项失败隔离与排队已满的 503，使用假的模型封装。"""
+
+from __future__ import annotations
+
+import io
+import sys
+import zipfile
+from pathlib import Path
+from typing import List
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("peft")
+
+# ocr_api 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import ocr_api
+from ocr_batching import MicroBatcher
+from ocr_model_wrapper import OCRPrediction
+
+
+class StubWrapper:
+    """识别结果为图片宽度，便于核对顺序"""
+
+    default_adapter = None
+
+    def adapter_names(self) -> List[str]:
+        return []
+
+    def predict_batch(self, images, max_length, enhance, decoding=None, adapter=None):
+        return [OCRPrediction(latex=f"w={image.size[0]}", decoding="greedy") for image in images]
+
+
+def _png(width: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, 8), color=255).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _lines_png(lines: int) -> bytes:
+    """白底上 lines 条互相隔开的黑色横条，分块模式下切成 lines 个条带"""
+    image = Image.new("L", (40, 30 * lines + 10), color=255)
+    for i in range(lines):
+        image.paste(0, (5, 10 + 30 * i, 35, 20 + 30 * i))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _zip(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def factory(max_queue_depth: int = 0):
+        batcher = MicroBatcher(StubWrapper(), max_batch_size=8, max_wait_ms=5, max_queue_depth=max_queue_depth)
+        batcher.start()
+        batchers.append(batcher)
+        monkeypatch.setattr(ocr_api, "model_wrapper", batcher.model_wrapper)
+        monkeypatch.setattr(ocr_api, "batcher", batcher)
+        # 不使用上下文管理器，不触发加载真实模型的 startup 事件
+        return TestClient(ocr_api.app)
+
+    batchers = []
+    yield factory
+    for batcher in batchers:
+        batcher.stop(timeout=1.0)
+
+
+def test_multi_file_upload_keeps_input_order(client) -> None:
+    files = [("files", (f"eq{width}.png", _png(width), "image/png")) for width in (10, 20, 30)]
+    response = client().post("/predict_batch", files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert [item["filename"] for item in body["results"]] == ["eq10.png", "eq20.png", "eq30.png"]
+    assert [item["latex"] for item in body["results"]] == ["w=10", "w=20", "w=30"]
+
+
+def test_zip_upload_skips_traversal_and_non_image_members(client) -> None:
+    archive = _zip([
+        ("a.png", _png(10)),
+        ("notes.txt", b"not an image"),
+        ("../evil.png", _png(99)),
+        ("/abs.png", _png(98)),
+        ("dir/b.png", _png(20)),
+    ])
+    response = client().post("/predict_batch", files=[("archive", ("equation.zip", archive, "application/zip"))])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["filename"] for item in results] == ["a.png", "dir/b.png"]
+    assert [item["latex"] for item in results] == ["w=10", "w=20"]
+
+
+def test_one_bad_item_does_not_fail_others(client) -> None:
+    files = [
+        ("files", ("good1.png", _png(10), "image/png")),
+        ("files", ("bad.png", b"garbage", "image/png")),
+        ("files", ("good2.png", _png(30), "image/png")),
+    ]
+    response = client().post("/predict_batch", files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is False
+    assert body["message"].startswith("1/3")
+    good1, bad, good2 = body["results"]
+    assert good1["success"] and good1["latex"] == "w=10"
+    assert not bad["success"] and "图片解码失败" in bad["message"]
+    assert good2["success"] and good2["latex"] == "w=30"
+
+
+def test_queue_full_returns_503_with_retry_after(client) -> None:
+    files = [("files", (f"eq{width}.png", _png(width), "image/png")) for width in (10, 20)]
+    response = client(max_queue_depth=1).post("/predict_batch", files=files)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(ocr_api.RETRY_AFTER_SECONDS)
+
+
+def test_tile_strips_are_reserved_together(client) -> None:
+    files = [("files", ("three_lines.png", _lines_png(3), "image/png"))]
+    # 一张图片但有 3 个条带：队列只能容纳 2 个时整批 503，而不是单项失败
+    response = client(max_queue_depth=2).post("/predict_batch", files=files, data={"tile": "true"})
+    assert response.status_code == 503
+
+    response = client(max_queue_depth=3).post("/predict_batch", files=files, data={"tile": "true"})
+    assert response.status_code == 200
+    [item] = response.json()["results"]
+    assert item["success"] and item["tiles"] == 3
+
+
+def test_empty_request_is_rejected(client) -> None:
+    response = client().post("/predict_batch", data={"max_length": "256"})
+    assert response.status_code == 400
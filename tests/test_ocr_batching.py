@@ -0,0 +1,188 @@
+"""MicroBatcher 单元测试：聚批、分组、异常传播、排队上限与停止，使用假的模型封装。"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+
+# ocr_batching 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from ocr_batching import MicroBatcher, QueueFullError
+
+TIMEOUT = 5.0
+
+
+@dataclass
+class FakePrediction:
+    latex: str
+    preprocess_ms: float = 0.0
+    encode_ms: float = 0.0
+    decode_ms: float = 1.0
+    postprocess_ms: float = 0.0
+    generated_tokens: int = 1
+    queue_wait_ms: float = 0.0
+
+
+class FakeWrapper:
+    """记录每次 predict_batch 调用；images 为字符串标签，结果 latex 即标签本身"""
+
+    def __init__(self, gate: threading.Event = None, error: Exception = None, drop_last: bool = False):
+        self.calls = []
+        self.entered = threading.Event()
+        self.gate = gate
+        self.error = error
+        self.drop_last = drop_last
+
+    def predict_batch(self, images, max_length, enhance, decoding=None, adapter=None):
+        self.calls.append({"images": list(images), "max_length": max_length, "decoding": decoding, "adapter": adapter})
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(TIMEOUT)
+        if self.error is not None:
+            raise self.error
+        results = [FakePrediction(latex=image) for image in images]
+        return results[:-1] if self.drop_last else results
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def factory(wrapper, **kwargs):
+        batcher = MicroBatcher(wrapper, **kwargs)
+        batcher.start()
+        batchers.append(batcher)
+        return batcher
+
+    yield factory
+    for batcher in batchers:
+        batcher.stop(timeout=1.0)
+
+
+def test_batches_up_to_max_batch_size(make_batcher) -> None:
+    wrapper = FakeWrapper()
+    batcher = make_batcher(wrapper, max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(f"img{i}") for i in range(10)]
+    for future in futures:
+        future.result(TIMEOUT)
+    sizes = [len(call["images"]) for call in wrapper.calls]
+    assert sum(sizes) == 10
+    assert max(sizes) == 4
+
+
+def test_results_returned_in_order(make_batcher) -> None:
+    wrapper = FakeWrapper()
+    batcher = make_batcher(wrapper, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit(f"img{i}") for i in range(6)]
+    assert [future.result(TIMEOUT).latex for future in futures] == [f"img{i}" for i in range(6)]
+
+
+def test_groups_by_max_length_decoding_and_adapter(make_batcher) -> None:
+    wrapper = FakeWrapper()
+    batcher = make_batcher(wrapper, max_batch_size=16, max_wait_ms=200)
+    params = [(512, None, None), (256, None, None), (512, "greedy", None), (512, None, "math"), (512, None, None)]
+    futures = [
+        batcher.submit(f"img{i}", max_length=max_length, decoding=decoding, adapter=adapter)
+        for i, (max_length, decoding, adapter) in enumerate(params)
+    ]
+    assert [future.result(TIMEOUT).latex for future in futures] == [f"img{i}" for i in range(5)]
+    groups = {(call["max_length"], call["decoding"], call["adapter"]): call["images"] for call in wrapper.calls}
+    assert groups[(512, None, None)] == ["img0", "img4"]
+    assert groups[(256, None, None)] == ["img1"]
+    assert groups[(512, "greedy", None)] == ["img2"]
+    assert groups[(512, None, "math")] == ["img3"]
+
+
+def test_exception_propagates_to_every_future_in_group(make_batcher) -> None:
+    wrapper = FakeWrapper(error=ValueError("boom"))
+    batcher = make_batcher(wrapper, max_batch_size=4, max_wait_ms=100)
+    futures = [batcher.submit(f"img{i}") for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="boom"):
+            future.result(TIMEOUT)
+    # 工作线程仍然存活
+    wrapper.error = None
+    assert batcher.submit("after").result(TIMEOUT).latex == "after"
+
+
+def test_short_result_list_fails_whole_group(make_batcher) -> None:
+    wrapper = FakeWrapper(drop_last=True)
+    batcher = make_batcher(wrapper, max_batch_size=4, max_wait_ms=100)
+    futures = [batcher.submit(f"img{i}") for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(TIMEOUT)
+
+
+def test_cancelled_request_is_skipped(make_batcher) -> None:
+    gate = threading.Event()
+    wrapper = FakeWrapper(gate=gate)
+    batcher = make_batcher(wrapper, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit("first")
+    assert wrapper.entered.wait(TIMEOUT)
+    cancelled = batcher.submit("cancelled")
+    assert cancelled.cancel()
+    last = batcher.submit("last")
+    gate.set()
+    assert first.result(TIMEOUT).latex == "first"
+    assert last.result(TIMEOUT).latex == "last"
+    assert all("cancelled" not in call["images"] for call in wrapper.calls)
+
+
+def test_queue_full_and_has_capacity(make_batcher) -> None:
+    gate = threading.Event()
+    wrapper = FakeWrapper(gate=gate)
+    batcher = make_batcher(wrapper, max_batch_size=1, max_wait_ms=0, max_queue_depth=2)
+    running = batcher.submit("running")
+    assert wrapper.entered.wait(TIMEOUT)  # 第一个请求已出队，正在推理
+    queued = [batcher.submit("q1"), batcher.submit("q2")]
+    with pytest.raises(QueueFullError):
+        batcher.submit("overflow")
+    assert batcher.rejected == 1
+    assert not batcher.has_capacity()
+    gate.set()
+    for future in [running] + queued:
+        future.result(TIMEOUT)
+    assert batcher.has_capacity(2)
+
+
+def test_stop_fails_pending_futures(make_batcher) -> None:
+    gate = threading.Event()
+    wrapper = FakeWrapper(gate=gate)
+    batcher = make_batcher(wrapper, max_batch_size=1, max_wait_ms=0)
+    running = batcher.submit("running")
+    assert wrapper.entered.wait(TIMEOUT)
+    pending = [batcher.submit("p1"), batcher.submit("p2")]
+    batcher.stop(timeout=0.1)
+    for future in pending:
+        with pytest.raises(RuntimeError):
+            future.result(TIMEOUT)
+    gate.set()
+    assert running.result(TIMEOUT).latex == "running"
+    with pytest.raises(RuntimeError):
+        batcher.submit("after-stop")
+
+
+def test_submit_many_reserves_all_or_nothing(make_batcher) -> None:
+    gate = threading.Event()
+    wrapper = FakeWrapper(gate=gate)
+    batcher = make_batcher(wrapper, max_batch_size=1, max_wait_ms=0, max_queue_depth=3)
+    running = batcher.submit("running")
+    assert wrapper.entered.wait(TIMEOUT)
+    queued = batcher.submit("q0")
+    with pytest.raises(QueueFullError):
+        batcher.submit_many(["a", "b", "c"])
+    # 一个都没有入队，rejected 按图片数计
+    assert batcher.queue_depth() == 1
+    assert batcher.rejected == 3
+    futures = batcher.submit_many(["a", "b"], max_length=[64, 128])
+    gate.set()
+    assert [future.result(TIMEOUT).latex for future in [running, queued] + futures] == ["running", "q0", "a", "b"]
+    assert [call["max_length"] for call in wrapper.calls[-2:]] == [64, 128]
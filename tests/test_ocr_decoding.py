@@ -0,0 +1,96 @@
+"""LaTeX 合法性检查与 adaptive 解码升级逻辑的单元测试，不加载真实模型。"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("peft")
+
+# ocr_model_wrapper 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from ocr_model_wrapper import OCRModelWrapper, OCRPrediction, latex_sanity_issues
+
+
+def test_clean_latex_has_no_issues() -> None:
+    latex = r"\begin{aligned} f(x) &= \left( \frac{a}{b} \right)^{2} \\ \{x\} &= 1 \end{aligned}"
+    assert latex_sanity_issues(latex) == []
+
+
+def test_unbalanced_braces() -> None:
+    assert latex_sanity_issues(r"\frac{a}{b") == ["花括号不配对"]
+    assert latex_sanity_issues(r"a}{b") == ["花括号不配对"]
+    # 转义的花括号不参与配对
+    assert latex_sanity_issues(r"\{ a") == []
+
+
+def test_begin_end_mismatch() -> None:
+    assert latex_sanity_issues(r"\begin{matrix} a \end{array}") == [r"\end{array} 没有匹配的 \begin"]
+    assert latex_sanity_issues(r"\begin{cases} a") == [r"\begin{cases} 没有匹配的 \end"]
+
+
+def test_repetition_loop() -> None:
+    issues = latex_sanity_issues("x = " + "\\alpha " * 12)
+    assert len(issues) == 1 and "重复" in issues[0]
+    # 少量重复与纯空白重复不算
+    assert latex_sanity_issues("a " * 5 + "b") == []
+    assert latex_sanity_issues("x" + " " * 40 + "y") == []
+
+
+def test_hit_max_length() -> None:
+    assert latex_sanity_issues("x", hit_max_length=True) == ["达到 max_length 被截断"]
+
+
+def _make_wrapper(greedy):
+    """绕过模型加载，只保留 _decode 用到的属性；_generate 返回预设结果并记录调用"""
+    wrapper = object.__new__(OCRModelWrapper)
+    wrapper.num_beams = 4
+    wrapper.adaptive_min_confidence = 0.9
+    wrapper.calls = []
+
+    def fake_generate(encoder_hidden_states, max_length, num_beams):
+        wrapper.calls.append((encoder_hidden_states.flatten().tolist(), num_beams))
+        if num_beams == 1:
+            return greedy
+        return [
+            OCRPrediction(latex=f"beam{int(row)}", decoding="beam", confidence=0.99, decode_ms=5.0)
+            for row in encoder_hidden_states.flatten().tolist()
+        ]
+
+    wrapper._generate = fake_generate
+    return wrapper
+
+
+def test_adaptive_escalates_only_flagged_subset() -> None:
+    greedy = [
+        OCRPrediction(latex="ok0", decoding="greedy", confidence=0.99, decode_ms=2.0),
+        OCRPrediction(latex="low1", decoding="greedy", confidence=0.5, decode_ms=2.0),
+        OCRPrediction(latex="ok2", decoding="greedy", confidence=0.99, decode_ms=2.0),
+        OCRPrediction(latex="bad3", decoding="greedy", confidence=0.99, decode_ms=2.0, issues=["花括号不配对"]),
+    ]
+    wrapper = _make_wrapper(greedy)
+    encoder_hidden_states = torch.arange(4).reshape(4, 1)
+    predictions = wrapper._decode(encoder_hidden_states, 64, "adaptive")
+
+    # beam search 只重跑了被标记的第 1、3 行
+    assert wrapper.calls == [([0, 1, 2, 3], 1), ([1, 3], 4)]
+    assert [prediction.latex for prediction in predictions] == ["ok0", "beam1", "ok2", "beam3"]
+    assert [prediction.escalated for prediction in predictions] == [False, True, False, True]
+    assert predictions[1].decoding == "greedy+beam"
+    assert predictions[1].issues[0].startswith("置信度")
+    assert predictions[3].issues == ["花括号不配对"]
+    assert predictions[3].decode_ms == 7.0
+
+
+def test_adaptive_without_flags_skips_beam() -> None:
+    greedy = [OCRPrediction(latex="ok", decoding="greedy", confidence=0.99)]
+    wrapper = _make_wrapper(greedy)
+    assert wrapper._decode(torch.arange(1).reshape(1, 1), 64, "adaptive") == greedy
+    assert wrapper.calls == [([0], 1)]
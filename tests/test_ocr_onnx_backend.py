@@ -0,0 +1,76 @@
+"""ONNX Runtime 后端与 PyTorch 后端的一致性测试（需要已导出的 ONNX 模型与对应 checkpoint）。
+
+用法（在项目根目录下运行）：
+    python scripts/export_onnx_ocr_model.py --checkpoint-dir <checkpoint>
+    OCR_CHECKPOINT_DIR=<checkpoint> OCR_ONNX_DIR=<checkpoint>_onnx python -m pytest tests/test_ocr_onnx_backend.py
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+# ocr_model_wrapper / ocr_onnx_backend 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image
+
+from ocr_model_wrapper import DEFAULT_BASE_MODEL, OCRModelWrapper
+from ocr_onnx_backend import OnnxOCRModelWrapper
+
+CHECKPOINT_DIR = os.getenv("OCR_CHECKPOINT_DIR", "checkpoints/mixtex_lora_10k_final_tuned/epoch_2")
+BASE_MODEL_PATH = os.getenv("OCR_BASE_MODEL_PATH", DEFAULT_BASE_MODEL)
+ONNX_DIR = os.getenv("OCR_ONNX_DIR") or f"{CHECKPOINT_DIR.rstrip('/')}_onnx"
+# 仓库自带的公式截图
+EVAL_IMAGES = sorted(PROJECT_ROOT.glob("data/*/equation/*.png"))
+# 允许少量样本因浮点误差在 beam 排序上出现分歧
+MIN_MATCH_RATE = 0.95
+
+pytestmark = pytest.mark.skipif(
+    not (PROJECT_ROOT / CHECKPOINT_DIR).exists() or not (PROJECT_ROOT / ONNX_DIR).exists() or not EVAL_IMAGES,
+    reason="缺少 checkpoint、ONNX 导出目录或评测图片",
+)
+
+
+@pytest.fixture(scope="module")
+def wrappers():
+    os.chdir(PROJECT_ROOT)
+    torch_wrapper = OCRModelWrapper(CHECKPOINT_DIR, BASE_MODEL_PATH, device="cpu")
+    onnx_wrapper = OnnxOCRModelWrapper(ONNX_DIR)
+    return torch_wrapper, onnx_wrapper
+
+
+@pytest.fixture(scope="module")
+def images():
+    return [Image.open(path).convert("RGB") for path in EVAL_IMAGES]
+
+
+def test_encoder_outputs_match(wrappers, images) -> None:
+    torch_wrapper, onnx_wrapper = wrappers
+    processed = torch_wrapper._preprocess_images(images[:4], [True] * len(images[:4]))
+    pixel_values = torch_wrapper._pixel_values(processed)
+    expected = torch_wrapper._encode(pixel_values)
+    actual = onnx_wrapper._encode(pixel_values)
+    assert float((expected - actual).abs().max()) < 1e-3
+
+
+@pytest.mark.parametrize("decoding", ["greedy", "beam"])
+def test_latex_matches_pytorch(wrappers, images, decoding: str) -> None:
+    torch_wrapper, onnx_wrapper = wrappers
+    expected = torch_wrapper.predict_batch(images, decoding=decoding)
+    actual = onnx_wrapper.predict_batch(images, decoding=decoding)
+    matches = sum(e.latex == a.latex for e, a in zip(expected, actual))
+    mismatched = [
+        (str(path), e.latex, a.latex)
+        for path, e, a in zip(EVAL_IMAGES, expected, actual) if e.latex != a.latex
+    ]
+    assert matches / len(images) >= MIN_MATCH_RATE, mismatched
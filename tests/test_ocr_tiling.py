@@ -0,0 +1,89 @@
+"""分块识别单元测试：用合成的 numpy 图片验证按行切分，并检查 aligned 拼接格式。"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+# ocr_tiling 位于项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from ocr_tiling import find_line_bands, merge_tile_predictions, split_formula_lines, stitch_aligned
+
+
+def _image(height: int, bars) -> Image.Image:
+    """白底图片，bars 为 (top, bottom) 黑色横条区间"""
+    pixels = np.full((height, 120), 255, dtype=np.uint8)
+    for top, bottom in bars:
+        pixels[top:bottom, 10:110] = 0
+    return Image.fromarray(pixels)
+
+
+@dataclass
+class FakePrediction:
+    latex: str
+    decoding: str = "greedy"
+    confidence: Optional[float] = 0.9
+    escalated: bool = False
+    issues: List[str] = field(default_factory=list)
+    generated_tokens: int = 5
+    decode_ms: float = 1.0
+    preprocess_ms: float = 0.0
+    encode_ms: float = 0.0
+    postprocess_ms: float = 0.0
+    queue_wait_ms: float = 0.0
+
+
+def test_single_line_is_not_split() -> None:
+    image = _image(40, [(10, 30)])
+    assert find_line_bands(image) == [(0, 40)]
+    assert split_formula_lines(image) == [image]
+
+
+def test_fraction_is_not_split() -> None:
+    # 分子、细分数线、分母之间的空白不切分
+    image = _image(60, [(5, 20), (26, 28), (34, 50)])
+    assert len(split_formula_lines(image)) == 1
+
+
+def test_two_lines_split_at_gap_midpoint() -> None:
+    image = _image(80, [(10, 30), (50, 70)])
+    assert find_line_bands(image) == [(0, 40), (40, 80)]
+    strips = split_formula_lines(image)
+    assert [strip.size for strip in strips] == [(120, 40), (120, 40)]
+    # 每个条带都含有完整的一行笔画
+    for strip in strips:
+        assert (np.asarray(strip) == 0).any(axis=1).sum() == 20
+
+
+def test_all_white_image() -> None:
+    image = _image(50, [])
+    assert find_line_bands(image) == [(0, 50)]
+    assert split_formula_lines(image) == [image]
+
+
+def test_stitch_aligned_format() -> None:
+    assert stitch_aligned(["$a = b$", "\\[c = d + e\\]"]) == "\\begin{aligned}\na &= b \\\\\nc &= d + e\n\\end{aligned}"
+    # 已有 & 时不再插入；花括号内的 = 不作为对齐点
+    assert stitch_aligned(["x &\\le 1", "f_{i=1} &= 2"]) == "\\begin{aligned}\nx &\\le 1 \\\\\nf_{i=1} &= 2\n\\end{aligned}"
+    assert stitch_aligned(["", "y = 1 \\\\"]) == "y = 1"
+
+
+def test_merge_tile_predictions() -> None:
+    merged = merge_tile_predictions([
+        FakePrediction(latex="a = b", confidence=0.95, decode_ms=3.0),
+        FakePrediction(latex="c = d", decoding="beam", confidence=0.8, issues=["花括号不配对"]),
+    ])
+    assert merged.latex == "\\begin{aligned}\na &= b \\\\\nc &= d\n\\end{aligned}"
+    assert merged.decoding == "mixed"
+    assert merged.confidence == 0.8
+    assert merged.issues == ["花括号不配对"]
+    assert merged.generated_tokens == 10
+    assert merged.decode_ms == 3.0
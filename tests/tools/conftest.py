@@ -0,0 +1,55 @@
+"""tests/tools 共用的测试夹具"""
+
+from __future__ import annotations
+
+import shutil
+import sys
+from pathlib import Path
+from typing import List, Sequence
+
+import pytest
+
+# 添加 src 目录到路径
+project_root = Path(__file__).resolve().parent.parent.parent
+src_path = project_root / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from autolatex.tools.embeddings import Embedder
+from autolatex.tools.knowledge_pack import DEFAULT_PACK_DIR, SOURCE_DIR_NAME, build_pack
+
+# 假嵌入后端的词表：向量第 i 维为文本中第 i 个词出现的次数
+FAKE_VOCABULARY = ("cvpr", "ieee", "nature", "arxiv", "vision", "physics", "access", "reports")
+
+
+class FakeEmbedder(Embedder):
+    """确定性的词袋嵌入，不加载任何模型"""
+
+    name = "fake-bow"
+
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        vectors = []
+        for text in texts:
+            words = text.lower().split()
+            # 末尾常数维保证向量非零
+            vectors.append([float(words.count(word)) for word in FAKE_VOCABULARY] + [0.1])
+        return vectors
+
+
+@pytest.fixture
+def fake_embedder() -> FakeEmbedder:
+    return FakeEmbedder()
+
+
+@pytest.fixture
+def pack_dir(tmp_path: Path, monkeypatch) -> Path:
+    """复制随代码分发的条目源文件，构建一个可修改的数据包"""
+    pack_dir = tmp_path / "pack"
+    shutil.copytree(Path(DEFAULT_PACK_DIR) / SOURCE_DIR_NAME, pack_dir / SOURCE_DIR_NAME)
+    build_pack(str(pack_dir))
+    monkeypatch.setenv("AUTOLATEX_KNOWLEDGE_PACK_DIR", str(pack_dir))
+    return pack_dir
@@ -0,0 +1,116 @@
+"""模板知识数据包单元测试：构建与读取往返、重复与格式版本错误、篡改检测与按字节位置读取。"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from autolatex.tools.knowledge_pack import (
+    DEFAULT_PACK_DIR,
+    INDEX_FILE,
+    TEMPLATES_FILE,
+    TemplatePack,
+    build_pack,
+    entry_metadata,
+)
+
+
+def _item(journal: str, document: str, **metadata) -> dict:
+    return {"journal": journal, "document": document, "metadata": {"journal_name": journal, **metadata}}
+
+
+def _write_source(source_dir: Path, items: dict) -> None:
+    source_dir.mkdir(parents=True, exist_ok=True)
+    for filename, item in items.items():
+        (source_dir / filename).write_text(json.dumps(item, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def pack_dir(tmp_path: Path) -> Path:
+    _write_source(tmp_path / "source", {
+        "a.json": _item("Alpha Journal", "alpha 模板", tags=["x", "y"]),
+        "b.json": _item("Beta", "beta\n多行\n模板"),
+        "c.json": _item("Gamma Letters", "gamma", field="physics"),
+    })
+    return tmp_path
+
+
+def test_build_round_trip(pack_dir: Path) -> None:
+    index = build_pack(str(pack_dir))
+    pack = TemplatePack(str(pack_dir))
+    assert pack.version == index["version"]
+    assert pack.ids() == ["template_alpha_journal", "template_beta", "template_gamma_letters"]
+    assert pack.journal_names() == ["Alpha Journal", "Beta", "Gamma Letters"]
+    assert pack.find_id("  alpha   JOURNAL ") == "template_alpha_journal"
+    assert pack.find_id("missing") is None
+    assert pack.validate() == []
+
+    source = json.loads((pack_dir / "source" / "a.json").read_text(encoding="utf-8"))
+    document, metadata = pack.entries(["template_alpha_journal"])["template_alpha_journal"]
+    assert document == source["document"]
+    assert metadata == entry_metadata(source)
+    assert metadata["tags"] == '["x", "y"]'
+    assert pack.content_hashes()["template_alpha_journal"] == metadata["content_hash"]
+
+    # 内容不变时重复构建的结果完全相同
+    before = (pack_dir / INDEX_FILE).read_bytes(), (pack_dir / TEMPLATES_FILE).read_bytes()
+    assert build_pack(str(pack_dir)) == index
+    assert ((pack_dir / INDEX_FILE).read_bytes(), (pack_dir / TEMPLATES_FILE).read_bytes()) == before
+
+
+def test_duplicate_id_is_rejected(pack_dir: Path) -> None:
+    # "Beta" 与 "beta" 的 ID 相同
+    _write_source(pack_dir / "source", {"d.json": _item("beta", "another beta")})
+    with pytest.raises(ValueError, match="template_beta"):
+        build_pack(str(pack_dir))
+    assert not (pack_dir / INDEX_FILE).exists()
+
+
+def test_duplicate_journal_key_is_rejected(pack_dir: Path) -> None:
+    # ID 不同，但 metadata.journal_name 规范化后与 Gamma Letters 相同
+    item = _item("Gamma-Letters", "gamma again")
+    item["metadata"]["journal_name"] = "GAMMA  letters"
+    _write_source(pack_dir / "source", {"d.json": item})
+    with pytest.raises(ValueError, match="gamma letters"):
+        build_pack(str(pack_dir))
+
+
+def test_format_version_mismatch(pack_dir: Path) -> None:
+    build_pack(str(pack_dir))
+    index = json.loads((pack_dir / INDEX_FILE).read_text(encoding="utf-8"))
+    index["format_version"] = 999
+    (pack_dir / INDEX_FILE).write_text(json.dumps(index), encoding="utf-8")
+    pack = TemplatePack(str(pack_dir))
+    with pytest.raises(ValueError, match="格式版本"):
+        pack.ids()
+    assert pack.validate()[0].startswith("无法读取索引")
+
+
+def test_validate_detects_tampered_line(pack_dir: Path) -> None:
+    build_pack(str(pack_dir))
+    templates = pack_dir / TEMPLATES_FILE
+    lines = templates.read_bytes().split(b"\n")
+    # 等长篡改：字节位置不变，只有内容哈希对不上
+    lines[1] = lines[1].replace(b"beta", b"BETA", 1)
+    templates.write_bytes(b"\n".join(lines))
+    errors = TemplatePack(str(pack_dir)).validate()
+    assert errors == ["template_beta: content_hash 与条目内容不一致"]
+
+
+def test_byte_offset_reads(pack_dir: Path) -> None:
+    build_pack(str(pack_dir))
+    pack = TemplatePack(str(pack_dir))
+    # 含多字节字符与转义换行的条目也能按字节位置准确读取，且可乱序读取
+    items = pack.get_items(["template_gamma_letters", "template_alpha_journal", "template_beta"])
+    assert list(items) == ["template_gamma_letters", "template_alpha_journal", "template_beta"]
+    assert items["template_alpha_journal"]["document"] == "alpha 模板"
+    assert items["template_beta"]["document"] == "beta\n多行\n模板"
+    assert pack.get_item("template_gamma_letters")["metadata"]["field"] == "physics"
+    with pytest.raises(KeyError):
+        pack.get_item("template_missing")
+
+
+def test_shipped_pack_is_valid() -> None:
+    assert TemplatePack(DEFAULT_PACK_DIR).validate() == []
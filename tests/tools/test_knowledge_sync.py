@@ -0,0 +1,45 @@
+"""知识库增量同步单元测试：新增、哈希变化时更新、未变化时跳过与删除已移除的模板，使用 numpy 后端与假嵌入后端。"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from autolatex.tools.knowledge_base import sync_knowledge_base
+from autolatex.tools.knowledge_pack import SOURCE_DIR_NAME, build_pack
+from autolatex.tools.numpy_vector_db import NumpyVectorDatabase
+
+
+def test_sync_add_skip_update_delete(tmp_path: Path, pack_dir: Path, fake_embedder) -> None:
+    db = NumpyVectorDatabase(persist_directory=str(tmp_path / "db"), embedder=fake_embedder)
+    db.add_documents(["user note"], [{"journal": "note"}], ids=["user_note"])
+
+    changes = sync_knowledge_base(db)
+    assert len(changes["added"]) == 4
+    assert changes["updated"] == [] and changes["deleted"] == []
+    assert db.get_collection_count() == 5
+
+    # 内容未变：不写入、不嵌入
+    fake_embedder.embedded.clear()
+    assert sync_knowledge_base(db) == {"added": [], "updated": [], "deleted": []}
+    assert fake_embedder.embedded == []
+
+    # 修改一个条目、删除一个条目
+    source = pack_dir / SOURCE_DIR_NAME
+    item = json.loads((source / "cvpr.json").read_text(encoding="utf-8"))
+    item["document"] += "\n% 新增说明"
+    (source / "cvpr.json").write_text(json.dumps(item, ensure_ascii=False), encoding="utf-8")
+    (source / "arvix.json").unlink()
+    # 重新构建后数据包索引自动重新加载
+    build_pack(str(pack_dir))
+
+    changes = sync_knowledge_base(db)
+    assert changes["added"] == []
+    assert changes["updated"] == ["template_cvpr"]
+    assert len(changes["deleted"]) == 1 and changes["deleted"][0].startswith("template_")
+    # 只为变化的条目计算嵌入，非模板条目不受影响
+    assert fake_embedder.embedded == [item["document"]]
+    assert db.id_exists("user_note")
+    assert db.get_collection_count() == 4
+    [entry] = db.get_by_metadata({"journal_key": "cvpr"}, include=("documents",))
+    assert entry["document"] == item["document"]
@@ -0,0 +1,124 @@
+"""NumpyVectorDatabase 单元测试：增删改、top-k 排序、where 过滤、批量检索、持久化与损坏的元数据文件，使用确定性的假嵌入后端。"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autolatex.tools.numpy_vector_db import NumpyVectorDatabase
+
+DOCUMENTS = {
+    "t_cvpr": ("cvpr vision vision", {"journal": "CVPR", "journal_key": "cvpr", "field": "cs"}),
+    "t_ieee": ("ieee access access", {"journal": "IEEE Access", "journal_key": "ieee access", "field": "cs"}),
+    "t_nature": ("nature reports physics", {"journal": "Scientific Reports", "journal_key": "scientific reports", "field": "science"}),
+}
+
+
+def _make_db(tmp_path: Path, embedder) -> NumpyVectorDatabase:
+    db = NumpyVectorDatabase(persist_directory=str(tmp_path), embedder=embedder)
+    ids = list(DOCUMENTS)
+    db.add_documents([DOCUMENTS[i][0] for i in ids], [DOCUMENTS[i][1] for i in ids], ids=ids)
+    return db
+
+
+def test_add_upsert_delete(tmp_path: Path, fake_embedder) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    assert db.get_collection_count() == 3
+    with pytest.raises(ValueError):
+        db.add_documents(["cvpr"], [{}], ids=["t_cvpr"])
+
+    fake_embedder.embedded.clear()
+    db.upsert_documents(
+        ["cvpr vision arxiv", "arxiv arxiv"],
+        [{"journal": "CVPR", "journal_key": "cvpr", "rev": 2}, {"journal": "arXiv", "journal_key": "arxiv"}],
+        ids=["t_cvpr", "t_arxiv"],
+    )
+    # 只嵌入传入的文档
+    assert fake_embedder.embedded == ["cvpr vision arxiv", "arxiv arxiv"]
+    assert db.get_all_ids() == ["t_cvpr", "t_ieee", "t_nature", "t_arxiv"]
+    assert db.get_all_metadatas()["t_cvpr"]["rev"] == 2
+
+    db.delete_documents(["t_ieee", "missing"])
+    assert db.get_all_ids() == ["t_cvpr", "t_nature", "t_arxiv"]
+    assert not db.id_exists("t_ieee")
+    assert db.search("ieee access", n_results=3)[0]["metadata"]["journal"] != "IEEE Access"
+
+
+def test_top_k_ordering(tmp_path: Path, fake_embedder) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    query = "ieee access cvpr"
+    # 按余弦相似度手工计算的期望顺序与距离
+    query_vector = np.asarray(fake_embedder.embed_query(query))
+    expected = []
+    for doc_id, (document, metadata) in DOCUMENTS.items():
+        vector = np.asarray(fake_embedder.embed_query(document))
+        similarity = query_vector @ vector / np.linalg.norm(query_vector) / np.linalg.norm(vector)
+        expected.append((1.0 - similarity, metadata["journal"]))
+    expected.sort()
+    assert [journal for _, journal in expected] == ["IEEE Access", "CVPR", "Scientific Reports"]
+
+    results = db.search(query, n_results=2)
+    assert [result["metadata"]["journal"] for result in results] == ["IEEE Access", "CVPR"]
+    results = db.search(query, n_results=10)
+    assert [result["distance"] for result in results] == pytest.approx([distance for distance, _ in expected], abs=1e-5)
+
+
+def test_where_filter(tmp_path: Path, fake_embedder) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    results = db.search_many(["cvpr vision"], n_results=3, where={"field": "science"})[0]
+    assert [result["metadata"]["journal"] for result in results] == ["Scientific Reports"]
+    results = db.search_many(["cvpr vision"], n_results=3, where={"journal_key": {"$in": ["ieee access", "cvpr"]}})[0]
+    assert [result["metadata"]["journal"] for result in results] == ["CVPR", "IEEE Access"]
+    assert db.search_many(["cvpr"], where={"field": "math"}) == [[]]
+
+
+def test_get_by_metadata_journal_key(tmp_path: Path, fake_embedder) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    assert db.get_by_metadata({"journal_key": "ieee access"}) == [{"id": "t_ieee", "metadata": DOCUMENTS["t_ieee"][1]}]
+    [entry] = db.get_by_metadata({"journal_key": "cvpr"}, include=("documents",))
+    assert entry == {"id": "t_cvpr", "document": "cvpr vision vision"}
+    assert db.get_by_metadata({"journal_key": "missing"}) == []
+    assert len(db.get_by_metadata({"field": "cs"}, limit=1)) == 1
+
+
+def test_search_many_matches_repeated_search(tmp_path: Path, fake_embedder) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    queries = ["cvpr vision", "nature physics", "ieee", "arxiv"]
+    assert db.search_many(queries, n_results=2) == [db.search(query, n_results=2) for query in queries]
+
+
+def test_persist_and_reload(tmp_path: Path, fake_embedder) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    db.delete_documents(["t_nature"])
+    expected = db.search_many(["cvpr vision", "ieee"], n_results=2)
+
+    reloaded = NumpyVectorDatabase(persist_directory=str(tmp_path), embedder=fake_embedder)
+    assert reloaded.get_all_entries() == db.get_all_entries()
+    assert reloaded.search_many(["cvpr vision", "ieee"], n_results=2) == expected
+
+    reloaded.clear_collection()
+    assert NumpyVectorDatabase(persist_directory=str(tmp_path), embedder=fake_embedder).get_collection_count() == 0
+
+
+@pytest.mark.parametrize("edit", [
+    lambda sidecar: sidecar.pop("metadatas"),
+    lambda sidecar: sidecar.update(ids="t_cvpr"),
+    lambda sidecar: sidecar["documents"].pop(),
+    lambda sidecar: sidecar["metadatas"].__setitem__(0, None),
+])
+def test_malformed_sidecar_is_treated_as_empty(tmp_path: Path, fake_embedder, edit, capsys) -> None:
+    db = _make_db(tmp_path, fake_embedder)
+    sidecar_path = Path(db._sidecar_path)
+    sidecar = json.loads(sidecar_path.read_text(encoding="utf-8"))
+    edit(sidecar)
+    sidecar_path.write_text(json.dumps(sidecar), encoding="utf-8")
+
+    reloaded = NumpyVectorDatabase(persist_directory=str(tmp_path), embedder=fake_embedder)
+    assert reloaded.get_collection_count() == 0
+    assert "按空集合处理" in capsys.readouterr().out
+    # 之后仍可正常写入
+    reloaded.add_documents(["cvpr vision"], [{"journal": "CVPR"}], ids=["t_cvpr"])
+    assert reloaded.get_collection_count() == 1
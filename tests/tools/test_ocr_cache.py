@@ -0,0 +1,68 @@
+"""OCRResultCache 单元测试：内容寻址与磁盘 LRU 淘汰。"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# 添加 src 目录到路径
+project_root = Path(__file__).resolve().parent.parent.parent
+src_path = project_root / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from autolatex.tools.ocr_cache import OCRResultCache
+
+
+def test_key_depends_on_content_not_name() -> None:
+    key_a = OCRResultCache.make_key(b"image-one", "mixtex:abc", max_length=512, enhance=True)
+    key_b = OCRResultCache.make_key(b"image-two", "mixtex:abc", max_length=512, enhance=True)
+    key_a_again = OCRResultCache.make_key(b"image-one", "mixtex:abc", enhance=True, max_length=512)
+    assert key_a != key_b
+    assert key_a == key_a_again
+
+
+def test_key_depends_on_model_and_params() -> None:
+    base = OCRResultCache.make_key(b"img", "mixtex:abc", max_length=512, enhance=True)
+    assert base != OCRResultCache.make_key(b"img", "mixtex:def", max_length=512, enhance=True)
+    assert base != OCRResultCache.make_key(b"img", "mixtex:abc", max_length=1024, enhance=True)
+    assert base != OCRResultCache.make_key(b"img", "mixtex:abc", max_length=512, enhance=False)
+
+
+def test_get_put_roundtrip(tmp_path: Path) -> None:
+    cache = OCRResultCache(cache_dir=str(tmp_path), max_entries=10)
+    key = OCRResultCache.make_key(b"img", "m")
+    assert cache.get(key) is None
+    cache.put(key, r"\frac{a}{b}")
+    assert cache.get(key) == r"\frac{a}{b}"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_empty_result_not_cached(tmp_path: Path) -> None:
+    cache = OCRResultCache(cache_dir=str(tmp_path), max_entries=10)
+    key = OCRResultCache.make_key(b"img", "m")
+    cache.put(key, "")
+    assert cache.get(key) is None
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path: Path) -> None:
+    cache = OCRResultCache(cache_dir=str(tmp_path), max_entries=10)
+    keys = [OCRResultCache.make_key(str(i).encode(), "m") for i in range(10)]
+    now = time.time()
+    for i, key in enumerate(keys):
+        cache.put(key, f"latex-{i}")
+        # 显式设置递增的 mtime，避免文件系统时间精度影响顺序
+        os.utime(cache._path_for(key), (now - 100 + i, now - 100 + i))
+
+    # 访问最早写入的条目，使其成为最近使用
+    assert cache.get(keys[0]) == "latex-0"
+
+    cache.put(OCRResultCache.make_key(b"new", "m"), "latex-new")
+
+    assert cache.get(keys[0]) == "latex-0"
+    assert cache.get(keys[1]) is None
+    remaining = sum(1 for key in keys if os.path.exists(cache._path_for(key)))
+    assert remaining < 10
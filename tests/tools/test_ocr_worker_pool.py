@@ -0,0 +1,137 @@
+"""DeepSeekOCRWorkerPool 单元测试：使用说 JSON Lines 协议的假工作进程，验证崩溃重启、重试一次、按任务数回收与启动失败的处理。"""
+
+from __future__ import annotations
+
+import os
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+# 添加 src 目录到路径
+project_root = Path(__file__).resolve().parent.parent.parent
+src_path = project_root / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from autolatex.tools.ocr_handler import DeepSeekOCRWorkerPool
+
+# 假工作进程：识别结果为 "<pid>:<image>"；
+# 图片名为 crash-once 时，若标记文件不存在则创建后退出（下次成功），为 crash-always 时总是退出。
+# 启动参数 hang-first / exit-first 使第一个启动的进程在发送 ready 前卡住或直接退出，之后启动的正常
+FAKE_WORKER = textwrap.dedent(
+    """
+    import json, os, sys, time
+
+    mode, state_dir = sys.argv[1], sys.argv[2]
+    with open(os.path.join(state_dir, "pids"), "a") as f:
+        f.write(f"{os.getpid()}\\n")
+    first = os.path.join(state_dir, "first-started")
+    if mode != "normal" and not os.path.exists(first):
+        open(first, "w").close()
+        if mode == "hang-first":
+            time.sleep(60)
+        sys.exit(3)
+    print(json.dumps({"ready": True}), flush=True)
+    for line in sys.stdin:
+        job = json.loads(line)
+        image = job["image"]
+        marker = os.path.join(job["output_dir"], "crashed")
+        if image == "crash-always" or (image == "crash-once" and not os.path.exists(marker)):
+            open(marker, "w").close()
+            sys.exit(1)
+        if image == "fail":
+            print(json.dumps({"id": job["id"], "ok": False, "error": "bad image"}), flush=True)
+            continue
+        print(json.dumps({"id": job["id"], "ok": True, "latex": f"{os.getpid()}:{image}"}), flush=True)
+    """
+)
+
+
+@pytest.fixture
+def make_pool(tmp_path: Path):
+    script = tmp_path / "fake_worker.py"
+    script.write_text(FAKE_WORKER, encoding="utf-8")
+    pools = []
+
+    def factory(mode: str = "normal", **kwargs):
+        kwargs.setdefault("startup_timeout", 10.0)
+        kwargs.setdefault("job_timeout", 10.0)
+        command = [sys.executable, str(script), mode, str(tmp_path)]
+        pool = DeepSeekOCRWorkerPool(command, log_dir=str(tmp_path / "logs"), **kwargs)
+        pool.start()
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        pool.close()
+
+
+def _pid(result: str) -> str:
+    return result.split(":", 1)[0]
+
+
+def test_recognize_and_error_reply(make_pool, tmp_path: Path) -> None:
+    pool = make_pool()
+    first = pool.recognize("a.png", str(tmp_path))
+    assert first.endswith(":a.png")
+    assert pool.recognize("fail", str(tmp_path)) == ""
+    # 识别失败不影响工作进程
+    assert _pid(pool.recognize("b.png", str(tmp_path))) == _pid(first)
+
+
+def test_restarts_worker_that_died_between_jobs(make_pool, tmp_path: Path) -> None:
+    pool = make_pool()
+    first = pool.recognize("a.png", str(tmp_path))
+    worker = pool._workers[0]
+    worker.process.kill()
+    worker.process.wait()
+    second = pool.recognize("b.png", str(tmp_path))
+    assert second.endswith(":b.png")
+    assert _pid(second) != _pid(first)
+
+
+def test_crash_during_job_is_retried_once(make_pool, tmp_path: Path) -> None:
+    pool = make_pool()
+    result = pool.recognize("crash-once", str(tmp_path))
+    assert result.endswith(":crash-once")
+
+    (tmp_path / "crashed").unlink()
+    assert pool.recognize("crash-always", str(tmp_path)) == ""
+    # 两次尝试都失败后工作进程仍可在下一次调用时重启
+    assert pool.recognize("c.png", str(tmp_path)).endswith(":c.png")
+
+
+def test_worker_recycled_after_max_jobs(make_pool, tmp_path: Path) -> None:
+    pool = make_pool(max_jobs=2)
+    pids = [_pid(pool.recognize(f"{i}.png", str(tmp_path))) for i in range(5)]
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3] and pids[2] != pids[1]
+    assert pids[4] != pids[3]
+
+
+def _reaped(pid: int) -> bool:
+    """子进程已退出且已被回收（僵尸进程仍能通过 kill(pid, 0) 检查）"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+@pytest.mark.parametrize("mode", ["hang-first", "exit-first"])
+def test_worker_failing_startup_is_reaped_and_restarted(make_pool, tmp_path: Path, mode: str) -> None:
+    pool = make_pool(mode, size=2, startup_timeout=1.0)
+    failed_pid = int((tmp_path / "pids").read_text().split()[0])
+    assert _reaped(failed_pid)
+    assert pool._workers[0].process is None
+
+    # 先由已就绪的工作进程处理；启动失败的工作进程仍在空闲队列中，下次被取用时重新启动
+    first = pool.recognize("a.png", str(tmp_path))
+    assert first.endswith(":a.png")
+    second = pool.recognize("b.png", str(tmp_path))
+    assert second.endswith(":b.png")
+    assert _pid(second) != _pid(first)
+    assert all(worker.is_alive() for worker in pool._workers)
@@ -0,0 +1,99 @@
+"""知识库结果缓存单元测试：TTL 过期、LRU 淘汰、查询键规范化、同步变化时清空与数据包重新构建后自动刷新。"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from autolatex.tools.embeddings import load_template_embeddings, save_template_embeddings
+from autolatex.tools.knowledge_base import KnowledgeBaseService
+from autolatex.tools.knowledge_pack import EMBEDDINGS_DIR_NAME, SOURCE_DIR_NAME, build_pack, get_template_pack
+from autolatex.tools.search_cache import SearchResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_expiry_with_injected_clock() -> None:
+    clock = FakeClock()
+    cache = SearchResultCache(max_entries=4, ttl_seconds=10, clock=clock)
+    cache.put("a", "A")
+    clock.now += 10
+    assert cache.get("a") == "A"
+    clock.now += 0.5
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_at_capacity() -> None:
+    cache = SearchResultCache(max_entries=2, ttl_seconds=0)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # a 成为最近使用
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.evictions == 1
+
+
+def _service(tmp_path: Path, monkeypatch, fake_embedder) -> KnowledgeBaseService:
+    monkeypatch.setenv("AUTOLATEX_VECTOR_BACKEND", "numpy")
+    monkeypatch.setenv("AUTOLATEX_TEMPLATE_EMBEDDINGS_DIR", str(tmp_path / "embeddings"))
+    return KnowledgeBaseService(persist_directory=str(tmp_path / "db"), embedder=fake_embedder, warmup=False)
+
+
+def test_query_keys_are_normalized(tmp_path: Path, monkeypatch, fake_embedder) -> None:
+    service = _service(tmp_path, monkeypatch, fake_embedder)
+    text = service.search_text("CVPR")
+    assert "精确匹配" in text
+    assert service.search_text("  cvpr ") == text
+    assert service.search_text_many(["Cvpr", "c v p r"])[0] == text
+    stats = service.cache.stats()
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+
+
+def test_cache_cleared_only_when_refresh_changes_entries(tmp_path: Path, monkeypatch, fake_embedder) -> None:
+    service = _service(tmp_path, monkeypatch, fake_embedder)
+    service.search_text("cvpr")
+    assert not any(service.refresh().values())
+    assert service.cache.stats()["entries"] == 1
+
+    template_id = get_template_pack().find_id("cvpr")
+    service.db.delete_documents([template_id])
+    assert service.refresh()["added"] == [template_id]
+    assert service.cache.stats()["entries"] == 0
+    assert service.cache.invalidations == 1
+
+
+def test_rebuilt_pack_is_picked_up_by_search(tmp_path: Path, monkeypatch, pack_dir: Path, fake_embedder) -> None:
+    service = _service(tmp_path, monkeypatch, fake_embedder)
+    old_text = service.search_text("cvpr")
+    assert service.search_text("cvpr") == old_text
+
+    source = pack_dir / SOURCE_DIR_NAME / "cvpr.json"
+    item = json.loads(source.read_text(encoding="utf-8"))
+    item["document"] += "\n% 新增说明"
+    source.write_text(json.dumps(item, ensure_ascii=False), encoding="utf-8")
+    build_pack(str(pack_dir))
+
+    # 无需手动 refresh：搜索前发现数据包版本变化，同步后清空缓存
+    new_text = service.search_text("cvpr")
+    assert new_text != old_text and "% 新增说明" in new_text
+    assert service.cache.invalidations == 1
+
+
+def test_template_embeddings_dir_is_inside_pack(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.delenv("AUTOLATEX_TEMPLATE_EMBEDDINGS_DIR", raising=False)
+    monkeypatch.setenv("AUTOLATEX_KNOWLEDGE_PACK_DIR", str(tmp_path / "pack"))
+    # 与工作目录无关
+    monkeypatch.chdir(tmp_path)
+    path = save_template_embeddings("fake-bow", {"hash": [1.0, 0.0]})
+    assert Path(path) == tmp_path / "pack" / EMBEDDINGS_DIR_NAME / "fake-bow.json"
+    assert load_template_embeddings("fake-bow") == {"hash": [1.0, 0.0]}
@@ -0,0 +1,97 @@
+"""模板文件索引单元测试：文本/二进制分类、主文件选择与 mtime 失效。"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+# 添加 src 目录到路径
+project_root = Path(__file__).resolve().parent.parent.parent
+src_path = project_root / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from autolatex.tools.template_manager import (
+    get_journal_template_files,
+    get_main_tex,
+    get_template_file_index,
+)
+from autolatex.tools.template_manager.index import SNIFF_BYTES
+
+
+def _make_template(base: Path) -> Path:
+    template_dir = base / "demo"
+    (template_dir / "sec").mkdir(parents=True)
+    (template_dir / "main.tex").write_text("\\documentclass{article}\n", encoding="utf-8")
+    (template_dir / "sec" / "intro.tex").write_text("Intro\n", encoding="utf-8")
+    (template_dir / "fig.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    (template_dir / "latin1.bst").write_bytes("caf\xe9".encode("latin-1"))
+    return template_dir
+
+
+def test_classifies_text_and_binary(tmp_path: Path) -> None:
+    _make_template(tmp_path)
+    index = get_template_file_index("demo", str(tmp_path))
+    assert set(index.files) == {"main.tex", os.path.join("sec", "intro.tex"), "fig.png", "latin1.bst"}
+    assert not index.files["fig.png"].is_text
+    assert not index.files["latin1.bst"].is_text
+    assert index.files["main.tex"].size == len("\\documentclass{article}\n")
+    assert set(get_journal_template_files("demo", str(tmp_path))) == {"main.tex", os.path.join("sec", "intro.tex")}
+
+
+def test_main_tex_fast_path(tmp_path: Path) -> None:
+    _make_template(tmp_path)
+    assert get_main_tex("demo", str(tmp_path)) == "\\documentclass{article}\n"
+    # 只读取了主文件
+    index = get_template_file_index("demo", str(tmp_path))
+    assert index.files[os.path.join("sec", "intro.tex")]._text is None
+
+
+def test_index_reused_until_directory_changes(tmp_path: Path) -> None:
+    template_dir = _make_template(tmp_path)
+    index = get_template_file_index("demo", str(tmp_path))
+    assert get_template_file_index("demo", str(tmp_path)) is index
+
+    (template_dir / "sec" / "method.tex").write_text("Method\n", encoding="utf-8")
+    rebuilt = get_template_file_index("demo", str(tmp_path))
+    assert rebuilt is not index
+    assert os.path.join("sec", "method.tex") in rebuilt.files
+
+
+def test_in_place_edit_is_picked_up(tmp_path: Path) -> None:
+    template_dir = _make_template(tmp_path)
+    assert get_main_tex("demo", str(tmp_path)).startswith("\\documentclass")
+    with open(template_dir / "main.tex", "a", encoding="utf-8") as f:
+        f.write("% edited\n")
+    assert get_main_tex("demo", str(tmp_path)).endswith("% edited\n")
+
+
+def test_sniff_window_and_streamed_hash(tmp_path: Path) -> None:
+    template_dir = _make_template(tmp_path)
+    # 多字节字符跨过探测窗口边界，仍为文本
+    straddle = ("a" * (SNIFF_BYTES - 1) + "中文\n").encode("utf-8")
+    (template_dir / "long.tex").write_bytes(straddle)
+    # 探测窗口之后才出现非法 UTF-8：读取时改记为二进制并跳过
+    (template_dir / "late.cfg").write_bytes(b"x" * SNIFF_BYTES + b"\xff\n")
+
+    index = get_template_file_index("demo", str(tmp_path))
+    assert index.files["long.tex"].is_text
+    assert index.files["long.tex"].sha256 == hashlib.sha256(straddle).hexdigest()
+    files = get_journal_template_files("demo", str(tmp_path))
+    assert "long.tex" in files and "late.cfg" not in files
+    assert not index.files["late.cfg"].is_text
+
+
+def test_main_tex_with_late_invalid_bytes_falls_back(tmp_path: Path) -> None:
+    template_dir = _make_template(tmp_path)
+    # main.tex 通过了探测，但之后出现非法 UTF-8：改用含 \\documentclass 的其他 .tex
+    (template_dir / "main.tex").write_bytes(b"x" * SNIFF_BYTES + b"\xff\n")
+    (template_dir / "paper.tex").write_text("\\documentclass{article}\n", encoding="utf-8")
+    (template_dir / "broken.tex").write_bytes(b"\\documentclass" + b"x" * SNIFF_BYTES + b"\xff\n")
+    assert get_main_tex("demo", str(tmp_path)) == "\\documentclass{article}\n"
+
+    index = get_template_file_index("demo", str(tmp_path))
+    assert not index.files["main.tex"].is_text and not index.files["broken.tex"].is_text
+    assert index.main_tex_path() == "paper.tex"